@@ -0,0 +1,233 @@
+"""API压测脚本，按指定并发驱动Flask接口并以JSON输出吞吐量和延迟分位数
+
+默认在进程内启动本地模拟LLM服务和Flask服务，不消耗真实的DeepSeek额度；
+也可以通过 --target 压测已经运行的服务(此时需用环境变量 API_BASE_URL 将其指向模拟服务)。
+
+用法:
+    python benchmarks/load_test.py --scenario outline --concurrency 16 --requests 200
+    python benchmarks/load_test.py --target http://127.0.0.1:5000 --scenario health --duration 30
+    python benchmarks/load_test.py --scenario script --outline-id 12 --output bench/script.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from benchmarks.mock_llm_server import MockLLMServer, MockConfig, LatencyDistribution
+
+# 压测场景: 名称 -> (请求方法, 路径, 请求体)
+SCENARIOS: Dict[str, Tuple[str, str, Optional[Dict[str, Any]]]] = {
+    "health": ("GET", "/api/health", None),
+    "templates": ("GET", "/api/templates", None),
+    "outline": ("POST", "/api/generate/outline", {"title": "人工智能入门指南", "main_content": "介绍AI基础知识和应用场景"}),
+    "section": ("POST", "/api/generate/section", {"title": "人工智能的应用场景"}),
+    "custom": ("POST", "/api/generate/custom", {
+        "template_name": "ad_copy",
+        "variables": {"product": "智能手表", "length": "100", "feature": "健康监测", "audience": "上班族"},
+    }),
+    "script": ("POST", "/api/generate/script/{outline_id}", {"style": "专业", "tone": "简洁", "audience": "通用"}),
+    "get_outline": ("GET", "/api/outline/{outline_id}", None),
+    "get_script": ("GET", "/api/script/{outline_id}", None),
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class LoadRunner:
+    """按固定并发发送请求并收集结果"""
+
+    def __init__(self, base_url: str, method: str, path: str, body: Optional[Dict[str, Any]],
+                 concurrency: int, total_requests: int = 0, duration: float = 0.0, timeout: float = 300.0):
+        self.base_url = base_url.rstrip('/')
+        self.method = method
+        self.path = path
+        self.body = body
+        self.concurrency = concurrency
+        self.total_requests = total_requests
+        self.duration = duration
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._deadline = 0.0
+        self.latencies: List[float] = []
+        self.status_counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def _next(self) -> bool:
+        with self._lock:
+            if self.total_requests and self._issued >= self.total_requests:
+                return False
+            if self.duration and time.perf_counter() >= self._deadline:
+                return False
+            self._issued += 1
+            return True
+
+    def _worker(self):
+        session = requests.Session()
+        url = self.base_url + self.path
+        while self._next():
+            start = time.perf_counter()
+            try:
+                response = session.request(self.method, url, json=self.body, timeout=self.timeout)
+                response.content  # 读完响应体，计入完整耗时
+                elapsed = time.perf_counter() - start
+                key = str(response.status_code)
+                with self._lock:
+                    self.latencies.append(elapsed)
+                    self.status_counts[key] = self.status_counts.get(key, 0) + 1
+            except requests.exceptions.RequestException as e:
+                with self._lock:
+                    name = type(e).__name__
+                    self.errors[name] = self.errors.get(name, 0) + 1
+
+    def run(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        self._deadline = start + self.duration
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for _ in range(self.concurrency):
+                executor.submit(self._worker)
+        wall = time.perf_counter() - start
+        return self.report(wall)
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        values = sorted(self.latencies)
+        ok = sum(count for status, count in self.status_counts.items() if status.startswith('2'))
+        completed = len(values)
+        return {
+            "method": self.method,
+            "path": self.path,
+            "concurrency": self.concurrency,
+            "requests": completed,
+            "successful": ok,
+            "duration_s": round(wall, 3),
+            "throughput_rps": round(completed / wall, 2) if wall > 0 else 0.0,
+            "latency_ms": {
+                "mean": round(sum(values) / completed * 1000, 2) if completed else 0.0,
+                "p50": round(percentile(values, 50) * 1000, 2),
+                "p95": round(percentile(values, 95) * 1000, 2),
+                "p99": round(percentile(values, 99) * 1000, 2),
+                "max": round(values[-1] * 1000, 2) if values else 0.0,
+            },
+            "status_counts": self.status_counts,
+            "errors": self.errors,
+        }
+
+
+def start_local_stack(mock_config: MockConfig, with_admission: bool = False):
+    """在进程内启动模拟LLM服务和Flask服务，返回 (Flask地址, 关闭函数, 模拟服务)
+
+    默认关闭按客户端限流，避免压测流量被准入控制拦截；with_admission为True时保留线上配置。
+    """
+    from werkzeug.serving import make_server
+
+    # 压测时屏蔽逐请求的访问日志
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    mock = MockLLMServer(config=mock_config).start()
+    os.environ["API_BASE_URL"] = mock.base_url
+
+    from src.api import app as app_module
+    from src.script_generator.model_router import ModelRouter
+    # app可能已在设置API_BASE_URL之前导入，替换路由中的端点，生成器和预生成持有的仍是同一个路由对象
+    router = ModelRouter.from_config(json.dumps([{"name": "mock", "base_url": mock.base_url,
+                                                  "model": "deepseek-chat"}]))
+    app_module.model_router.endpoints = router.endpoints
+    app_module.model_router.routes = router.routes
+    if not with_admission:
+        from src.utils.admission import RateLimiter
+        app_module.admission_controller.limiter = RateLimiter(per_minute=1e12, burst=1e12)
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="flask-under-test", daemon=True)
+    thread.start()
+
+    def shutdown():
+        server.shutdown()
+        mock.stop()
+
+    return f"http://127.0.0.1:{server.server_port}", shutdown, mock
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Testiflow Studio API压测")
+    parser.add_argument("--target", help="已运行服务的地址，不指定则在进程内启动本地服务")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="outline")
+    parser.add_argument("--outline-id", default="1", help="script/get_outline/get_script场景使用的提纲ID")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="总请求数(与--duration二选一)")
+    parser.add_argument("--duration", type=float, default=0.0, help="压测时长(秒)，指定后忽略--requests")
+    parser.add_argument("--timeout", type=float, default=300.0, help="单个请求超时(秒)")
+    parser.add_argument("--warmup", type=int, default=0, help="正式压测前的预热请求数")
+    parser.add_argument("--mock-latency", default="fixed:0.2", help="模拟LLM的延迟分布")
+    parser.add_argument("--mock-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--mock-completion-tokens", type=int, default=200)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--mock-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--with-admission", action="store_true", help="本地服务保留按客户端限流")
+    parser.add_argument("--output", help="将JSON结果写入文件，便于回归对比")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    method, path, body = SCENARIOS[args.scenario]
+    path = path.format(outline_id=args.outline_id)
+
+    shutdown = None
+    mock = None
+    base_url = args.target
+    if not base_url:
+        mock_config = MockConfig(
+            latency=LatencyDistribution.parse(args.mock_latency),
+            tokens_per_second=args.mock_tokens_per_second,
+            completion_tokens=args.mock_completion_tokens,
+            error_rate=args.mock_error_rate,
+            rate_limit_rate=args.mock_rate_limit_rate,
+        )
+        base_url, shutdown, mock = start_local_stack(mock_config, args.with_admission)
+
+    try:
+        if args.warmup:
+            LoadRunner(base_url, method, path, body, concurrency=1, total_requests=args.warmup,
+                       timeout=args.timeout).run()
+        runner = LoadRunner(base_url, method, path, body, args.concurrency,
+                            total_requests=0 if args.duration else args.requests,
+                            duration=args.duration, timeout=args.timeout)
+        result = runner.run()
+    finally:
+        if shutdown:
+            shutdown()
+
+    result["scenario"] = args.scenario
+    result["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    if mock is not None:
+        result["upstream_requests"] = mock.request_count
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return result
+
+
+if __name__ == "__main__":
+    main()
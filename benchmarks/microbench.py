@@ -0,0 +1,241 @@
+"""CPU热点路径的微基准测试
+
+覆盖 ContentParser、VideoScriptGenerator 的解析方法、ContentValidator、
+TemplateLoader.render_template 以及 get_script 中脚本内容的JSON编解码。
+每项输出 ops/s 和单次调用的内存分配峰值，并与保存的基线比较，
+吞吐下降超过阈值时以非零状态退出。
+
+用法:
+    python benchmarks/microbench.py                      # 与基线比较
+    python benchmarks/microbench.py --filter parser      # 只运行名称包含parser的用例
+    python benchmarks/microbench.py --save-baseline      # 更新基线
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.api.app import app, _format_script
+from src.database.models import Script
+from src.script_generator.parser import ContentParser
+from src.script_generator.validator import ContentValidator
+from src.script_generator.video_script import VideoScriptGenerator
+from src.utils.template_loader import TemplateLoader
+from src.utils import json_provider
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "microbench.json")
+
+_SENTENCES = [
+    "人工智能正在以前所未有的速度融入我们的日常生活。",
+    "从智能手机上的语音助手到自动驾驶汽车，技术正在悄然改变我们与世界互动的方式。",
+    "在医疗领域，算法可以辅助医生诊断疾病，提高诊断的准确率。",
+    "教育方面，个性化学习方案能够根据学生的特点调整节奏。",
+    "当然，我们也需要思考新技术带来的伦理问题和社会影响。",
+    "接下来，让我们通过几个具体的例子，看看它是如何工作的。",
+    "记得点赞、关注，我们下期再见！",
+]
+
+
+def chinese_script(length: int, seed: int = 0) -> str:
+    """生成指定字符数的中文脚本，每3-5句换行"""
+    rng = random.Random(seed)
+    parts: List[str] = []
+    size = 0
+    while size < length:
+        paragraph = "".join(rng.choice(_SENTENCES) for _ in range(rng.randint(3, 5)))
+        parts.append(paragraph)
+        size += len(paragraph) + 1
+    return "\n".join(parts)[:length]
+
+
+def many_section_outline(sections: int, seed: int = 0) -> str:
+    """生成包含多个章节的提纲文本"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(1, sections + 1):
+        lines.append(f"{i}. 第{i}部分：{rng.choice(_SENTENCES)[:12]}")
+        for _ in range(rng.randint(2, 4)):
+            lines.append(f"   - {rng.choice(_SENTENCES)}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def html_completion(length: int, seed: int = 0) -> str:
+    """生成夹杂HTML标签的模型输出"""
+    rng = random.Random(seed)
+    tags = ["<p>", "</p>", "<b>", "</b>", "<br/>", '<span class="hl">', "</span>", "<h2>", "</h2>"]
+    parts: List[str] = []
+    size = 0
+    while size < length:
+        piece = rng.choice(tags) + rng.choice(_SENTENCES) + rng.choice(tags)
+        if rng.random() < 0.3:
+            piece += "\n"
+        parts.append(piece)
+        size += len(piece)
+    return "".join(parts)[:length]
+
+
+def stored_script(length: int) -> str:
+    """生成与 scripts.content 中存储格式一致的JSON字符串"""
+    raw = chinese_script(length)
+    generator = VideoScriptGenerator(None)
+    script = generator._parse_script(raw)
+    script["title"] = "人工智能入门指南"
+    script["raw_content"] = raw
+    return json.dumps(script, ensure_ascii=False)
+
+
+def get_script_roundtrip(script: Script) -> str:
+    """get_script 路由中的解码、整理和重新编码，调用路由使用的 _format_script 和应用的JSON提供器"""
+    script_content = json_provider.loads(script.content)
+    return app.json.dumps(_format_script(script, script_content))
+
+
+def build_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """构建所有基准用例: (名称, 无参调用)"""
+    generator = VideoScriptGenerator(None)
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+
+    for size in (500, 5000, 50000):
+        html = html_completion(size)
+        text = chinese_script(size)
+        stored = Script("s1", "1", stored_script(size), created_at=datetime(2024, 6, 1, 12, 0, 0), version=3)
+        cases.append((f"parser.clean_html_tags[{size}]", lambda html=html: ContentParser.clean_html_tags(html)))
+        cases.append((f"parser.segment_paragraphs[{size}]", lambda text=text: ContentParser.segment_paragraphs(text)))
+        cases.append((f"generator.parse_script[{size}]", lambda html=html: generator._parse_script(html)))
+        cases.append((f"validator.validate_all[{size}]", lambda text=text: ContentValidator.validate_all(text)))
+        cases.append((f"json.get_script_roundtrip[{size}]", lambda stored=stored: get_script_roundtrip(stored)))
+
+    for sections in (5, 50, 500):
+        outline = many_section_outline(sections)
+        cases.append((f"generator.parse_outline[{sections}]", lambda outline=outline: generator._parse_outline(outline)))
+
+    json_template = {"prompt": "请为${product}编写一段${length}字的广告文案，突出其${feature}特点，目标受众是${audience}。" * 20,
+                     "model": "deepseek-chat", "temperature": 0.7}
+    text_template = {"type": "text", "content": "我需要一篇关于${topic}的${type}文章，风格要${style}，语调要${tone}。" * 20}
+    variables = {"product": "智能手表", "length": "100", "feature": "健康监测", "audience": "上班族",
+                 "topic": "人工智能", "type": "科普", "style": "简洁", "tone": "专业"}
+    cases.append(("template.render_json", lambda: TemplateLoader.render_template(json_template, variables)))
+    cases.append(("template.render_text", lambda: TemplateLoader.render_template(text_template, variables)))
+    return cases
+
+
+def measure(func: Callable[[], Any], min_time: float, repeats: int) -> Dict[str, float]:
+    """测量单个用例的吞吐和内存分配"""
+    # 先确定每轮迭代次数，使一轮耗时不少于min_time
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        iterations *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed * 1.2))
+
+    rates = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        rates.append(iterations / (time.perf_counter() - start))
+
+    tracemalloc.start()
+    try:
+        before_current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        before_snapshot = tracemalloc.take_snapshot()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        after_snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(max(0, stat.count_diff) for stat in after_snapshot.compare_to(before_snapshot, 'filename'))
+
+    return {
+        "ops_per_sec": round(max(rates), 2),
+        "ops_per_sec_median": round(statistics.median(rates), 2),
+        "alloc_peak_bytes": max(0, peak - before_current),
+        "alloc_retained_blocks": blocks,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """返回吞吐低于基线超过阈值的用例说明"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        change = result["ops_per_sec"] / base["ops_per_sec"] - 1.0
+        result["change_vs_baseline"] = round(change, 4)
+        if change < -threshold:
+            regressions.append(f"{name}: {base['ops_per_sec']} -> {result['ops_per_sec']} ops/s ({change:+.1%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CPU热点路径微基准测试")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮最短耗时(秒)")
+    parser.add_argument("--repeats", type=int, default=5, help="重复轮数，取最好成绩")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的吞吐下降比例")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--output", help="将JSON结果写入文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, func in build_cases():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(func, args.min_time, args.repeats)
+        print(f"{name:<40} {results[name]['ops_per_sec']:>14,.1f} ops/s "
+              f"{results[name]['alloc_peak_bytes']:>12,d} B peak", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+    regressions: List[str] = []
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        print("性能回退超过阈值:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
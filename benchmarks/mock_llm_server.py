@@ -0,0 +1,302 @@
+"""本地模拟LLM服务，实现OpenAI兼容的 /v1/chat/completions 接口
+
+用于在不消耗DeepSeek额度的情况下压测服务端，支持：
+- 流式(SSE)与非流式响应
+- 可配置的延迟分布(固定/均匀/正态/对数正态)
+- 可配置的错误率与429限流比例
+- 按token吞吐量模拟生成耗时
+
+用法:
+    python benchmarks/mock_llm_server.py --port 8001 --latency lognormal:0.8:0.3 --tokens-per-second 60
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+# 模拟生成的语料，按提纲格式组织，保证服务端解析器能得到非空结果
+_CORPUS = [
+    "1. 开场引入",
+    "- 用一个贴近生活的问题引出主题，吸引观众注意力",
+    "2. 核心概念讲解",
+    "- 解释主题涉及的基本概念，并结合简单的例子说明",
+    "3. 实际应用场景",
+    "- 列举三个典型应用场景，说明它们如何改变我们的日常生活",
+    "4. 常见误区与注意事项",
+    "- 澄清观众容易产生的误解，给出实用建议",
+    "5. 总结与展望",
+    "- 回顾要点，展望未来发展趋势，引导观众关注和互动",
+]
+
+
+@dataclass
+class LatencyDistribution:
+    """首token前的延迟分布(秒)"""
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """解析形如 ``fixed:0.5``、``uniform:0.2:1.0``、``normal:1:0.2``、``lognormal:0:0.5`` 的描述"""
+        parts = spec.split(':')
+        kind = parts[0]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"不支持的延迟分布: {kind}")
+        values = [float(p) for p in parts[1:]] + [0.0, 0.0]
+        return cls(kind, values[0], values[1])
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            value = rng.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            value = rng.gauss(self.a, self.b)
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(self.a) if self.a > 0 else 0.0, self.b)
+        else:
+            value = self.a
+        return max(0.0, value)
+
+
+@dataclass
+class MockConfig:
+    """模拟服务的行为配置"""
+
+    latency: Optional[LatencyDistribution] = None
+    tokens_per_second: float = 0.0  # 0表示不限制吞吐
+    completion_tokens: int = 200
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    cache_hit_ratio: float = 0.0  # 模拟上游前缀缓存命中的prompt token比例
+    truncate_rate: float = 0.0  # 以finish_reason=length返回的比例
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.latency is None:
+            self.latency = LatencyDistribution()
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文按字计，其他按4个字符一个token计"""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + max(0, len(text) - cjk) // 4
+
+
+def generate_tokens(count: int) -> List[str]:
+    """生成指定数量的模拟token，每行语料作为一个整体循环使用"""
+    tokens: List[str] = []
+    index = 0
+    while len(tokens) < count:
+        line = _CORPUS[index % len(_CORPUS)] + "\n"
+        tokens.extend(line[i:i + 2] for i in range(0, len(line), 2))
+        index += 1
+    return tokens[:count]
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """处理 /v1/chat/completions 请求"""
+
+    server_version = "MockLLM/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ("/status", "/health"):
+            self._send_json(200, {"status": "ok", "requests": self.server.request_count})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if self.path.split('?')[0].rstrip('/') != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        config: MockConfig = self.server.config
+        rng = self.server.rng
+        self.server.count_request()
+
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                            headers={"Retry-After": str(config.retry_after)})
+            return
+        if roll < config.rate_limit_rate + config.error_rate:
+            self._send_json(500, {"error": {"message": "mock upstream error", "type": "server_error"}})
+            return
+
+        prompt_text = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        prompt_tokens = estimate_tokens(prompt_text)
+        max_tokens = body.get("max_tokens") or config.completion_tokens
+        truncated = rng.random() < config.truncate_rate
+        count = min(config.completion_tokens, max_tokens)
+        finish_reason = "length" if truncated or count < config.completion_tokens else "stop"
+        tokens = generate_tokens(count)
+        usage = self._usage(prompt_tokens, len(tokens))
+
+        time.sleep(config.latency.sample(rng))
+        if body.get("stream"):
+            self._stream(body, tokens, usage, finish_reason)
+        else:
+            if config.tokens_per_second > 0:
+                time.sleep(len(tokens) / config.tokens_per_second)
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock-model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            })
+
+    def _usage(self, prompt_tokens: int, completion_tokens: int) -> Dict[str, int]:
+        cache_hit = int(prompt_tokens * self.server.config.cache_hit_ratio)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": cache_hit,
+            "prompt_cache_miss_tokens": prompt_tokens - cache_hit,
+        }
+
+    def _stream(self, body: Dict[str, Any], tokens: List[str], usage: Dict[str, int], finish_reason: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        delay = 1.0 / self.server.config.tokens_per_second if self.server.config.tokens_per_second > 0 else 0.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        try:
+            for chunk in self._chunks(completion_id, body.get("model", "mock-model"), tokens, usage, finish_reason):
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                if delay:
+                    time.sleep(delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    @staticmethod
+    def _chunks(completion_id: str, model: str, tokens: List[str],
+                usage: Dict[str, int], finish_reason: str) -> Iterator[Dict[str, Any]]:
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+        for token in tokens:
+            yield {**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}], "usage": usage}
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """可在进程内启动的模拟LLM服务，便于测试和压测脚本复用"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 config: Optional[MockConfig] = None, verbose: bool = False):
+        super().__init__((host, port), MockLLMHandler)
+        self.config = config or MockConfig()
+        self.rng = random.Random(self.config.seed)
+        self.verbose = verbose
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def start(self) -> "MockLLMServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟LLM服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="fixed:0.5",
+                        help="首token延迟分布，如 fixed:0.5 / uniform:0.2:1 / normal:1:0.2 / lognormal:0.8:0.3")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="token吞吐量，0表示不限制")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="每次生成的token数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--retry-after", type=int, default=1, help="429响应的Retry-After秒数")
+    parser.add_argument("--cache-hit-ratio", type=float, default=0.0, help="模拟前缀缓存命中的prompt比例")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="以finish_reason=length返回的比例")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = MockConfig(
+        latency=LatencyDistribution.parse(args.latency),
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        cache_hit_ratio=args.cache_hit_ratio,
+        truncate_rate=args.truncate_rate,
+        seed=args.seed,
+    )
+    server = MockLLMServer(args.host, args.port, config, verbose=args.verbose)
+    print(f"模拟LLM服务已启动: {server.base_url}/v1/chat/completions", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,22 @@
 # 全局常量定义
+import os
 
 # API相关配置
-API_BASE_URL = "https://api.deepseek.com"  # DeepSeek API基础URL
+API_BASE_URL = os.getenv("API_BASE_URL", "https://api.deepseek.com")  # DeepSeek API基础URL，压测时可指向本地模拟服务
 API_TIMEOUT = 60  # 秒
 API_RETRY_COUNT = 3
 
+# 多模型路由配置
+# JSON数组，每项为一个OpenAI兼容端点: {"name", "base_url", "model", "api_key", "aliases", "timeout"}；
+# 为空时只使用API_BASE_URL上的deepseek-chat
+LLM_ENDPOINTS = os.getenv("LLM_ENDPOINTS", "")
+# JSON对象，任务类型(outline/script/section/custom/template:<模板名>)到端点名称列表的映射，未配置的任务可使用所有端点
+LLM_ROUTES = os.getenv("LLM_ROUTES", "")
+ROUTER_EWMA_ALPHA = 0.3  # 延迟和错误率的指数加权系数，越大越看重最近的请求
+ROUTER_ERROR_PENALTY = 4.0  # 选择端点时的得分 = 平均延迟 * (1 + 错误率 * 该系数)
+ROUTER_FAILURE_THRESHOLD = 3  # 连续失败该次数后暂停使用该端点
+ROUTER_COOLDOWN_SECONDS = 30  # 端点暂停时长(秒)，429响应的Retry-After更长时以其为准
+
 # DeepSeek API配置
 DEEPSEEK_API_KEY = "sk-eaa4f9161a724d7fbdf2451c0ff94f00"  # 在此处填入你的DeepSeek API密钥
 
@@ -13,10 +25,126 @@ MAX_CONTENT_LENGTH = 5000  # 字符数
 MIN_CONTENT_LENGTH = 100   # 字符数
 DEFAULT_LANGUAGE = "zh-CN"
 
+# 提示词token预算配置
+PROMPT_CONTEXT_WINDOW = 64000  # 模型上下文长度(token)，输入与max_tokens之和不超过该值
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "6000"))  # 单次请求的输入token预算，超出时压缩提纲
+PROMPT_MAX_OUTPUT_TOKENS = 8192  # max_tokens上限
+PROMPT_MIN_OUTPUT_TOKENS = 1024  # max_tokens下限
+PROMPT_OUTPUT_TOKENS_PER_SECTION = 700  # 生成脚本时每个章节预留的输出token
+PROMPT_OUTLINE_OUTPUT_TOKENS = 1500  # 生成提纲时的max_tokens
+PROMPT_SUMMARY_CHARS = 60  # 压缩低优先级章节时保留的描述长度(字符)
+TOKENS_PER_CJK_CHAR = 0.6  # 估算token数: 每个中日韩字符约0.6个token
+TOKENS_PER_OTHER_CHAR = 0.3  # 每个其他字符约0.3个token
+
+# 长脚本生成配置
+SCRIPT_MAX_CONTINUATIONS = 4  # 输出因达到max_tokens被截断时的最多续写次数
+SCRIPT_CONTINUATION_TAIL_CHARS = 400  # 续写请求原样携带的已写内容结尾长度(字符)，也是去除重复衔接时的最大检查长度
+SCRIPT_CONTINUATION_SUMMARY_CHARS = 600  # 续写请求携带的已写内容概要长度(字符)
+SCRIPT_SECTION_WORKERS = 4  # 章节较多、一次输出放不下时按章节并行生成的请求数
+
 # 文件路径
 TEMPLATES_DIR = "data/templates"
 LOGS_DIR = "data/logs"
 
 # 日志配置
 LOG_LEVEL = "INFO"
-LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
\ No newline at end of file
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_OUTPUT = os.getenv("LOG_OUTPUT", "text")  # 日志格式: text(LOG_FORMAT) 或 json(每行一个JSON对象)
+LOG_QUEUE_SIZE = 10000  # 日志队列容量，写盘由后台线程完成，队列满时按级别丢弃
+LOG_OVERLOAD_THRESHOLD = 0.8  # 队列占用超过该比例时对INFO及以下级别抽样
+LOG_OVERLOAD_SAMPLE_RATE = 0.1  # 过载时INFO及以下级别的保留比例
+LOG_MAX_FIELD_CHARS = 2000  # 请求参数、提示词等大字段在日志中的最大长度
+
+# 追踪配置
+TRACE_SAMPLE_RATE = 0.1  # 导出追踪的采样比例
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "traces.jsonl")  # 相对路径位于LOGS_DIR下，每行一个OTLP JSON导出请求
+
+# 性能分析配置
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # 管理接口令牌，为空时禁用所有管理功能
+PROFILER_INTERVAL_MS = 10  # 运行时采样间隔(毫秒)
+PROFILER_FLUSH_SECONDS = 60  # 折叠栈写入LOGS_DIR的周期(秒)
+
+# 响应序列化与压缩配置
+JSON_DATETIME_FORMAT = "http"  # 日期时间的JSON格式: http(与Flask默认一致) 或 iso
+COMPRESSION_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+COMPRESSION_LEVEL = 6  # gzip压缩级别，brotli使用相同的quality
+
+# HTTP缓存配置
+HTTP_VALIDATOR_CACHE_SIZE = 10000  # 内存中保存的ETag条目数
+HTTP_VALIDATOR_TTL = 30  # ETag条目有效期(秒)，限制多进程部署时的过期窗口
+CACHE_CONTROL_POLICIES = {
+    "outline": "private, no-cache",  # 编辑器轮询时每次重新验证，命中时返回304
+    "script": "private, no-cache",
+    "templates": "public, max-age=60",
+}
+
+# 生成接口准入控制配置
+RATE_LIMIT_PER_MINUTE = 30  # 每个API Key/IP每分钟允许的生成请求数
+RATE_LIMIT_BURST = 10  # 允许的突发请求数
+MAX_CONCURRENT_GENERATIONS = 4  # 同时执行的生成请求上限，需小于数据库连接池容量(5)
+GENERATION_QUEUE_SIZE = 16  # 等待队列长度上限
+GENERATION_QUEUE_TIMEOUT = 10  # 排队最长等待时间(秒)
+ADMISSION_STORE = os.getenv("ADMISSION_STORE", "memory")  # memory 或 local(多worker共享本地存储)
+# 已分配给客户端的API Key(逗号分隔)，请求头X-API-Key与其中之一匹配时按Key限流，否则按来源IP
+CLIENT_API_KEYS = frozenset(key.strip() for key in os.getenv("CLIENT_API_KEYS", "").split(",") if key.strip())
+
+# 投机生成配置：保存提纲后在后台按默认参数预先生成脚本
+SPECULATIVE_SCRIPTS = os.getenv("SPECULATIVE_SCRIPTS", "false").lower() == "true"  # 是否启用
+SPECULATIVE_MAX_CONCURRENT = 1  # 同时进行的投机生成数，不占用MAX_CONCURRENT_GENERATIONS的名额
+SPECULATIVE_MAX_INTERACTIVE = 1  # 进行中的交互生成请求达到该数量时暂停开始新的投机生成
+SPECULATIVE_TTL = 600  # 预生成结果的有效期(秒)，超时未使用则丢弃
+SPECULATIVE_MAX_ENTRIES = 100  # 内存中保留的预生成结果数上限
+# 生成进度推送配置
+PROGRESS_HEARTBEAT_SECONDS = 15  # SSE订阅空闲时的心跳间隔(秒)，需小于反向代理的读超时
+PROGRESS_JOB_TTL = 300  # 任务最后一次事件后在内存中保留的时间(秒)
+PROGRESS_HISTORY_SIZE = 200  # 每个任务保留的事件数，供晚到或重连的订阅者补发
+
+# 批量查询配置
+BATCH_MAX_IDS = 100  # 单次批量查询的ID数量上限
+
+# 相似内容检测配置
+SIMILARITY_INDEX_FILE = "data/cache/similarity.idx"  # MinHash签名的追加日志，启动时重放重建索引
+SIMILARITY_SHINGLE_SIZE = 5  # 去掉空白和标点后按该长度切分字符片段
+SIMILARITY_NUM_PERM = 128  # MinHash签名长度，越长相似度估计越准
+SIMILARITY_BANDS = 32  # LSH分段数，每段4个值，相似度0.5时约87%、0.7时约99.9%的概率成为候选
+SIMILARITY_THRESHOLD = 0.6  # 估计相似度达到该值视为相似
+SIMILARITY_MAX_RESULTS = 10  # 每次查询最多返回的相似文档数
+SIMILARITY_STORE = os.getenv("SIMILARITY_STORE", ADMISSION_STORE)  # memory 或 local(多worker共享本地存储)
+
+# 幂等请求配置
+IDEMPOTENCY_TTL = 24 * 3600  # Idempotency-Key记录保存时间(秒)
+IDEMPOTENCY_MAX_ENTRIES = 2000  # 进程内保存的记录数上限
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", ADMISSION_STORE)  # memory 或 local(多worker共享本地存储)
+OUTLINE_DEDUPE_WINDOW = 300  # 该时间(秒)内保存过完全相同的提纲时返回已有ID(如未带Idempotency-Key的重复提交)，0表示不去重
+
+# 脚本版本配置
+SCRIPT_SNAPSHOT_INTERVAL = 10  # 每隔多少个版本保存一次完整快照，限制重建时需要应用的差异数
+
+# 视频拼接配置
+VIDEO_TARGET_WIDTH = 1920
+VIDEO_TARGET_HEIGHT = 1080
+VIDEO_TARGET_FPS = 30
+VIDEO_TARGET_SAMPLE_RATE = 48000
+VIDEO_NORMALIZE_WORKERS = int(os.getenv("VIDEO_NORMALIZE_WORKERS", "0"))  # 并行转码的ffmpeg进程数，0表示按CPU核数
+VIDEO_CLIP_CACHE_DIR = "data/cache/clips"  # 标准化片段缓存目录
+VIDEO_CLIP_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CLIP_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))  # 缓存总大小上限，0表示不缓存
+VIDEO_CLIP_CACHE_GRACE_SECONDS = 600  # 最近使用的片段在该时间内不被淘汰，保护正在拼接的片段
+VIDEO_SEGMENT_MIN_SECONDS = 10  # 分段并行编码时每段的最短时长(秒)，更短的输入不值得启动多个ffmpeg进程
+VIDEO_KEYFRAME_SECONDS = 2  # 关键帧间隔(秒)，分段边界按该间隔对齐
+
+# 渲染配置
+RENDER_MAX_CONCURRENT = int(os.getenv("RENDER_MAX_CONCURRENT", "2"))  # 同时运行的渲染任务数，各任务平分CPU核数
+RENDER_TIMEOUT_SECONDS = 1800  # 单个渲染任务的超时时间(秒)
+RENDER_MAX_PENDING = 20  # 排队和运行中的渲染任务总数上限，超过时拒绝新任务
+RENDER_CHARS_PER_SECOND = 4.5  # 估算章节时长时的朗读速度(字/秒)
+RENDER_MIN_SECTION_SECONDS = 2  # 章节的最短时长(秒)
+RENDER_MEDIA_DIR = "data/media"  # 渲染素材目录，请求中的素材名相对于该目录
+RENDER_OUTPUT_DIR = "data/outputs/renders"  # 渲染结果目录
+RENDER_JOB_TTL = 3600  # 已结束任务的状态保留时间(秒)
+
+# 字幕配置
+SUBTITLE_MAX_LINE_WIDTH = 18  # 每行最大宽度，全角字符计1，半角字符计0.5
+SUBTITLE_MAX_LINES = 2  # 每条字幕最多行数
+SUBTITLE_CACHE_SIZE = 256  # 内存中缓存的字幕文件数
+SUBTITLE_FONT = "Noto Sans CJK SC"  # ASS样式和烧录字幕使用的字体
+SUBTITLE_FONT_SIZE = 54  # 字号，相对于VIDEO_TARGET_HEIGHT
@@ -4,7 +4,9 @@ CREATE TABLE IF NOT EXISTS outlines (
     id INT AUTO_INCREMENT PRIMARY KEY,
     title VARCHAR(255) NOT NULL,
     created_at DATETIME NOT NULL,
-    updated_at DATETIME NOT NULL
+    updated_at DATETIME NOT NULL,
+    content_hash CHAR(32) NULL,
+    INDEX idx_outlines_content_hash (content_hash)
 );
 
 -- 创建outline_sections表
@@ -22,5 +24,21 @@ CREATE TABLE IF NOT EXISTS scripts (
     outline_id INT NOT NULL,
     content TEXT NOT NULL,
     created_at DATETIME NOT NULL,
+    version INT NOT NULL DEFAULT 1,
+    FOREIGN KEY (outline_id) REFERENCES outlines(id) ON DELETE CASCADE
+);
+
+-- 创建script_versions表，历史版本以快照或相对上一版本的差异保存(zlib压缩)
+CREATE TABLE IF NOT EXISTS script_versions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    outline_id INT NOT NULL,
+    script_id VARCHAR(36) NOT NULL,
+    version INT NOT NULL,
+    kind VARCHAR(8) NOT NULL,
+    payload MEDIUMBLOB NOT NULL,
+    content_size INT NOT NULL,
+    stored_size INT NOT NULL,
+    created_at DATETIME NOT NULL,
+    UNIQUE KEY uk_script_versions_outline_version (outline_id, version),
     FOREIGN KEY (outline_id) REFERENCES outlines(id) ON DELETE CASCADE
 );
\ No newline at end of file
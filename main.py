@@ -7,7 +7,7 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
-from src.utils.logger import setup_logger
+from src.utils.logger import setup_logger, lazy_json
 from src.utils.template_loader import TemplateLoader
 from src.script_generator.api_client import APIClient
 from src.script_generator.parser import ContentParser
@@ -58,7 +58,7 @@ def main():
     try:
         # 渲染模板
         rendered_template = TemplateLoader.render_template(template, variables)
-        logger.info(f"渲染后的模板:\n{rendered_template}")
+        logger.debug("渲染后的模板:\n%s", lazy_json(rendered_template))
         
         # 生成内容
         logger.info("正在调用API生成内容...")
@@ -135,7 +135,7 @@ def main():
 
 def mock_api_response(prompt):
     """模拟API响应，用于测试"""
-    logger.info(f"模拟API请求: {prompt}")
+    logger.debug("模拟API请求: %s", lazy_json(prompt))
     
     # 根据不同的提示返回不同的模拟内容
     if "广告文案" in prompt:
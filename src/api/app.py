@@ -1,57 +1,455 @@
 import os
+import hmac
 import logging
 import json
-from flask import Flask, request, jsonify
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 
-from src.script_generator.api_client import APIClient
+from src.script_generator.model_router import ModelRouter
+from src.script_generator.speculative import SpeculativeScripts
 from src.script_generator.video_script import VideoScriptGenerator
 from src.utils.template_loader import TemplateLoader
-from config.constants import API_BASE_URL
+from src.utils.metrics import REGISTRY, CONTENT_TYPE_LATEST, HTTP_REQUESTS, HTTP_LATENCY
+from src.utils.tracing import tracer
+from src.utils.profiler import RequestProfiler, runtime_profiler
+from src.utils.json_provider import FastJSONProvider
+from src.utils import json_provider
+from src.utils.compression import compress_response
+from src.utils.admission import create_admission_controller
+from src.utils.progress import progress_broker, bind_job, unbind_job, report
+from src.utils.logger import lazy_json
+from src.utils.idempotency import (create_idempotency_store, request_fingerprint, StoredResponse,
+                                   IDEMPOTENCY_REPLAYS, REPLAY, IN_PROGRESS, MISMATCH)
+from src.utils.http_cache import (validator_cache, cached_not_modified, conditional,
+                                  etag_matches, files_etag, not_modified)
+from src.utils.similarity import create_similarity_index, outline_text
+from config.constants import ADMIN_TOKEN, BATCH_MAX_IDS, CLIENT_API_KEYS, SPECULATIVE_SCRIPTS, SIMILARITY_THRESHOLD
+
+# 批量查询接口支持投影的字段，outline.title 表示只返回章节标题
+OUTLINE_BATCH_FIELDS = ('title', 'outline', 'outline.title', 'created_at', 'updated_at')
+SCRIPT_BATCH_FIELDS = ('outline_id', 'title', 'content', 'raw_content', 'created_at', 'updated_at', 'version')
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
 # 创建Flask应用
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # 启用CORS
 CORS(app)
 
-# 初始化API客户端
-api_client = APIClient(API_BASE_URL)
+# 初始化模型路由，按LLM_ENDPOINTS/LLM_ROUTES在多个端点之间选择
+model_router = ModelRouter.from_config()
 
 # 初始化视频脚本生成器
-video_script_generator = VideoScriptGenerator(api_client)
+video_script_generator = VideoScriptGenerator(model_router)
+
+# 保存提纲后按默认参数预生成脚本(SPECULATIVE_SCRIPTS=true时启用)
+speculative_scripts = SpeculativeScripts(video_script_generator) if SPECULATIVE_SCRIPTS else None
+
+# 生成类接口的准入控制
+admission_controller = create_admission_controller()
+
+# Idempotency-Key对应的响应记录
+idempotency_store = create_idempotency_store()
+
+# 提纲和脚本的近似重复索引，启动时从磁盘日志重建
+similarity_index = create_similarity_index()
+
+# 长脚本的签名计算需要数百毫秒CPU，脚本索引更新和全量重建在单个后台线程中按提交顺序执行
+similarity_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity")
+similarity_rebuild = {'status': 'idle'}
+similarity_rebuild_lock = threading.Lock()
+
+@app.before_request
+def _start_request_timer():
+    """记录请求开始时间并开启追踪"""
+    g.request_start = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.trace, g.trace_token = tracer.start_trace(
+        f"{request.method} {route}", traceparent=request.headers.get('traceparent'))
+
+@app.after_request
+def _record_request_metrics(response):
+    """记录每个路由的请求数和耗时"""
+    start = g.get('request_start')
+    if start is not None:
+        # 使用路由模板而非实际路径，避免ID导致标签基数膨胀
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.labels(request.method, route).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(request.method, route, response.status_code).inc()
+    trace = g.get('trace')
+    if trace is not None:
+        trace.root.set_attribute('http.status_code', response.status_code)
+        response.headers['Server-Timing'] = trace.server_timing()
+        # 允许跨域前端读取Server-Timing
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+@app.teardown_request
+def _end_trace(exc):
+    """结束追踪并按采样结果导出"""
+    trace = g.pop('trace', None)
+    if trace is not None:
+        if exc is not None:
+            trace.root.error = str(exc)
+        tracer.end_trace(trace, g.pop('trace_token'))
+
+def _is_admin() -> bool:
+    """校验请求是否携带有效的管理令牌"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+@app.before_request
+def _start_request_profile():
+    """带 ?profile=1 的管理员请求开启单请求性能分析"""
+    if request.args.get('profile') != '1' or not _is_admin():
+        return None
+    try:
+        profiler = RequestProfiler(request.args.get('profile_format', 'pstats'),
+                                   sort_by=request.args.get('profile_sort', 'cumulative'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    g.request_profiler = profiler
+    profiler.start()
+
+@app.after_request
+def _finish_request_profile(response):
+    """用分析结果替换原响应，原响应状态通过响应头返回"""
+    profiler = g.pop('request_profiler', None)
+    if profiler is None:
+        return response
+    profiler.stop()
+    report = Response(profiler.report(), content_type='text/plain; charset=utf-8')
+    report.headers['X-Profiled-Status'] = str(response.status_code)
+    report.headers['X-Profiled-Duration-Ms'] = f"{profiler.elapsed * 1000:.1f}"
+    return report
+
+def _client_key() -> str:
+    """限流和幂等记录使用的客户端标识：已配置的API Key，否则使用来源IP
+
+    未校验的X-API-Key每次换一个值就能得到新的令牌桶，因此只有与CLIENT_API_KEYS匹配时才按Key区分
+    """
+    api_key = request.headers.get('X-API-Key', '')
+    if api_key and any(hmac.compare_digest(api_key.encode('utf-8'), key.encode('utf-8'))
+                       for key in CLIENT_API_KEYS):
+        return f"key:{api_key}"
+    return f"ip:{request.remote_addr}"
+
+# 客户端自行生成的任务ID，用于关联生成请求和进度订阅
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+@app.before_request
+def _bind_progress_job():
+    """生成请求携带 X-Job-Id 时将进度事件发送到该任务"""
+    if request.method != 'POST' or not request.path.startswith('/api/generate/'):
+        return None
+    job_id = request.headers.get('X-Job-Id') or request.args.get('job_id')
+    if not job_id or not JOB_ID_PATTERN.match(job_id):
+        return None
+    g.progress_job = progress_broker.start(job_id)
+    g.progress_token = bind_job(g.progress_job)
+
+@app.after_request
+def _finish_progress_job(response):
+    """根据响应状态发送任务的结束事件"""
+    job = g.get('progress_job')
+    if job is None:
+        return response
+    if response.status_code < 400:
+        job.publish("completed", {'status': response.status_code})
+    else:
+        job.publish("failed", {'status': response.status_code})
+    response.headers['X-Job-Id'] = job.job_id
+    return response
+
+@app.teardown_request
+def _unbind_progress_job(exc):
+    """解除进度任务绑定，未处理的异常作为失败事件发送"""
+    job = g.pop('progress_job', None)
+    if job is None:
+        return
+    if exc is not None:
+        job.publish("failed", {'error': str(exc)})
+    unbind_job(g.pop('progress_token'))
+
+def _is_idempotent_route() -> bool:
+    """支持Idempotency-Key的写接口"""
+    return request.method == 'POST' and (
+        request.path == '/api/outline/save' or request.path.startswith('/api/generate/'))
+
+@app.before_request
+def _check_idempotency():
+    """携带Idempotency-Key的重复请求直接返回首次的响应，不再写库或调用模型"""
+    key = request.headers.get('Idempotency-Key')
+    if not key or not _is_idempotent_route():
+        return None
+    if len(key) > 255:
+        return jsonify({
+            'error': 'Idempotency-Key长度不能超过255'
+        }), 400
+    
+    # 按客户端隔离Key，避免不同客户端的Key冲突
+    scoped_key = f"{_client_key()}:{key}"
+    fingerprint = request_fingerprint(request.method, request.full_path, request.get_data())
+    state, stored = idempotency_store.reserve(scoped_key, fingerprint)
+    if state == REPLAY:
+        IDEMPOTENCY_REPLAYS.labels("replayed").inc()
+        response = Response(stored.body, status=stored.status, content_type=stored.content_type)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    if state == IN_PROGRESS:
+        IDEMPOTENCY_REPLAYS.labels("in_progress").inc()
+        response = jsonify({
+            'error': '相同Idempotency-Key的请求正在处理中，请稍后重试'
+        })
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    if state == MISMATCH:
+        IDEMPOTENCY_REPLAYS.labels("mismatch").inc()
+        return jsonify({
+            'error': 'Idempotency-Key已用于内容不同的请求'
+        }), 422
+    g.idempotency_key = scoped_key
+
+@app.before_request
+def _admit_generation():
+    """生成类接口的准入控制，超限时快速返回429/503"""
+    if request.method != 'POST' or not request.path.startswith('/api/generate/'):
+        return None
+    admitted, status, reason, retry_after = admission_controller.admit(_client_key())
+    if not admitted:
+        logger.warning(f"拒绝生成请求: {reason}, 客户端: {_client_key()}")
+        response = jsonify({
+            'error': '请求过于频繁，请稍后重试' if status == 429 else '服务繁忙，请稍后重试',
+            'reason': reason
+        })
+        response.status_code = status
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    g.generation_admitted = True
+
+@app.teardown_request
+def _release_generation(exc):
+    """释放生成并发名额"""
+    if g.pop('generation_admitted', False):
+        admission_controller.release()
+
+@app.after_request
+def _compress_response(response):
+    """按Accept-Encoding压缩较大的响应"""
+    return compress_response(request, response)
+
+@app.after_request
+def _store_idempotent_response(response):
+    """保存首次请求的响应(在压缩之前执行)，限流和服务端错误不保存以便客户端重试"""
+    key = g.pop('idempotency_key', None)
+    if key is None:
+        return response
+    if response.status_code >= 500 or response.status_code == 429 or response.is_streamed:
+        idempotency_store.release(key)
+    else:
+        idempotency_store.complete(key, StoredResponse(
+            response.status_code, response.content_type, response.get_data()))
+    return response
+
+@app.teardown_request
+def _release_idempotency_key(exc):
+    """未处理的异常导致没有响应时释放Key"""
+    key = g.pop('idempotency_key', None)
+    if key is not None:
+        idempotency_store.release(key)
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+def runtime_profiler_control():
+    """查询或开关运行时采样分析器"""
+    if not _is_admin():
+        return jsonify({
+            'error': '无权访问'
+        }), 403
+    
+    if request.method == 'POST':
+        data = request.json or {}
+        if data.get('enabled'):
+            # 先校验再开启，非法值不会写入分析器配置
+            for field in ('interval_ms', 'flush_seconds'):
+                value = data.get(field)
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                          or not 0 < value < float('inf')):
+                    return jsonify({
+                        'error': f'{field}应为正数'
+                    }), 400
+            runtime_profiler.start(data.get('interval_ms'), data.get('flush_seconds'))
+            logger.info("运行时采样分析器已开启")
+        else:
+            runtime_profiler.stop()
+            logger.info("运行时采样分析器已关闭")
+    
+    return jsonify(runtime_profiler.status())
+
+@app.route('/api/admin/similarity/rebuild', methods=['GET', 'POST'])
+def rebuild_similarity_index():
+    """在后台按数据库中的全部提纲和脚本重建相似内容索引，GET查询最近一次重建的状态"""
+    if not _is_admin():
+        return jsonify({
+            'error': '无权访问'
+        }), 403
+    
+    with similarity_rebuild_lock:
+        if request.method == 'GET':
+            return jsonify(similarity_rebuild)
+        if similarity_rebuild['status'] in ('queued', 'running'):
+            return jsonify({
+                'error': '索引正在重建',
+                **similarity_rebuild
+            }), 409
+        similarity_rebuild.clear()
+        similarity_rebuild.update({'status': 'queued', 'outlines': 0, 'scripts': 0,
+                                   'started_at': None, 'finished_at': None, 'error': None})
+        state = dict(similarity_rebuild)
+    
+    similarity_worker.submit(_run_similarity_rebuild)
+    return jsonify(state), 202
+
+def _run_similarity_rebuild():
+    """后台线程中逐行读取全部提纲和最新脚本加入索引，不一次性载入内存"""
+    from src.database.operations import OutlineOperations, ScriptOperations
+    
+    similarity_rebuild.update({'status': 'running', 'started_at': time.time()})
+    try:
+        for outline in OutlineOperations.iter_outlines():
+            _index_outline(outline.outline_id, outline.title,
+                           [{'title': section.title, 'content': section.content} for section in outline.sections])
+            similarity_rebuild['outlines'] += 1
+        for script in ScriptOperations.iter_scripts():
+            if script.content and _sign_script(script.outline_id, script.content):
+                similarity_rebuild['scripts'] += 1
+        status, error = 'completed', None
+    except Exception as e:
+        logger.error(f"重建相似内容索引失败: {str(e)}", exc_info=True)
+        status, error = 'failed', str(e)
+    
+    with similarity_rebuild_lock:
+        similarity_rebuild.update({'status': status, 'error': error, 'finished_at': time.time(),
+                                   'documents': len(similarity_index)})
+    logger.info(f"相似内容索引重建结束: {similarity_rebuild['outlines']}个提纲，"
+                f"{similarity_rebuild['scripts']}个脚本，状态: {status}")
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """以Prometheus文本格式导出运行指标"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/api/progress/<job_id>', methods=['GET'])
+def progress_stream(job_id):
+    """以SSE订阅生成任务的进度事件，可在发起生成请求之前订阅"""
+    if not JOB_ID_PATTERN.match(job_id):
+        return jsonify({
+            'error': '任务ID格式错误'
+        }), 400
+    
+    # 断线重连时从Last-Event-ID之后继续推送
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or '0'
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+    
+    # 订阅只等待内存中的事件，不访问数据库
+    response = Response(progress_broker.stream(job_id, last_event_id),
+                        content_type='text/event-stream; charset=utf-8')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _invalidate_scripts(*ids):
+    """脚本写入后清除按脚本ID或提纲ID缓存的校验值"""
+    for item_id in ids:
+        validator_cache.invalidate(f"script:{item_id}", f"script:{item_id}:raw")
+
+def _similar_outlines(key: str, prefix: str, threshold: float = SIMILARITY_THRESHOLD) -> list:
+    """查询相似内容索引，文档键转换为提纲ID"""
+    return [{'outline_id': item_key.split(':', 1)[1], 'similarity': similarity}
+            for item_key, similarity in similarity_index.similar(key, prefix, threshold) or []]
+
+def _index_outline(outline_id, title: str, sections: list) -> list:
+    """更新提纲在相似内容索引中的签名，返回与其相似的其他提纲；索引失败不影响调用方"""
+    key = f"outline:{outline_id}"
+    try:
+        similarity_index.add(key, outline_text(title, sections))
+        return _similar_outlines(key, 'outline:')
+    except Exception as e:
+        logger.warning(f"更新提纲相似内容索引失败: {str(e)}")
+        return []
+
+def _index_script(outline_id, content):
+    """在后台线程中更新提纲最新脚本的签名，不阻塞请求线程，返回Future"""
+    return similarity_worker.submit(_sign_script, outline_id, content)
+
+def _sign_script(outline_id, content) -> bool:
+    """更新提纲最新脚本在相似内容索引中的签名，content为脚本字典或存储的JSON字符串"""
+    try:
+        if isinstance(content, str):
+            content = json_provider.loads(content)
+        text = content.get('raw_content') or '\n'.join(
+            str(section.get('content', '') if isinstance(section, dict) else section)
+            for section in content.get('sections') or [])
+        return similarity_index.add(f"script:{outline_id}", text) is not None
+    except Exception as e:
+        logger.warning(f"更新脚本相似内容索引失败: {str(e)}")
+        return False
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
     return jsonify({
         'status': 'ok',
-        'message': 'Testiflow Studio API服务正常运行'
+        'message': 'Testiflow Studio API服务正常运行',
+        'llm_endpoints': model_router.status()
     })
 
 @app.route('/api/templates', methods=['GET'])
 def list_templates():
     """获取所有可用模板"""
+    # 模板ETag由文件修改时间决定，未变化时无需读取目录内容
+    etag = files_etag(TemplateLoader.get_template_files())
+    if etag_matches(request, etag):
+        return not_modified(etag, 'templates')
+    
     templates = TemplateLoader.list_templates()
-    return jsonify({
+    return conditional(request, jsonify({
         'templates': templates
-    })
+    }), 'templates', etag=etag)
 
 @app.route('/api/templates/<template_name>', methods=['GET'])
 def get_template(template_name):
     """获取指定模板内容"""
+    # 模板文件不存在时ETag为固定值，且If-None-Match: *总是匹配，必须先确认模板存在再比较
+    paths = [path for path in TemplateLoader.get_template_paths(template_name) if os.path.isfile(path)]
+    if not paths:
+        return jsonify({
+            'error': f'模板 {template_name} 不存在'
+        }), 404
+    
+    etag = files_etag(paths)
+    if etag_matches(request, etag):
+        return not_modified(etag, 'templates')
+    
     template = TemplateLoader.load_template(template_name)
     if not template:
         return jsonify({
             'error': f'模板 {template_name} 不存在'
         }), 404
     
-    return jsonify({
+    return conditional(request, jsonify({
         'template': template
-    })
+    }), 'templates', etag=etag)
 
 @app.route('/api/generate/outline', methods=['POST'])
 def generate_outline():
@@ -117,7 +515,7 @@ def generate_script_by_id(outline_id):
         
         logger.info(f"开始处理请求，outline_id: {outline_id}")
         data = request.json or {}
-        logger.info(f"请求参数: {data}")
+        logger.debug("请求参数: %s", lazy_json(data))
         
         # 检查outline_id是否为数字（数据库ID）
         if outline_id.isdigit():
@@ -125,6 +523,8 @@ def generate_script_by_id(outline_id):
             outline_obj = OutlineOperations.get_outline_by_id(outline_id)
             if outline_obj:
                 logger.info(f"成功获取提纲数据，标题: {outline_obj.title}")
+                report("outline_loaded", outline_id=outline_id, title=outline_obj.title,
+                       section_count=len(outline_obj.sections))
                 # 构建提纲数据
                 title = outline_obj.title
                 outline_sections = [{
@@ -138,38 +538,47 @@ def generate_script_by_id(outline_id):
                 tone = data.get('tone', '简洁')
                 audience = data.get('audience', '通用')
                 
-                # 生成脚本
-                logger.info("开始生成脚本...")
-                # 将outline_sections包装在字典中，以符合generate_script方法的期望格式
-                outline_dict = {"sections": outline_sections}
-                script = video_script_generator.generate_script(title, outline_dict, style, tone, audience)
-                logger.info("脚本生成完成")
+                # 保存提纲后已按相同内容和参数预生成时直接使用
+                script = None
+                if speculative_scripts is not None:
+                    script = speculative_scripts.take(outline_id, title, outline_sections, style, tone, audience)
+                    if script is not None:
+                        logger.info("使用预生成的脚本")
+                        report("speculative_hit", outline_id=outline_id)
+                
+                if script is None:
+                    # 生成脚本
+                    logger.info("开始生成脚本...")
+                    # 将outline_sections包装在字典中，以符合generate_script方法的期望格式
+                    outline_dict = {"sections": outline_sections}
+                    script = video_script_generator.generate_script(title, outline_dict, style, tone, audience)
+                    logger.info("脚本生成完成")
                 
                 # 添加ID字段，用于前端跳转
                 script['id'] = outline_id
                 
                 # 保存脚本到数据库
                 try:
-                    # 检查是否已存在该提纲的脚本
-                    existing_script = ScriptOperations.get_script_by_outline(outline_id)
-                    script_id = existing_script.script_id if existing_script else str(uuid.uuid4())
-                    
-                    # 将脚本内容转换为JSON字符串
-                    import json
-                    script_content = json.dumps(script, ensure_ascii=False)
+                    # 将脚本内容转换为JSON字符串，token预算只在本次响应中返回
+                    script_content = json_provider.dumps({k: v for k, v in script.items() if k != 'budget'})
                     
-                    # 创建脚本对象
+                    # 创建脚本对象，已存在该提纲的脚本时沿用原脚本ID
                     script_obj = Script(
-                        script_id=script_id,
+                        script_id=str(uuid.uuid4()),
                         outline_id=outline_id,
                         content=script_content,
                         created_at=datetime.now()
                     )
                     
-                    # 保存到数据库
-                    success = ScriptOperations.create_script(script_obj)
-                    if success:
-                        logger.info(f"脚本保存成功，ID: {script_id}")
+                    # 保存为该提纲的新版本
+                    version = ScriptOperations.save_script_version(script_obj)
+                    if version:
+                        script_id = script_obj.script_id
+                        script['version'] = version
+                        _invalidate_scripts(outline_id, script_id)
+                        _index_script(outline_id, script)
+                        report("saved", script_id=script_id, version=version)
+                        logger.info(f"脚本保存成功，ID: {script_id}，版本: {version}")
                     else:
                         logger.warning(f"脚本保存失败")
                 except Exception as e:
@@ -207,6 +616,7 @@ def generate_script_by_id(outline_id):
             return jsonify({
                 'error': '提纲文件格式错误，缺少必要字段: title, outline'
             }), 400
+        report("outline_loaded", outline_id=os.path.basename(outline_id), title=title)
         
         # 获取可选参数
         data = request.json or {}
@@ -231,9 +641,8 @@ def generate_script_by_id(outline_id):
             # 生成脚本ID
             script_id = str(uuid.uuid4())
             
-            # 将脚本内容转换为JSON字符串
-            import json
-            script_content = json.dumps(script, ensure_ascii=False)
+            # 将脚本内容转换为JSON字符串，token预算只在本次响应中返回
+            script_content = json_provider.dumps({k: v for k, v in script.items() if k != 'budget'})
             
             # 创建脚本对象
             script_obj = Script(
@@ -246,6 +655,8 @@ def generate_script_by_id(outline_id):
             # 保存到数据库
             success = ScriptOperations.create_script(script_obj)
             if success:
+                _invalidate_scripts(file_id, script_id)
+                report("saved", script_id=script_id)
                 logger.info(f"脚本保存成功，ID: {script_id}，提纲ID: {file_id}")
             else:
                 logger.warning(f"脚本保存失败")
@@ -282,15 +693,23 @@ def generate_custom():
         # 渲染模板
         rendered_template = TemplateLoader.render_template(template, variables)
         
-        # 生成内容
+        # 生成内容，JSON模板的system字段不含变量，作为缓存前缀发送
         prompt = rendered_template
+        prefix = ()
+        params = {}
         if isinstance(rendered_template, str) and rendered_template.startswith("{"):
             import json
             prompt_data = json.loads(rendered_template)
             prompt = prompt_data.get("prompt", rendered_template)
+            if prompt_data.get("system"):
+                prefix = (prompt_data["system"],)
+            # 模板可以指定模型和生成参数，模型决定路由到哪个端点
+            params = {key: prompt_data[key] for key in ("model", "temperature", "top_p", "max_tokens")
+                      if prompt_data.get(key) is not None}
         
         # 调用API
-        response = api_client.generate_content(prompt)
+        response = model_router.generate_content(prompt, params=params, prefix=prefix,
+                                                 task=f"template:{template_name}")
         
         return jsonify(response)
     except Exception as e:
@@ -311,13 +730,14 @@ def generate_section_content():
     title = data.get('title')
     
     try:
-        # 构建提示词
-        prompt = f"请为标题为《{title}》的视频章节生成详细的内容。内容应该清晰、有条理，并且包含相关的要点和细节。"
-        prompt += "\n\n生成的内容应该是一段连贯的文字，不需要包含标题，直接从正文内容开始。"
+        from src.script_generator.video_script import SECTION_INSTRUCTIONS
+        
+        # 固定说明作为缓存前缀，提示词只包含章节标题
+        prompt = f"视频章节标题：《{title}》"
         
         # 调用API生成内容
         logger.info(f"正在为章节《{title}》生成内容...")
-        response = api_client.generate_content(prompt)
+        response = model_router.generate_content(prompt, prefix=(SECTION_INSTRUCTIONS,), task="section")
         
         # 解析生成的内容
         content = response.get("content", "")
@@ -374,11 +794,15 @@ def save_outline():
                 logger.error(f"更新提纲失败: 提纲ID {outline_id} 不存在或数据库操作失败")
                 raise Exception('更新提纲失败')
                 
+            validator_cache.invalidate(f"outline:{outline_id}")
+            if speculative_scripts is not None:
+                # 取消按旧内容进行的预生成，按新内容重新预生成
+                speculative_scripts.schedule(outline_id, title, outline_sections)
             logger.info(f"提纲更新成功, ID: {outline_id}")
-            return jsonify({
+            return jsonify(_with_similar({
                 'message': '提纲更新成功',
                 'outline_id': outline_id
-            })
+            }, _index_outline(outline_id, title, outline_sections)))
         else:
             # 创建新提纲
             new_outline_id = OutlineOperations.create_outline(outline)
@@ -387,11 +811,13 @@ def save_outline():
                 logger.error("保存提纲失败: 数据库操作返回空ID")
                 raise Exception('数据库操作失败')
                 
+            if speculative_scripts is not None:
+                speculative_scripts.schedule(new_outline_id, title, outline_sections)
             logger.info(f"提纲保存成功, ID: {new_outline_id}")
-            return jsonify({
+            return jsonify(_with_similar({
                 'message': '提纲保存成功',
                 'outline_id': new_outline_id
-            })
+            }, _index_outline(new_outline_id, title, outline_sections)))
     except Exception as e:
         logger.error(f"保存提纲失败: {str(e)}", exc_info=True)
         return jsonify({
@@ -399,6 +825,50 @@ def save_outline():
             'details': '请检查数据库连接或联系管理员'
         }), 500
 
+def _with_similar(response_data: dict, similar: list) -> dict:
+    """存在相似提纲时在保存响应中附带提示"""
+    if similar:
+        response_data['warning'] = f'已存在{len(similar)}个相似的提纲'
+        response_data['similar'] = similar
+    return response_data
+
+@app.route('/api/similar/<outline_id>', methods=['GET'])
+def get_similar(outline_id):
+    """查找与提纲及其脚本相似的提纲，只查询内存中的相似内容索引"""
+    outline_key = f"outline:{outline_id}"
+    threshold = request.args.get('threshold', default=SIMILARITY_THRESHOLD, type=float)
+    if not 0 < threshold <= 1:
+        return jsonify({
+            'error': 'threshold应在0到1之间'
+        }), 400
+    
+    try:
+        if outline_key not in similarity_index:
+            # 索引中没有的提纲(如启用索引前保存的)首次查询时从数据库补充
+            from src.database.operations import OutlineOperations, ScriptOperations
+            outline = OutlineOperations.get_outline_by_id(outline_id)
+            if not outline:
+                return jsonify({
+                    'error': f'提纲不存在: ID {outline_id}'
+                }), 404
+            _index_outline(outline_id, outline.title,
+                           [{'title': section.title, 'content': section.content} for section in outline.sections])
+            script = ScriptOperations.get_script_by_outline(outline_id)
+            if script and script.content:
+                # 响应需要包含脚本的查询结果，只有首次查询的提纲在请求线程中计算签名
+                _sign_script(outline_id, script.content)
+        
+        return jsonify({
+            'outline_id': outline_id,
+            'outlines': _similar_outlines(outline_key, 'outline:', threshold),
+            'scripts': _similar_outlines(f"script:{outline_id}", 'script:', threshold)
+        })
+    except Exception as e:
+        logger.error(f"查询相似提纲失败: {str(e)}")
+        return jsonify({
+            'error': f'查询相似提纲失败: {str(e)}'
+        }), 500
+
 def create_app():
     """创建并返回Flask应用实例"""
     return app
@@ -432,6 +902,12 @@ def get_outline(outline_id):
     """根据提纲ID获取提纲内容"""
     from src.database.operations import OutlineOperations
     
+    # 客户端缓存的版本仍然有效时直接返回304，不访问数据库
+    cache_key = f"outline:{outline_id}"
+    cached = cached_not_modified(request, validator_cache, cache_key, 'outline')
+    if cached is not None:
+        return cached
+    
     try:
         outline = OutlineOperations.get_outline_by_id(outline_id)
         if not outline:
@@ -439,20 +915,100 @@ def get_outline(outline_id):
                 'error': f'获取提纲失败: 提纲ID {outline_id} 不存在'
             }), 404
             
-        return jsonify({
+        return conditional(request, jsonify({
             'title': outline.title,
             'outline': [{
                 'title': section.title,
                 'content': section.content
             } for section in outline.sections],
             'created_at': outline.created_at
-        })
+        }), 'outline', validator_cache, cache_key)
     except Exception as e:
         logger.error(f"获取提纲失败: {str(e)}")
         return jsonify({
             'error': f'获取提纲失败: {str(e)}'
         }), 500
 
+def _parse_batch_request(allowed_fields: tuple, default_fields: tuple):
+    """解析批量查询请求体中的ID列表和字段投影
+    
+    Returns:
+        (ID列表, 字段集合, 错误响应)，参数合法时错误响应为None
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return None, None, (jsonify({
+            'error': '缺少必要参数: ids'
+        }), 400)
+    if len(ids) > BATCH_MAX_IDS:
+        return None, None, (jsonify({
+            'error': f'ids数量不能超过{BATCH_MAX_IDS}'
+        }), 400)
+    
+    fields = data.get('fields') or default_fields
+    if not isinstance(fields, (list, tuple)):
+        return None, None, (jsonify({
+            'error': 'fields必须为数组'
+        }), 400)
+    unknown = [field for field in fields if field not in allowed_fields]
+    if unknown:
+        return None, None, (jsonify({
+            'error': f'不支持的字段: {", ".join(map(str, unknown))}',
+            'allowed_fields': list(allowed_fields)
+        }), 400)
+    
+    # 去重并保持请求顺序
+    ids = list(dict.fromkeys(str(item_id) for item_id in ids))
+    return ids, set(fields), None
+
+@app.route('/api/outlines/batch', methods=['POST'])
+def get_outlines_batch():
+    """批量获取提纲，支持字段投影"""
+    from src.database.operations import OutlineOperations
+    
+    ids, fields, error = _parse_batch_request(OUTLINE_BATCH_FIELDS, ('title', 'outline', 'created_at'))
+    if error:
+        return error
+    
+    try:
+        # 提纲ID为自增整数，其他格式的ID直接视为不存在
+        valid_ids = [item_id for item_id in ids if item_id.isdigit()]
+        include_sections = 'outline' in fields or 'outline.title' in fields
+        outlines = OutlineOperations.get_outlines_by_ids(
+            valid_ids, include_sections=include_sections, include_content='outline' in fields)
+        
+        items = []
+        for outline_id in ids:
+            outline = outlines.get(outline_id)
+            if not outline:
+                continue
+            item = {'id': outline_id}
+            if 'title' in fields:
+                item['title'] = outline.title
+            if include_sections:
+                item['outline'] = [{
+                    'title': section.title,
+                    'content': section.content
+                } if 'outline' in fields else {
+                    'title': section.title
+                } for section in outline.sections]
+            if 'created_at' in fields:
+                item['created_at'] = outline.created_at
+            if 'updated_at' in fields:
+                item['updated_at'] = outline.updated_at
+            items.append(item)
+        
+        return jsonify({
+            'outlines': items,
+            'missing': [outline_id for outline_id in ids if outline_id not in outlines]
+        })
+    except Exception as e:
+        logger.error(f"批量获取提纲失败: {str(e)}")
+        return jsonify({
+            'error': f'批量获取提纲失败: {str(e)}'
+        }), 500
+
 @app.route('/api/script/list', methods=['GET'])
 def get_script_list():
     """获取脚本列表"""
@@ -477,11 +1033,57 @@ def get_script_list():
             'error': f'获取脚本列表失败: {str(e)}'
         }), 500
 
+def _format_script(script, script_content: dict) -> dict:
+    """将存储的脚本JSON整理为前端期望的结构"""
+    # 确保脚本内容符合预期的JSON格式
+    # 处理sections字段，确保它是一个包含content的数组
+    sections = script_content.get('sections', [])
+    if not isinstance(sections, list):
+        sections = []
+    
+    # 确保每个section都有content字段，并且处理好格式
+    processed_sections = []
+    for section in sections:
+        if not isinstance(section, dict):
+            processed_sections.append({"content": str(section)})
+        elif "content" not in section:
+            section_copy = section.copy()
+            section_copy["content"] = ""
+            processed_sections.append(section_copy)
+        else:
+            processed_sections.append(section)
+    
+    # 更新sections为处理后的数组
+    sections = processed_sections
+    
+    # 构建前端期望的数据结构
+    response_data = {
+        'outline_id': script.outline_id,
+        'title': script_content.get('title', ''),
+        'content': sections,
+        'created_at': script.created_at,
+        'updated_at': script.created_at,  # 数据库模型中可能没有updated_at字段，暂用created_at
+        'version': script.version
+    }
+
+    # 如果有raw_content字段，也包含在响应中
+    if 'raw_content' in script_content:
+        response_data['raw_content'] = script_content['raw_content']
+    
+    return response_data
+
 @app.route('/api/script/<script_id>', methods=['GET'])
 def get_script(script_id):
     """根据脚本ID获取脚本内容"""
     from src.database.operations import ScriptOperations
-    import json
+    from werkzeug.http import http_date
+    
+    # 原样返回和重组后的响应体不同，分别缓存校验值
+    raw = request.args.get('raw') == '1'
+    cache_key = f"script:{script_id}:raw" if raw else f"script:{script_id}"
+    cached = cached_not_modified(request, validator_cache, cache_key, 'script')
+    if cached is not None:
+        return cached
     
     try:
         # 首先尝试直接通过script_id获取脚本
@@ -501,56 +1103,289 @@ def get_script(script_id):
                 'error': f'脚本内容为空或格式不正确'
             }), 500
             
+        # raw=1时直接返回存储的JSON，省去解析和重新编码
+        if raw:
+            response = Response(script.content, content_type='application/json; charset=utf-8')
+            response.headers['X-Outline-Id'] = str(script.outline_id)
+            response.headers['X-Created-At'] = http_date(script.created_at)
+            return conditional(request, response, 'script', validator_cache, cache_key)
+            
         try:
             # 将JSON字符串转换为Python对象
-            script_content = json.loads(script.content)
-        except json.JSONDecodeError as json_err:
+            script_content = json_provider.loads(script.content)
+        except json_provider.JSONDecodeError as json_err:
             logger.error(f"脚本内容JSON解析失败: {str(json_err)}")
             return jsonify({
                 'error': f'脚本内容格式不正确，无法解析JSON: {str(json_err)}'
             }), 500
         
-        # 确保脚本内容符合预期的JSON格式
-        # 处理sections字段，确保它是一个包含content的数组
-        sections = script_content.get('sections', [])
-        if not isinstance(sections, list):
-            sections = []
-        
-        # 确保每个section都有content字段，并且处理好格式
-        processed_sections = []
-        for section in sections:
-            if not isinstance(section, dict):
-                processed_sections.append({"content": str(section)})
-            elif "content" not in section:
-                section_copy = section.copy()
-                section_copy["content"] = ""
-                processed_sections.append(section_copy)
-            else:
-                processed_sections.append(section)
-        
-        # 更新sections为处理后的数组
-        sections = processed_sections
-        
-        # 构建前端期望的数据结构
-        response_data = {
-            'outline_id': script.outline_id,
-            'title': script_content.get('title', ''),
-            'content': sections,
-            'created_at': script.created_at,
-            'updated_at': script.created_at  # 数据库模型中可能没有updated_at字段，暂用created_at
-        }
-
-        # 如果有raw_content字段，也包含在响应中
-        if 'raw_content' in script_content:
-            response_data['raw_content'] = script_content['raw_content']
-
-        return jsonify(response_data)
+        return conditional(request, jsonify(_format_script(script, script_content)),
+                           'script', validator_cache, cache_key)
     except Exception as e:
         logger.error(f"获取脚本失败: {str(e)}")
         return jsonify({
             'error': f'获取脚本失败: {str(e)}'
         }), 500
 
+@app.route('/api/script/<outline_id>/versions', methods=['GET'])
+def list_script_versions(outline_id):
+    """获取提纲的脚本版本列表(只包含元数据)"""
+    from src.database.operations import ScriptOperations
+    
+    versions = ScriptOperations.list_script_versions(outline_id)
+    if versions is None:
+        return jsonify({
+            'error': '获取脚本版本列表失败'
+        }), 500
+    
+    return jsonify({
+        'outline_id': outline_id,
+        'versions': versions
+    })
+
+@app.route('/api/script/<outline_id>/versions/<int:version>', methods=['GET'])
+def get_script_version(outline_id, version):
+    """获取提纲脚本的指定历史版本"""
+    from src.database.operations import ScriptOperations
+    
+    # 历史版本内容不再变化，校验值命中时无需重建
+    cache_key = f"script:{outline_id}:v{version}"
+    cached = cached_not_modified(request, validator_cache, cache_key, 'script')
+    if cached is not None:
+        return cached
+    
+    script = ScriptOperations.get_script_version(outline_id, version)
+    if not script:
+        return jsonify({
+            'error': f'脚本版本不存在: 提纲ID {outline_id}，版本 {version}'
+        }), 404
+    
+    try:
+        script_content = json_provider.loads(script.content)
+    except json_provider.JSONDecodeError as json_err:
+        logger.error(f"脚本版本JSON解析失败: {str(json_err)}")
+        return jsonify({
+            'error': f'脚本内容格式不正确，无法解析JSON: {str(json_err)}'
+        }), 500
+    if not isinstance(script_content, dict):
+        return jsonify({
+            'error': '脚本内容格式不正确'
+        }), 500
+    
+    return conditional(request, jsonify(_format_script(script, script_content)),
+                       'script', validator_cache, cache_key)
+
+@app.route('/api/script/<script_id>/subtitles', methods=['GET'])
+def get_script_subtitles(script_id):
+    """根据存储的脚本生成SRT/ASS字幕，ID可以是脚本ID或提纲ID"""
+    from src.database.operations import ScriptOperations
+    from src.video_generator.subtitles import generate_subtitles, subtitle_key, MIMETYPES, SRT
+    
+    fmt = request.args.get('format', SRT).lower()
+    if fmt not in MIMETYPES:
+        return jsonify({
+            'error': f'不支持的字幕格式: {fmt}，可选 {", ".join(MIMETYPES)}'
+        }), 400
+    
+    options = {}
+    try:
+        # durations为逗号分隔的各章节(素材)时长
+        if request.args.get('durations'):
+            options['durations'] = [float(item) for item in request.args['durations'].split(',')]
+        if request.args.get('cps'):
+            options['chars_per_second'] = float(request.args['cps'])
+        version = int(request.args['version']) if request.args.get('version') else None
+    except ValueError:
+        return jsonify({
+            'error': '参数格式错误: durations 为逗号分隔的秒数，cps 和 version 为数字'
+        }), 400
+    if any(value <= 0 for value in options.get('durations', [])) or options.get('chars_per_second', 1) <= 0:
+        return jsonify({
+            'error': 'durations 和 cps 必须大于0'
+        }), 400
+    
+    if version is not None:
+        script = ScriptOperations.get_script_version(script_id, version)
+    else:
+        script = ScriptOperations.get_script(script_id) or ScriptOperations.get_script_by_outline(script_id)
+    if not script:
+        return jsonify({
+            'error': f'脚本不存在: {script_id}'
+        }), 404
+    
+    try:
+        # 同一脚本版本和参数的字幕会被缓存
+        body = generate_subtitles(script.content or '', fmt, **options)
+    except ValueError as e:
+        logger.error(f"生成字幕失败: {str(e)}")
+        return jsonify({
+            'error': f'生成字幕失败: {str(e)}'
+        }), 500
+    
+    response = Response(body, content_type=f"{MIMETYPES[fmt]}; charset=utf-8")
+    response.headers['Content-Disposition'] = f'inline; filename="{script.outline_id}-v{script.version}.{fmt}"'
+    return conditional(request, response, 'script', etag=subtitle_key(script.content or '', fmt, **options))
+
+@app.route('/api/scripts/batch', methods=['POST'])
+def get_scripts_batch():
+    """批量获取脚本，ID可以是脚本ID或提纲ID，支持字段投影"""
+    from src.database.operations import ScriptOperations
+    
+    ids, fields, error = _parse_batch_request(SCRIPT_BATCH_FIELDS, SCRIPT_BATCH_FIELDS)
+    if error:
+        return error
+    
+    try:
+        # 只需要元数据时不读取脚本内容列
+        include_content = bool(fields & {'title', 'content', 'raw_content'})
+        scripts = ScriptOperations.get_scripts_by_ids(ids, include_content=include_content)
+        
+        items = []
+        for script_id in ids:
+            script = scripts.get(script_id)
+            if not script:
+                continue
+            data = {
+                'outline_id': script.outline_id,
+                'created_at': script.created_at,
+                'updated_at': script.created_at,
+                'version': script.version
+            }
+            if include_content:
+                try:
+                    script_content = json_provider.loads(script.content or '')
+                except json_provider.JSONDecodeError:
+                    script_content = None
+                if not isinstance(script_content, dict):
+                    items.append({'id': script_id, 'error': '脚本内容格式不正确'})
+                    continue
+                data = _format_script(script, script_content)
+            item = {'id': script_id}
+            item.update({field: data[field] for field in SCRIPT_BATCH_FIELDS if field in fields and field in data})
+            items.append(item)
+        
+        return jsonify({
+            'scripts': items,
+            'missing': [script_id for script_id in ids if script_id not in scripts]
+        })
+    except Exception as e:
+        logger.error(f"批量获取脚本失败: {str(e)}")
+        return jsonify({
+            'error': f'批量获取脚本失败: {str(e)}'
+        }), 500
+
+def _render_job_response(job):
+    data = job.to_dict()
+    data['status_url'] = f"/api/render/{job.job_id}"
+    data['progress_url'] = f"/api/progress/{job.job_id}"
+    if data['output']:
+        data['download_url'] = f"/api/render/{job.job_id}/output"
+    return data
+
+@app.route('/api/render', methods=['POST'])
+def create_render():
+    """提交脚本渲染任务，立即返回任务ID，渲染在后台执行"""
+    from src.database.operations import ScriptOperations
+    from src.video_generator.render import render_scheduler, resolve_media_path, build_timeline
+    
+    data = request.get_json(silent=True) or {}
+    script_id = data.get('script_id') or data.get('outline_id')
+    clips = data.get('clips')
+    if not script_id:
+        return jsonify({
+            'error': '缺少必要参数: script_id 或 outline_id'
+        }), 400
+    if not isinstance(clips, list) or not clips or not all(isinstance(clip, str) for clip in clips):
+        return jsonify({
+            'error': 'clips 必须是非空的素材名列表'
+        }), 400
+    durations = data.get('durations')
+    if durations is not None and (not isinstance(durations, list) or
+                                  not all(isinstance(d, (int, float)) and d > 0 for d in durations)):
+        return jsonify({
+            'error': 'durations 必须是正数列表'
+        }), 400
+    version = data.get('version')
+    if isinstance(version, str) and version.isdigit():
+        version = int(version)
+    if version is not None and (isinstance(version, bool) or not isinstance(version, int) or version < 1):
+        return jsonify({
+            'error': 'version 必须是正整数'
+        }), 400
+    subtitles = data.get('subtitles', True)
+    if not isinstance(subtitles, bool):
+        return jsonify({
+            'error': 'subtitles 必须是布尔值'
+        }), 400
+    
+    try:
+        if version is not None:
+            script = ScriptOperations.get_script_version(str(script_id), version)
+        else:
+            script = ScriptOperations.get_script(str(script_id)) or ScriptOperations.get_script_by_outline(str(script_id))
+        if not script:
+            return jsonify({
+                'error': f'脚本不存在: {script_id}'
+            }), 404
+        
+        script_content = json_provider.loads(script.content or '')
+        if not isinstance(script_content, dict):
+            raise ValueError('脚本内容格式不正确')
+        timeline = build_timeline(script_content, [resolve_media_path(clip) for clip in clips], durations)
+    except (ValueError, json_provider.JSONDecodeError) as e:
+        return jsonify({
+            'error': str(e)
+        }), 400
+    
+    job = render_scheduler.submit(timeline, subtitles=subtitles)
+    if job is None:
+        response = jsonify({
+            'error': '渲染任务过多，请稍后重试'
+        })
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    logger.info(f"提交渲染任务: {job.job_id}, 脚本: {script_id}, 章节数: {len(timeline)}")
+    return jsonify(_render_job_response(job)), 202
+
+@app.route('/api/render/<job_id>', methods=['GET'])
+def get_render(job_id):
+    """查询渲染任务状态"""
+    from src.video_generator.render import render_scheduler
+    
+    job = render_scheduler.get(job_id)
+    if job is None:
+        return jsonify({
+            'error': f'渲染任务不存在: {job_id}'
+        }), 404
+    return jsonify(_render_job_response(job))
+
+@app.route('/api/render/<job_id>/cancel', methods=['POST'])
+def cancel_render(job_id):
+    """取消排队中或运行中的渲染任务"""
+    from src.video_generator.render import render_scheduler
+    
+    job = render_scheduler.cancel(job_id)
+    if job is None:
+        return jsonify({
+            'error': f'渲染任务不存在: {job_id}'
+        }), 404
+    return jsonify(_render_job_response(job)), 202
+
+@app.route('/api/render/<job_id>/output', methods=['GET'])
+def download_render(job_id):
+    """下载渲染完成的视频"""
+    from flask import send_file
+    from src.video_generator.render import render_scheduler, COMPLETED
+    
+    job = render_scheduler.get(job_id)
+    if job is None or job.status != COMPLETED or not os.path.exists(job.output_path):
+        return jsonify({
+            'error': f'渲染结果不存在: {job_id}'
+        }), 404
+    return send_file(job.output_path, mimetype='video/mp4', conditional=True,
+                     download_name=f"{job_id}.mp4")
+
 if __name__ == '__main__':
     # 仅在直接运行此文件时启动服务器
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
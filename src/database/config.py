@@ -4,6 +4,8 @@ import mysql.connector
 from mysql.connector import Error
 from mysql.connector.pooling import MySQLConnectionPool
 
+from src.utils.metrics import DB_POOL_IN_USE, DB_POOL_SIZE, DB_POOL_CHECKOUT_FAILURES, mark_failed
+
 class DatabaseConfig:
     """
     数据库配置类，用于管理MySQL数据库连接
@@ -12,6 +14,7 @@ class DatabaseConfig:
     def __init__(self):
         self.pool = None
         self._initialize_pool()
+        DB_POOL_IN_USE.set_function(self._connections_in_use)
     
     def _initialize_pool(self):
         """初始化数据库连接池"""
@@ -36,9 +39,19 @@ class DatabaseConfig:
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     title VARCHAR(255) NOT NULL,
                     created_at DATETIME NOT NULL,
-                    updated_at DATETIME NOT NULL
+                    updated_at DATETIME NOT NULL,
+                    content_hash CHAR(32) NULL,
+                    INDEX idx_outlines_content_hash (content_hash)
                 )""")
             
+            # 旧版本创建的outlines表没有内容哈希列，需要补充
+            cursor.execute("SHOW COLUMNS FROM outlines LIKE 'content_hash'")
+            if not cursor.fetchall():
+                cursor.execute("""
+                    ALTER TABLE outlines
+                    ADD COLUMN content_hash CHAR(32) NULL,
+                    ADD INDEX idx_outlines_content_hash (content_hash)""")
+            
             # 创建outline_sections表
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS outline_sections (
@@ -56,6 +69,28 @@ class DatabaseConfig:
                     outline_id INT NOT NULL,
                     content TEXT NOT NULL,
                     created_at DATETIME NOT NULL,
+                    version INT NOT NULL DEFAULT 1,
+                    FOREIGN KEY (outline_id) REFERENCES outlines(id) ON DELETE CASCADE
+                )""")
+            
+            # 旧版本创建的scripts表没有版本号列，需要补充
+            cursor.execute("SHOW COLUMNS FROM scripts LIKE 'version'")
+            if not cursor.fetchall():
+                cursor.execute("ALTER TABLE scripts ADD COLUMN version INT NOT NULL DEFAULT 1")
+            
+            # 创建script_versions表
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS script_versions (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    outline_id INT NOT NULL,
+                    script_id VARCHAR(36) NOT NULL,
+                    version INT NOT NULL,
+                    kind VARCHAR(8) NOT NULL,
+                    payload MEDIUMBLOB NOT NULL,
+                    content_size INT NOT NULL,
+                    stored_size INT NOT NULL,
+                    created_at DATETIME NOT NULL,
+                    UNIQUE KEY uk_script_versions_outline_version (outline_id, version),
                     FOREIGN KEY (outline_id) REFERENCES outlines(id) ON DELETE CASCADE
                 )""")
             
@@ -63,6 +98,7 @@ class DatabaseConfig:
             cursor.close()
             conn.close()
             
+            DB_POOL_SIZE.set(self.pool.pool_size)
             print("数据库连接池初始化成功")
         except Error as e:
             print(f"数据库连接池初始化失败: {e}")
@@ -75,8 +111,20 @@ class DatabaseConfig:
         try:
             return self.pool.get_connection()
         except Error as e:
+            DB_POOL_CHECKOUT_FAILURES.inc()
+            mark_failed()
             print(f"获取数据库连接失败: {e}")
             return None
+    
+    def _connections_in_use(self) -> float:
+        """当前已借出的连接数，供指标采集使用"""
+        if not self.pool:
+            return 0
+        # 连接池未公开空闲数量，只能通过内部队列估算；mysql-connector改动内部实现后上报为NaN
+        idle = getattr(self.pool, "_cnx_queue", None)
+        if idle is None:
+            return float('nan')
+        return self.pool.pool_size - idle.qsize()
 
 # 全局数据库配置实例
 db_config = DatabaseConfig()
\ No newline at end of file
@@ -1,10 +1,30 @@
+import hashlib
+import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
 
-class OutlineSection:
+class _Model:
+    """
+    模型基类：子类用__slots__声明属性，不为每个实例创建__dict__，批量读取时占用更少内存
+    """
+    __slots__ = ()
+    # 数据库列名到属性名的映射，同名的列不需要列出
+    COLUMNS: Dict[str, str] = {}
+    # 查询结果中没有的属性的默认值，可调用对象在每次映射时调用
+    DEFAULTS: Dict[str, Any] = {}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name, None)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class OutlineSection(_Model):
     """
     提纲章节模型
     """
+    __slots__ = ("section_id", "title", "content")
+    COLUMNS = {"id": "section_id"}
+    DEFAULTS = {"section_id": None, "content": None}
+
     def __init__(self, 
                  title: str, 
                  content: Optional[str] = None,
@@ -13,10 +33,14 @@ class OutlineSection:
         self.title = title
         self.content = content
 
-class Outline:
+class Outline(_Model):
     """
     视频提纲模型
     """
+    __slots__ = ("outline_id", "title", "sections", "created_at", "updated_at")
+    COLUMNS = {"id": "outline_id"}
+    DEFAULTS = {"outline_id": None, "sections": list, "created_at": datetime.now, "updated_at": datetime.now}
+
     def __init__(self, 
                  title: str, 
                  outline_id: Optional[str] = None,
@@ -29,16 +53,85 @@ class Outline:
         self.created_at = created_at or datetime.now()
         self.updated_at = updated_at or datetime.now()
 
-class Script:
+    def content_hash(self) -> str:
+        """
+        根据标题和章节内容计算哈希，用于识别重复保存的提纲
+        :return: 32位十六进制字符串
+        """
+        payload = [self.title.strip(), [[section.title.strip(), (section.content or '').strip()]
+                                        for section in self.sections]]
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class Script(_Model):
     """
     视频脚本模型
     """
+    __slots__ = ("script_id", "outline_id", "content", "created_at", "version")
+    COLUMNS = {"id": "script_id"}
+    DEFAULTS = {"content": None, "created_at": datetime.now, "version": 1}
+
     def __init__(self, 
                  script_id: str, 
                  outline_id: str,
                  content: str,
-                 created_at: Optional[datetime] = None):
+                 created_at: Optional[datetime] = None,
+                 version: int = 1):
         self.script_id = script_id
         self.outline_id = outline_id
         self.content = content
-        self.created_at = created_at or datetime.now()
\ No newline at end of file
+        self.created_at = created_at or datetime.now()
+        self.version = version
+
+class RowMapper:
+    """
+    将元组游标返回的行直接映射为模型对象
+
+    列到属性的对应关系在创建时计算一次；映射时不调用模型的__init__，按位置直接给__slots__赋值，
+    不需要dictionary=True游标为每行构造的中间字典。
+    :param model: 模型类
+    :param columns: SELECT的列，顺序与行中的值一致；表达式需要用AS指定列名，如 CAST(id AS CHAR) AS id
+    """
+    __slots__ = ("model", "columns", "names", "_setters", "_defaults")
+
+    def __init__(self, model: type, columns: Sequence[str]):
+        self.model = model
+        self.columns = ", ".join(columns)
+        self.names = tuple(self._column_name(column) for column in columns)
+        fields = [model.COLUMNS.get(name, name) for name in self.names]
+        unknown = [field for field in fields if field not in model.__slots__]
+        if unknown:
+            raise ValueError(f"{model.__name__}没有属性: {', '.join(unknown)}")
+        # __slots__的每个属性在类上是一个描述符，直接调用其__set__赋值
+        self._setters = tuple(getattr(model, field).__set__ for field in fields)
+        self._defaults = tuple(
+            (getattr(model, field).__set__, default if callable(default) else (lambda value=default: value))
+            for field, default in model.DEFAULTS.items() if field not in fields)
+
+    @staticmethod
+    def _column_name(column: str) -> str:
+        upper = column.upper()
+        if " AS " in upper:
+            return column[upper.rindex(" AS ") + 4:].strip()
+        return column.rsplit(".", 1)[-1].strip()
+
+    def map(self, row: Sequence[Any]) -> Any:
+        """
+        映射一行
+        :param row: 与columns顺序一致的值
+        :return: 模型对象
+        """
+        obj = self.model.__new__(self.model)
+        for setter, value in zip(self._setters, row):
+            setter(obj, value)
+        for setter, factory in self._defaults:
+            setter(obj, factory())
+        return obj
+
+    def map_all(self, rows: Iterable[Sequence[Any]]) -> Iterator[Any]:
+        """
+        逐行映射，rows为游标时按需读取，不会一次取出所有行
+        :param rows: 行的可迭代对象
+        :return: 模型对象的迭代器
+        """
+        return map(self.map, rows)
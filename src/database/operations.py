@@ -1,9 +1,44 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import json
 import mysql.connector
 from mysql.connector import Error
 from .config import db_config
-from .models import Outline, OutlineSection, Script
+from .models import Outline, OutlineSection, Script, RowMapper
+from .versioning import SNAPSHOT, DELTA, to_lines, from_lines, make_delta, encode_payload, rebuild
+from config.constants import SCRIPT_SNAPSHOT_INTERVAL, OUTLINE_DEDUPE_WINDOW
+from src.utils.metrics import DB_LATENCY, timed_operation, mark_failed
+from src.utils.tracing import traced
+
+def _db_operation(func):
+    """记录数据库操作的耗时指标和追踪span"""
+    return traced(phase="db")(timed_operation(DB_LATENCY)(func))
+
+def _placeholders(values: List) -> str:
+    """生成IN查询的参数占位符"""
+    return ", ".join(["%s"] * len(values))
+
+def _close(conn):
+    """归还连接，逐行读取中途停止时先读完剩余结果，否则连接无法复用"""
+    try:
+        conn.consume_results()
+    except Error:
+        pass
+    conn.close()
+
+# 查询使用元组游标和明确的列，行按位置直接映射为模型；提纲ID在SQL中转换为字符串
+_OUTLINE = RowMapper(Outline, ("CAST(id AS CHAR) AS id", "title", "created_at", "updated_at"))
+_SECTION = RowMapper(OutlineSection, ("id", "title", "content"))
+_SECTION_TITLE = RowMapper(OutlineSection, ("id", "title"))
+_SCRIPT = RowMapper(Script, ("id", "outline_id", "content", "created_at", "version"))
+_SCRIPT_META = RowMapper(Script, ("id", "outline_id", "created_at", "version"))
+_JOINED_OUTLINE = RowMapper(Outline, ("CAST(o.id AS CHAR) AS id", "o.title", "o.created_at", "o.updated_at"))
+_JOINED_SECTION = RowMapper(OutlineSection, ("s.id", "s.title", "s.content"))
+_JOINED_SECTION_TITLE = RowMapper(OutlineSection, ("s.id", "s.title"))
+
+# 列表接口返回的字段
+_OUTLINE_LIST_COLUMNS = ("id", "title", "created_at", "updated_at")
+_SCRIPT_LIST_COLUMNS = ("id", "outline_id", "created_at", "outline_title")
 
 class OutlineOperations:
     """
@@ -11,27 +46,53 @@ class OutlineOperations:
     """
     
     @staticmethod
-    def create_outline(outline: Outline) -> Optional[str]:
+    @_db_operation
+    def create_outline(outline: Outline, dedupe_window: float = OUTLINE_DEDUPE_WINDOW) -> Optional[str]:
         """
         创建新提纲
+        只在dedupe_window秒内保存过标题和章节完全相同的提纲时返回其ID，用于吸收重复提交；
+        更早的相同提纲视为用户有意另存，仍然插入。检查和插入期间持有以内容哈希命名的锁，
+        并发提交的相同提纲不会都插入
         :param outline: 提纲对象
+        :param dedupe_window: 去重的时间窗口(秒)，为0时不去重
         :return: 提纲ID
         """
         conn = None
+        lock_name = None
         try:
             conn = db_config.get_connection()
             if not conn:
                 return None
                 
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
+            content_hash = outline.content_hash()
+            
+            if dedupe_window > 0:
+                lock_name = f"outline:{content_hash}"
+                cursor.execute("SELECT GET_LOCK(%s, 5)", (lock_name,))
+                if cursor.fetchone()[0] != 1:
+                    lock_name = None
+                    raise Error(msg="等待提纲去重锁超时")
+                cursor.execute(
+                    """
+                    SELECT id FROM outlines
+                    WHERE content_hash = %s AND created_at >= %s
+                    ORDER BY id DESC
+                    LIMIT 1
+                    """,
+                    (content_hash, datetime.now() - timedelta(seconds=dedupe_window))
+                )
+                existing = cursor.fetchone()
+                if existing:
+                    return str(existing[0])
             
             # 插入提纲主表
             cursor.execute(
                 """
-                INSERT INTO outlines (title, created_at, updated_at)
-                VALUES (%s, %s, %s)
+                INSERT INTO outlines (title, created_at, updated_at, content_hash)
+                VALUES (%s, %s, %s, %s)
                 """,
-                (outline.title, outline.created_at, outline.updated_at)
+                (outline.title, outline.created_at, outline.updated_at, content_hash)
             )
             outline_id = cursor.lastrowid
             
@@ -50,15 +111,23 @@ class OutlineOperations:
             return str(outline_id)
             
         except Error as e:
+            mark_failed()
             print(f"创建提纲失败: {e}")
             if conn:
                 conn.rollback()
             return None
         finally:
             if conn:
+                if lock_name:
+                    try:
+                        cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+                        cursor.fetchone()
+                    except Error:
+                        pass
                 conn.close()
     
     @staticmethod
+    @_db_operation
     def get_outline_by_id(outline_id: str) -> Optional[Outline]:
         """
         获取提纲详情
@@ -71,12 +140,12 @@ class OutlineOperations:
             if not conn:
                 return None
                 
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             # 查询提纲主表
             cursor.execute(
-                """
-                SELECT * FROM outlines 
+                f"""
+                SELECT {_OUTLINE.columns} FROM outlines 
                 WHERE id = %s
                 """,
                 (outline_id,)
@@ -85,39 +154,23 @@ class OutlineOperations:
             
             if not outline_data:
                 return None
+            outline = _OUTLINE.map(outline_data)
             
             # 查询提纲章节
             cursor.execute(
-                """
-                SELECT * FROM outline_sections
+                f"""
+                SELECT {_SECTION.columns} FROM outline_sections
                 WHERE outline_id = %s
                 ORDER BY id
                 """,
                 (outline_id,)
             )
-            sections_data = cursor.fetchall()
-            
-            # 构建提纲对象
-            outline = Outline(
-                outline_id=str(outline_data['id']),
-                title=outline_data['title'],
-                created_at=outline_data['created_at'],
-                updated_at=outline_data['updated_at']
-            )
-            
-            # 构建章节列表
-            for section_data in sections_data:
-                outline.sections.append(
-                    OutlineSection(
-                        section_id=section_data['id'],
-                        title=section_data['title'],
-                        content=section_data['content']
-                    )
-                )
+            outline.sections.extend(_SECTION.map_all(cursor))
             
             return outline
             
         except Error as e:
+            mark_failed()
             print(f"获取提纲失败: {e}")
             return None
         finally:
@@ -125,6 +178,110 @@ class OutlineOperations:
                 conn.close()
     
     @staticmethod
+    @_db_operation
+    def get_outlines_by_ids(outline_ids: List[str], include_sections: bool = True,
+                            include_content: bool = True) -> Dict[str, Outline]:
+        """
+        批量获取提纲，提纲和章节各用一次IN查询
+        :param outline_ids: 提纲ID列表
+        :param include_sections: 是否查询章节
+        :param include_content: 是否查询章节内容，为False时只查询章节标题
+        :return: 以提纲ID为键的提纲对象字典，不存在的ID不在结果中
+        """
+        if not outline_ids:
+            return {}
+        conn = None
+        try:
+            conn = db_config.get_connection()
+            if not conn:
+                return {}
+                
+            cursor = conn.cursor()
+            
+            # 查询提纲主表
+            cursor.execute(
+                f"""
+                SELECT {_OUTLINE.columns} FROM outlines
+                WHERE id IN ({_placeholders(outline_ids)})
+                """,
+                tuple(outline_ids)
+            )
+            outlines = {outline.outline_id: outline for outline in _OUTLINE.map_all(cursor)}
+            
+            if not include_sections or not outlines:
+                return outlines
+            
+            # 一次查询所有提纲的章节，结果按提纲ID排序，逐行读取并分组
+            mapper = _SECTION if include_content else _SECTION_TITLE
+            found_ids = list(outlines)
+            cursor.execute(
+                f"""
+                SELECT outline_id, {mapper.columns} FROM outline_sections
+                WHERE outline_id IN ({_placeholders(found_ids)})
+                ORDER BY outline_id, id
+                """,
+                tuple(found_ids)
+            )
+            current_id, sections = None, None
+            for row in cursor:
+                if row[0] != current_id:
+                    current_id = row[0]
+                    sections = outlines[str(current_id)].sections
+                sections.append(mapper.map(row[1:]))
+            
+            return outlines
+            
+        except Error as e:
+            mark_failed()
+            print(f"批量获取提纲失败: {e}")
+            return {}
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def iter_outlines(include_content: bool = True) -> Iterator[Outline]:
+        """
+        按ID顺序逐个读取所有提纲及其章节，用于重建索引等批量处理
+        提纲和章节用一次JOIN查询，逐行从服务端读取并组装，内存占用与提纲总数无关；
+        迭代期间占用一个数据库连接，应尽快读完或关闭迭代器。生成器的耗时取决于调用方，不记录操作耗时指标
+        :param include_content: 是否查询章节内容
+        :return: 提纲对象的迭代器
+        """
+        conn = db_config.get_connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            section_mapper = _JOINED_SECTION if include_content else _JOINED_SECTION_TITLE
+            width = len(_JOINED_OUTLINE.names)
+            cursor.execute(
+                f"""
+                SELECT {_JOINED_OUTLINE.columns}, {section_mapper.columns}
+                FROM outlines o
+                LEFT JOIN outline_sections s ON s.outline_id = o.id
+                ORDER BY o.id, s.id
+                """
+            )
+            outline = None
+            for row in cursor:
+                if outline is None or row[0] != outline.outline_id:
+                    if outline is not None:
+                        yield outline
+                    outline = _JOINED_OUTLINE.map(row)
+                # 没有章节的提纲LEFT JOIN得到的章节列为NULL
+                if row[width] is not None:
+                    outline.sections.append(section_mapper.map(row[width:]))
+            if outline is not None:
+                yield outline
+        except Error as e:
+            mark_failed()
+            print(f"读取提纲失败: {e}")
+        finally:
+            _close(conn)
+    
+    @staticmethod
+    @_db_operation
     def update_outline(outline: Outline) -> bool:
         """
         更新提纲
@@ -137,16 +294,16 @@ class OutlineOperations:
             if not conn:
                 return False
                 
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             # 更新提纲主表
             cursor.execute(
                 """
                 UPDATE outlines 
-                SET title = %s, updated_at = %s
+                SET title = %s, updated_at = %s, content_hash = %s
                 WHERE id = %s
                 """,
-                (outline.title, datetime.now(), outline.outline_id)
+                (outline.title, datetime.now(), outline.content_hash(), outline.outline_id)
             )
             
             # 删除原有章节
@@ -173,6 +330,7 @@ class OutlineOperations:
             return True
             
         except Error as e:
+            mark_failed()
             print(f"更新提纲失败: {e}")
             if conn:
                 conn.rollback()
@@ -182,6 +340,7 @@ class OutlineOperations:
                 conn.close()
                 
     @staticmethod
+    @_db_operation
     def get_outline_list(page: int, size: int) -> dict:
         """
         获取提纲列表(分页)
@@ -195,30 +354,26 @@ class OutlineOperations:
             if not conn:
                 return {'data': [], 'total': 0}
                 
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             # 计算偏移量
             offset = (page - 1) * size
             
             # 查询总数
-            cursor.execute("SELECT COUNT(*) AS total FROM outlines")
-            total = cursor.fetchone()['total']
+            cursor.execute("SELECT COUNT(*) FROM outlines")
+            total = cursor.fetchone()[0]
             
-            # 查询分页数据
+            # 查询分页数据，ID在SQL中转换为字符串
             cursor.execute(
                 """
-                SELECT id, title, created_at, updated_at FROM outlines
+                SELECT CAST(id AS CHAR), title, created_at, updated_at FROM outlines
                 ORDER BY created_at DESC
                 LIMIT %s OFFSET %s
                 """,
                 (size, offset)
             )
             
-            data = cursor.fetchall()
-            
-            # 转换ID为字符串
-            for item in data:
-                item['id'] = str(item['id'])
+            data = [dict(zip(_OUTLINE_LIST_COLUMNS, row)) for row in cursor]
             
             return {
                 'data': data,
@@ -226,6 +381,7 @@ class OutlineOperations:
             }
             
         except Error as e:
+            mark_failed()
             print(f"获取提纲列表失败: {e}")
             return {'data': [], 'total': 0}
         finally:
@@ -238,6 +394,7 @@ class ScriptOperations:
     """
     
     @staticmethod
+    @_db_operation
     def create_script(script: Script) -> bool:
         """
         创建脚本
@@ -265,6 +422,7 @@ class ScriptOperations:
             return True
             
         except Error as e:
+            mark_failed()
             print(f"创建脚本失败: {e}")
             if conn:
                 conn.rollback()
@@ -274,6 +432,240 @@ class ScriptOperations:
                 conn.close()
     
     @staticmethod
+    @_db_operation
+    def save_script_version(script: Script) -> Optional[int]:
+        """
+        保存提纲的新版本脚本：scripts表只保存最新版本全文，读取最新版本仍为单行查询；
+        历史版本保存在script_versions表，每SCRIPT_SNAPSHOT_INTERVAL个版本一个快照，其余为相对上一版本的差异
+        :param script: 脚本对象，该提纲已有脚本时沿用原脚本ID，保存后script_id和version会被更新
+        :return: 保存后的版本号，内容与最新版本相同时返回最新版本号
+        """
+        conn = None
+        try:
+            conn = db_config.get_connection()
+            if not conn:
+                return None
+                
+            cursor = conn.cursor(dictionary=True)
+            
+            # 锁定最新版本，避免并发保存产生相同版本号
+            cursor.execute(
+                """
+                SELECT id, content, version, created_at FROM scripts
+                WHERE outline_id = %s
+                ORDER BY created_at DESC
+                LIMIT 1
+                FOR UPDATE
+                """,
+                (script.outline_id,)
+            )
+            current = cursor.fetchone()
+            target_lines = to_lines(script.content)
+            
+            if current is None:
+                # 第一个版本只写入scripts表，首次更新时再补为历史快照(与引入版本历史前保存的脚本相同)，
+                # 从未修改过的脚本不会在两张表中各存一份全文
+                version = 1
+                cursor.execute(
+                    """
+                    INSERT INTO scripts 
+                    (id, outline_id, content, created_at, version)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    (script.script_id, script.outline_id, script.content, script.created_at, version)
+                )
+                conn.commit()
+                script.version = version
+                return version
+            else:
+                script.script_id = current['id']
+                if current['content'] == script.content:
+                    conn.commit()
+                    script.version = current['version']
+                    return current['version']
+                
+                cursor.execute(
+                    """
+                    SELECT MAX(version) AS latest,
+                           MAX(CASE WHEN kind = %s THEN version END) AS snapshot
+                    FROM script_versions
+                    WHERE outline_id = %s
+                    """,
+                    (SNAPSHOT, script.outline_id)
+                )
+                history = cursor.fetchone()
+                base_lines = to_lines(current['content'])
+                
+                # 引入版本历史之前保存的脚本，先补一个快照作为差异的基准
+                if history['latest'] is None:
+                    ScriptOperations._insert_version(cursor, script, current['version'], SNAPSHOT,
+                                                     base_lines, len(current['content']), current['created_at'])
+                    history = {'latest': current['version'], 'snapshot': current['version']}
+                
+                version = current['version'] + 1
+                if (history['latest'] != current['version'] or history['snapshot'] is None
+                        or version - history['snapshot'] >= SCRIPT_SNAPSHOT_INTERVAL):
+                    kind, value = SNAPSHOT, target_lines
+                else:
+                    kind, value = DELTA, make_delta(base_lines, target_lines)
+                
+                cursor.execute(
+                    """
+                    UPDATE scripts
+                    SET content = %s, version = %s, created_at = %s
+                    WHERE id = %s
+                    """,
+                    (script.content, version, script.created_at, script.script_id)
+                )
+            
+            ScriptOperations._insert_version(cursor, script, version, kind, value,
+                                             len(script.content), script.created_at)
+            conn.commit()
+            script.version = version
+            return version
+            
+        except (Error, ValueError) as e:
+            mark_failed()
+            print(f"保存脚本版本失败: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def _insert_version(cursor, script: Script, version: int, kind: str, value, content_size: int,
+                        created_at: datetime):
+        """写入一条版本记录"""
+        payload = encode_payload(value)
+        cursor.execute(
+            """
+            INSERT INTO script_versions
+            (outline_id, script_id, version, kind, payload, content_size, stored_size, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (script.outline_id, script.script_id, version, kind, payload, content_size, len(payload), created_at)
+        )
+    
+    @staticmethod
+    @_db_operation
+    def list_script_versions(outline_id: str) -> Optional[List[dict]]:
+        """
+        获取提纲的脚本版本列表，只读取元数据
+        还没有历史记录的脚本(只有一个版本)从scripts表读取该版本的信息
+        :param outline_id: 提纲ID
+        :return: 按版本号降序排列的版本信息列表
+        """
+        conn = None
+        try:
+            conn = db_config.get_connection()
+            if not conn:
+                return None
+                
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute(
+                """
+                SELECT version, kind, content_size, stored_size, created_at
+                FROM script_versions
+                WHERE outline_id = %s
+                ORDER BY version DESC
+                """,
+                (outline_id,)
+            )
+            versions = cursor.fetchall()
+            if versions:
+                return versions
+            
+            cursor.execute(
+                """
+                SELECT version, %s AS kind, CHAR_LENGTH(content) AS content_size,
+                       LENGTH(content) AS stored_size, created_at
+                FROM scripts
+                WHERE outline_id = %s
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                (SNAPSHOT, outline_id)
+            )
+            return cursor.fetchall()
+            
+        except Error as e:
+            mark_failed()
+            print(f"获取脚本版本列表失败: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    @_db_operation
+    def get_script_version(outline_id: str, version: int) -> Optional[Script]:
+        """
+        重建指定版本的脚本，只读取最近的快照及其后的差异
+        还没有历史记录的脚本只有scripts表中的版本，直接返回
+        :param outline_id: 提纲ID
+        :param version: 版本号
+        :return: 脚本对象
+        """
+        conn = None
+        try:
+            conn = db_config.get_connection()
+            if not conn:
+                return None
+                
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute(
+                """
+                SELECT script_id, version, kind, payload, created_at
+                FROM script_versions
+                WHERE outline_id = %s AND version <= %s AND version >= (
+                    SELECT MAX(version) FROM script_versions
+                    WHERE outline_id = %s AND kind = %s AND version <= %s
+                )
+                ORDER BY version
+                """,
+                (outline_id, version, outline_id, SNAPSHOT, version)
+            )
+            records = cursor.fetchall()
+            if not records:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"""
+                    SELECT {_SCRIPT.columns} FROM scripts
+                    WHERE outline_id = %s
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                    """,
+                    (outline_id,)
+                )
+                row = cursor.fetchone()
+                current = _SCRIPT.map(row) if row else None
+                return current if current is not None and current.version == version else None
+            if records[-1]['version'] != version:
+                return None
+            
+            latest = records[-1]
+            return Script(
+                script_id=latest['script_id'],
+                outline_id=outline_id,
+                content=json.dumps(from_lines(rebuild(records)), ensure_ascii=False),
+                created_at=latest['created_at'],
+                version=version
+            )
+            
+        except (Error, ValueError) as e:
+            mark_failed()
+            print(f"获取脚本版本失败: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    @_db_operation
     def get_script(script_id: str) -> Optional[Script]:
         """
         获取脚本
@@ -286,11 +678,11 @@ class ScriptOperations:
             if not conn:
                 return None
                 
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.execute(
-                """
-                SELECT * FROM scripts 
+                f"""
+                SELECT {_SCRIPT.columns} FROM scripts 
                 WHERE id = %s
                 """,
                 (script_id,)
@@ -300,14 +692,10 @@ class ScriptOperations:
             if not script_data:
                 return None
             
-            return Script(
-                script_id=script_data['id'],
-                outline_id=script_data['outline_id'],
-                content=script_data['content'],
-                created_at=script_data['created_at']
-            )
+            return _SCRIPT.map(script_data)
             
         except Error as e:
+            mark_failed()
             print(f"获取脚本失败: {e}")
             return None
         finally:
@@ -315,6 +703,7 @@ class ScriptOperations:
                 conn.close()
     
     @staticmethod
+    @_db_operation
     def get_script_by_outline(outline_id: str) -> Optional[Script]:
         """
         根据提纲ID获取脚本
@@ -327,12 +716,14 @@ class ScriptOperations:
             if not conn:
                 return None
                 
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.execute(
-                """
-                SELECT * FROM scripts 
+                f"""
+                SELECT {_SCRIPT.columns} FROM scripts 
                 WHERE outline_id = %s
+                ORDER BY created_at DESC
+                LIMIT 1
                 """,
                 (outline_id,)
             )
@@ -341,14 +732,10 @@ class ScriptOperations:
             if not script_data:
                 return None
             
-            return Script(
-                script_id=script_data['id'],
-                outline_id=script_data['outline_id'],
-                content=script_data['content'],
-                created_at=script_data['created_at']
-            )
+            return _SCRIPT.map(script_data)
             
         except Error as e:
+            mark_failed()
             print(f"获取脚本失败: {e}")
             return None
         finally:
@@ -356,6 +743,101 @@ class ScriptOperations:
                 conn.close()
                 
     @staticmethod
+    @_db_operation
+    def get_scripts_by_ids(ids: List[str], include_content: bool = True) -> Dict[str, Script]:
+        """
+        批量获取脚本，每个ID可以是脚本ID或提纲ID，与get_script的回退规则一致
+        :param ids: 脚本ID或提纲ID列表
+        :param include_content: 是否查询脚本内容
+        :return: 以请求ID为键的脚本对象字典，不存在的ID不在结果中
+        """
+        if not ids:
+            return {}
+        conn = None
+        try:
+            conn = db_config.get_connection()
+            if not conn:
+                return {}
+                
+            cursor = conn.cursor()
+            
+            mapper = _SCRIPT if include_content else _SCRIPT_META
+            # 只有数字ID可能是提纲ID，脚本ID不与INT列比较，避免隐式转换匹配到无关提纲；
+            # 与iter_scripts相同，每个提纲只取创建时间最新的一行
+            outline_ids = [int(item_id) for item_id in ids if item_id.isascii() and item_id.isdigit()]
+            outline_clause = f"""
+                OR (s.outline_id IN ({_placeholders(outline_ids)}) AND s.id = (
+                    SELECT latest.id FROM scripts latest
+                    WHERE latest.outline_id = s.outline_id
+                    ORDER BY latest.created_at DESC
+                    LIMIT 1
+                ))""" if outline_ids else ""
+            cursor.execute(
+                f"""
+                SELECT {mapper.columns} FROM scripts s
+                WHERE s.id IN ({_placeholders(ids)}){outline_clause}
+                ORDER BY s.created_at DESC
+                """,
+                tuple(ids) + tuple(outline_ids)
+            )
+            
+            by_id = {}
+            by_outline = {}
+            for script in mapper.map_all(cursor):
+                by_id[str(script.script_id)] = script
+                by_outline.setdefault(str(script.outline_id), script)
+            
+            # 优先按脚本ID匹配，其次按提纲ID匹配其最新脚本
+            result = {}
+            for item_id in ids:
+                script = by_id.get(item_id) or by_outline.get(item_id)
+                if script:
+                    result[item_id] = script
+            return result
+            
+        except Error as e:
+            mark_failed()
+            print(f"批量获取脚本失败: {e}")
+            return {}
+        finally:
+            if conn:
+                conn.close()
+                
+    @staticmethod
+    def iter_scripts(include_content: bool = True) -> Iterator[Script]:
+        """
+        逐个读取所有提纲的最新脚本，与iter_outlines相同，逐行从服务端读取
+        旧版本保存的提纲可能有多行脚本，与save_script_version相同，每个提纲只取创建时间最新的一行
+        :param include_content: 是否查询脚本内容
+        :return: 脚本对象的迭代器
+        """
+        conn = db_config.get_connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            mapper = _SCRIPT if include_content else _SCRIPT_META
+            cursor.execute(
+                f"""
+                SELECT {mapper.columns} FROM scripts s
+                WHERE s.id = (
+                    SELECT latest.id FROM scripts latest
+                    WHERE latest.outline_id = s.outline_id
+                    ORDER BY latest.created_at DESC
+                    LIMIT 1
+                )
+                ORDER BY s.outline_id
+                """
+            )
+            yield from mapper.map_all(cursor)
+        except Error as e:
+            mark_failed()
+            print(f"读取脚本失败: {e}")
+        finally:
+            _close(conn)
+    
+    @staticmethod
+    @_db_operation
     def get_script_list(page: int, size: int) -> dict:
         """
         获取脚本列表(分页)
@@ -369,19 +851,19 @@ class ScriptOperations:
             if not conn:
                 return {'data': [], 'total': 0}
                 
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             # 计算偏移量
             offset = (page - 1) * size
             
             # 查询总数
-            cursor.execute("SELECT COUNT(*) AS total FROM scripts")
-            total = cursor.fetchone()['total']
+            cursor.execute("SELECT COUNT(*) FROM scripts")
+            total = cursor.fetchone()[0]
             
-            # 查询分页数据
+            # 查询分页数据，ID在SQL中转换为字符串
             cursor.execute(
                 """
-                SELECT s.id, s.outline_id, s.created_at, o.title as outline_title 
+                SELECT s.id, CAST(s.outline_id AS CHAR), s.created_at, o.title
                 FROM scripts s
                 LEFT JOIN outlines o ON s.outline_id = o.id
                 ORDER BY s.created_at DESC
@@ -390,12 +872,7 @@ class ScriptOperations:
                 (size, offset)
             )
             
-            data = cursor.fetchall()
-            
-            # 转换ID为字符串
-            for item in data:
-                item['id'] = str(item['id'])
-                item['outline_id'] = str(item['outline_id'])
+            data = [dict(zip(_SCRIPT_LIST_COLUMNS, row)) for row in cursor]
             
             return {
                 'data': data,
@@ -403,6 +880,7 @@ class ScriptOperations:
             }
             
         except Error as e:
+            mark_failed()
             print(f"获取脚本列表失败: {e}")
             return {'data': [], 'total': 0}
         finally:
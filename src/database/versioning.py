@@ -0,0 +1,111 @@
+import difflib
+import json
+import zlib
+from typing import Any, Dict, List
+
+# 版本记录类型
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+# 多行字符串在行文档中的表示
+_LINES_KEY = "__lines__"
+
+
+def _explode(value: Any) -> Any:
+    """将包含换行的字符串拆成行列表，使差异能落在段落级别"""
+    if isinstance(value, str) and "\n" in value:
+        return {_LINES_KEY: value.split("\n")}
+    if isinstance(value, dict):
+        return {key: _explode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_explode(item) for item in value]
+    return value
+
+
+def _implode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and _LINES_KEY in value:
+            return "\n".join(value[_LINES_KEY])
+        return {key: _implode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_implode(item) for item in value]
+    return value
+
+
+def to_lines(content: str) -> List[str]:
+    """将脚本JSON转换为按行排列的文档，每个段落各占一行
+
+    Args:
+        content: 脚本JSON字符串
+
+    Returns:
+        List[str]: 行列表
+    """
+    document = _explode(json.loads(content))
+    return json.dumps(document, ensure_ascii=False, indent=0).split("\n")
+
+
+def from_lines(lines: List[str]) -> Any:
+    """将行文档还原为脚本对象"""
+    return _implode(json.loads("\n".join(lines)))
+
+
+def make_delta(base: List[str], target: List[str]) -> List[Any]:
+    """计算从base到target的行级差异
+
+    Returns:
+        List: 操作列表，整数n表示沿用base的n行，负整数-n表示跳过base的n行，
+            字符串列表表示插入这些行
+    """
+    ops: List[Any] = []
+    matcher = difflib.SequenceMatcher(None, base, target, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(target[j1:j2])
+    return ops
+
+
+def apply_delta(base: List[str], ops: List[Any]) -> List[str]:
+    """将差异应用到base上"""
+    result: List[str] = []
+    position = 0
+    for op in ops:
+        if isinstance(op, list):
+            result.extend(op)
+        elif op >= 0:
+            result.extend(base[position:position + op])
+            position += op
+        else:
+            position -= op
+    return result
+
+
+def encode_payload(value: Any) -> bytes:
+    """压缩版本内容；快照中raw_content与sections的重复文本由压缩消除"""
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def decode_payload(payload: bytes) -> Any:
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+def rebuild(records: List[Dict[str, Any]]) -> List[str]:
+    """从快照开始依次应用差异，得到最后一条记录对应版本的行文档
+
+    Args:
+        records: 按版本升序排列的记录，第一条必须是快照，每条包含kind和payload
+    """
+    if not records or records[0]['kind'] != SNAPSHOT:
+        raise ValueError("版本记录缺少起始快照")
+    lines = decode_payload(records[0]['payload'])
+    for record in records[1:]:
+        if record['kind'] == SNAPSHOT:
+            lines = decode_payload(record['payload'])
+        else:
+            lines = apply_delta(lines, decode_payload(record['payload']))
+    return lines
@@ -1,9 +1,15 @@
 import requests
 import time
+import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional, Sequence
 
 from config.constants import API_BASE_URL, API_TIMEOUT, API_RETRY_COUNT
+from src.script_generator.prompt_builder import PromptBuilder
+from src.utils.metrics import LLM_LATENCY, LLM_RETRIES, LLM_BACKOFF, LLM_TOKENS, LLM_FIRST_TOKEN
+from src.utils.tracing import span
+from src.utils.logger import lazy_json
+from src.utils.progress import flush_deltas
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +19,8 @@ class APIClient:
     def __init__(self, base_url: str = API_BASE_URL, 
                  timeout: int = API_TIMEOUT,
                  retry_count: int = API_RETRY_COUNT,
-                 api_key: Optional[str] = None):
+                 api_key: Optional[str] = None,
+                 model: str = "deepseek-chat"):
         """初始化API客户端
         
         Args:
@@ -21,8 +28,10 @@ class APIClient:
             timeout: 请求超时时间(秒)
             retry_count: 重试次数
             api_key: API密钥
+            model: 默认模型，可被generate_content的params["model"]覆盖
         """
         self.base_url = base_url
+        self.model = model
         self.timeout = timeout
         self.retry_count = retry_count
         self.session = requests.Session()
@@ -60,54 +69,170 @@ class APIClient:
         url = f"{self.base_url}/{endpoint}"
         
         for attempt in range(retry + 1):
+            start = time.perf_counter()
             try:
-                if method.upper() == 'GET':
-                    response = self.session.get(url, params=params, timeout=self.timeout)
-                elif method.upper() == 'POST':
-                    response = self.session.post(url, params=params, json=data, timeout=self.timeout)
-                else:
-                    raise ValueError(f"不支持的请求方法: {method}")
-                
-                response.raise_for_status()
-                return response.json()
+                # 每次尝试单独记录一个span
+                with span("APIClient._make_request", phase="llm", endpoint=endpoint, attempt=attempt):
+                    if method.upper() == 'GET':
+                        response = self.session.get(url, params=params, timeout=self.timeout)
+                    elif method.upper() == 'POST':
+                        response = self.session.post(url, params=params, json=data, timeout=self.timeout)
+                    else:
+                        raise ValueError(f"不支持的请求方法: {method}")
+                    
+                    response.raise_for_status()
+                    result = response.json()
+                LLM_LATENCY.labels(endpoint, "ok").observe(time.perf_counter() - start)
+                return result
                 
             except requests.exceptions.RequestException as e:
+                LLM_LATENCY.labels(endpoint, "error").observe(time.perf_counter() - start)
                 if attempt < retry:
                     wait_time = 2 ** attempt  # 指数退避
                     logger.warning(f"请求失败，{wait_time}秒后重试: {e}")
+                    LLM_RETRIES.labels(endpoint).inc()
+                    LLM_BACKOFF.labels(endpoint).inc(wait_time)
                     time.sleep(wait_time)
                 else:
                     logger.error(f"请求失败，已达到最大重试次数: {e}")
                     raise
     
-    def generate_content(self, prompt: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    def _stream_request(self, endpoint: str, data: Dict, on_delta: Callable[[str], None],
+                        retry: int = None) -> Dict:
+        """以流式方式发送请求，逐块回调增量内容，最后拼装为与非流式一致的响应
+        
+        已经回调过增量内容后不再重试，避免订阅者收到重复内容。
+        
+        Args:
+            endpoint: API端点
+            data: 请求体数据
+            on_delta: 每收到一段增量内容时的回调
+            retry: 重试次数
+            
+        Returns:
+            Dict: 拼装后的API响应数据
+        """
+        if retry is None:
+            retry = self.retry_count
+            
+        url = f"{self.base_url}/{endpoint}"
+        
+        for attempt in range(retry + 1):
+            start = time.perf_counter()
+            received = False
+            try:
+                with span("APIClient._stream_request", phase="llm", endpoint=endpoint, attempt=attempt):
+                    parts = []
+                    finish_reason = None
+                    usage = None
+                    with self.session.post(url, json={**data, "stream": True, "stream_options": {"include_usage": True}},
+                                           timeout=self.timeout, stream=True) as response:
+                        response.raise_for_status()
+                        # 按字节分行后再解码，event-stream未声明charset时requests会按latin-1解码
+                        for line in response.iter_lines():
+                            if not line.startswith(b"data:"):
+                                continue
+                            payload = line[5:].strip().decode('utf-8')
+                            if payload == "[DONE]":
+                                break
+                            chunk = json.loads(payload)
+                            usage = chunk.get('usage') or usage
+                            for choice in chunk.get('choices') or []:
+                                delta = (choice.get('delta') or {}).get('content')
+                                if delta:
+                                    if not received:
+                                        LLM_FIRST_TOKEN.labels(endpoint).observe(time.perf_counter() - start)
+                                    received = True
+                                    parts.append(delta)
+                                    on_delta(delta)
+                                finish_reason = choice.get('finish_reason') or finish_reason
+                # 发送节流期间暂存的结尾内容，之后才会发送completed事件
+                flush_deltas(on_delta)
+                LLM_LATENCY.labels(endpoint, "ok").observe(time.perf_counter() - start)
+                return {
+                    "choices": [{"message": {"role": "assistant", "content": "".join(parts)},
+                                 "finish_reason": finish_reason}],
+                    "usage": usage
+                }
+                
+            except (requests.exceptions.RequestException, ValueError) as e:
+                LLM_LATENCY.labels(endpoint, "error").observe(time.perf_counter() - start)
+                if attempt < retry and not received:
+                    wait_time = 2 ** attempt  # 指数退避
+                    logger.warning(f"流式请求失败，{wait_time}秒后重试: {e}")
+                    LLM_RETRIES.labels(endpoint).inc()
+                    LLM_BACKOFF.labels(endpoint).inc(wait_time)
+                    time.sleep(wait_time)
+                else:
+                    logger.error(f"流式请求失败: {e}")
+                    raise
+    
+    def generate_content(self, prompt: str, params: Dict[str, Any] = None,
+                         on_delta: Optional[Callable[[str], None]] = None,
+                         prefix: Sequence[str] = (), task: Optional[str] = None) -> Dict[str, Any]:
         """生成内容
         
+        消息由PromptBuilder.messages组装：固定的系统提示词和prefix在前，prompt在最后，
+        相同任务的请求共享前缀，可以命中上游的上下文缓存。
+        
         Args:
-            prompt: 提示词
+            prompt: 提示词中每次请求不同的部分
             params: 生成参数
+            on_delta: 增量内容回调，提供时使用流式请求
+            prefix: 任务固定的说明块，同一任务的每次请求必须逐字相同
+            task: 任务类型，只用于ModelRouter选择端点，单个客户端忽略该参数
             
         Returns:
-            Dict: 生成结果
+            Dict: 生成结果，包含content和finish_reason(length表示达到max_tokens被截断)，响应报告了用量时还包含usage
         """
         data = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant"},
-                {"role": "user", "content": prompt}
-            ],
+            "model": self.model,
+            "messages": PromptBuilder.messages(prompt, prefix),
             "stream": False,
             **(params or {})
         }
         
-        response = self._make_request('v1/chat/completions', method='POST', data=data)
+        if on_delta is not None:
+            response = self._stream_request('v1/chat/completions', data, on_delta)
+        else:
+            response = self._make_request('v1/chat/completions', method='POST', data=data)
         
         if not response or 'choices' not in response:
-            logger.error(f"API响应格式错误: {response}")
+            logger.error("API响应格式错误: %s", lazy_json(response))
             return {"content": ""}
             
-        content = response['choices'][0]['message']['content']
-        return {"content": content}
+        self._record_usage(data["model"], response.get('usage'))
+        
+        choice = response['choices'][0]
+        result = {"content": choice['message']['content'], "finish_reason": choice.get('finish_reason')}
+        if isinstance(response.get('usage'), dict):
+            result["usage"] = response['usage']
+        return result
+    
+    @staticmethod
+    def _record_usage(model: str, usage: Optional[Dict[str, Any]]):
+        """记录响应中usage字段报告的token用量
+        
+        DeepSeek在prompt_cache_hit_tokens/prompt_cache_miss_tokens中报告前缀缓存命中情况，
+        OpenAI兼容接口在prompt_tokens_details.cached_tokens中报告，两者都计为cache_hit/cache_miss。
+        """
+        if not isinstance(usage, dict):
+            return
+        for key, token_type in (("prompt_tokens", "prompt"), ("completion_tokens", "completion"),
+                                ("prompt_cache_hit_tokens", "cache_hit"),
+                                ("prompt_cache_miss_tokens", "cache_miss")):
+            value = usage.get(key)
+            if isinstance(value, (int, float)):
+                LLM_TOKENS.labels(model, token_type).inc(value)
+        details = usage.get("prompt_tokens_details")
+        if "prompt_cache_hit_tokens" not in usage and isinstance(details, dict):
+            cached = details.get("cached_tokens")
+            prompt_tokens = usage.get("prompt_tokens")
+            if isinstance(cached, (int, float)):
+                LLM_TOKENS.labels(model, "cache_hit").inc(cached)
+                if isinstance(prompt_tokens, (int, float)):
+                    LLM_TOKENS.labels(model, "cache_miss").inc(max(0, prompt_tokens - cached))
+    
     def check_status(self) -> Dict[str, Any]:
         """检查API服务状态
         
@@ -0,0 +1,152 @@
+import logging
+import re
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from config.constants import (SCRIPT_MAX_CONTINUATIONS, SCRIPT_CONTINUATION_TAIL_CHARS,
+                              SCRIPT_CONTINUATION_SUMMARY_CHARS)
+from src.utils.progress import report, flush_deltas
+
+logger = logging.getLogger(__name__)
+
+# 续写请求在任务固定说明之后追加的固定说明，同样作为缓存前缀发送
+CONTINUATION_INSTRUCTIONS = (
+    "续写规则：上一次输出因长度限制被截断。请从给出的已写内容结尾处紧接着继续写，"
+    "不要重复已写内容，不要重新开头，也不要添加任何说明。"
+)
+
+_FIRST_SENTENCE = re.compile(r'^.*?[。！？!?]')
+_MIN_OVERLAP = 6
+
+
+def written_summary(text: str, limit: int = SCRIPT_CONTINUATION_SUMMARY_CHARS) -> str:
+    """已写内容的概要：每段的首句，超过limit时只保留最后的部分
+
+    Args:
+        text: 已写内容
+        limit: 概要的最大长度(字符)
+
+    Returns:
+        str: 按行排列的各段首句
+    """
+    lines = []
+    for paragraph in text.split('\n'):
+        paragraph = paragraph.strip()
+        if paragraph:
+            match = _FIRST_SENTENCE.match(paragraph)
+            lines.append(match.group(0) if match else paragraph)
+    summary = '\n'.join(lines)
+    if len(summary) > limit:
+        summary = '…' + summary[-limit:]
+    return summary
+
+
+def merge_continuation(previous: str, addition: str, max_overlap: int = SCRIPT_CONTINUATION_TAIL_CHARS) -> str:
+    """拼接续写内容，去掉续写开头与已写内容结尾重复的部分
+
+    模型续写时常会重复被截断的半句或最后一行，取已写内容的最长后缀与续写内容前缀的重叠部分去掉。
+
+    Args:
+        previous: 已写内容
+        addition: 续写内容
+        max_overlap: 检查重叠的最大长度(字符)
+
+    Returns:
+        str: 拼接后的内容
+    """
+    stripped = addition.lstrip()
+    for length in range(min(len(stripped), len(previous), max_overlap), _MIN_OVERLAP - 1, -1):
+        if previous.endswith(stripped[:length]):
+            return previous + stripped[length:]
+    return previous + addition
+
+
+def add_usage(total: Optional[Dict[str, Any]], usage: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """累加多次请求的usage中的数值字段"""
+    if not isinstance(usage, dict):
+        return total
+    total = dict(total or {})
+    for key, value in usage.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+class ContinuationEngine:
+    """输出因达到max_tokens被截断(finish_reason为length)时自动续写
+
+    续写请求沿用原请求的固定前缀并追加CONTINUATION_INSTRUCTIONS，可变部分为原提示词、
+    已写内容的概要和原样的结尾，模型返回后去掉重复的衔接部分再拼接。
+
+    Args:
+        api_client: APIClient或ModelRouter
+        max_continuations: 最多续写次数
+        tail_chars: 续写请求原样携带的已写内容结尾长度
+    """
+
+    def __init__(self, api_client, max_continuations: int = SCRIPT_MAX_CONTINUATIONS,
+                 tail_chars: int = SCRIPT_CONTINUATION_TAIL_CHARS):
+        self.api_client = api_client
+        self.max_continuations = max_continuations
+        self.tail_chars = tail_chars
+
+    def continuation_prompt(self, prompt: str, written: str) -> str:
+        """构建续写请求的可变部分"""
+        head, tail = written[:-self.tail_chars], written[-self.tail_chars:]
+        parts = [prompt]
+        if head:
+            parts.append(f"\n\n已写内容概要：\n{written_summary(head)}")
+        parts.append(f"\n\n已写内容的结尾(从这里紧接着继续写)：\n{tail}")
+        return "".join(parts)
+
+    def generate(self, prompt: str, params: Optional[Dict[str, Any]] = None,
+                 on_delta: Optional[Callable[[str], None]] = None, prefix: Sequence[str] = (),
+                 task: Optional[str] = None, **progress) -> Dict[str, Any]:
+        """生成内容，被截断时续写直到完整或达到续写次数上限
+
+        Args:
+            prompt: 提示词中每次请求不同的部分
+            params: 生成参数，续写请求使用相同参数
+            on_delta: 增量内容回调，续写部分在去掉重复内容后一次推送
+            prefix: 任务固定的说明块
+            task: 任务类型
+            progress: 附加到continuation进度事件中的字段
+
+        Returns:
+            Dict: content(拼接后的内容)、finish_reason(最后一次请求的)、usage(累计用量)、
+                continuations(续写次数)、truncated(续写后仍不完整)
+        """
+        response = self.api_client.generate_content(prompt, params=params, on_delta=on_delta,
+                                                    prefix=prefix, task=task)
+        content = response.get("content", "")
+        usage = add_usage(None, response.get("usage"))
+        continuations = 0
+        while (response.get("finish_reason") == "length" and content
+               and continuations < self.max_continuations):
+            continuations += 1
+            logger.info(f"输出被截断，第{continuations}次续写，已生成{len(content)}字符")
+            report("continuation", index=continuations, content_chars=len(content), **progress)
+            # 续写开头与已写内容重复的部分在拼接时去掉，续写请求不流式推送，
+            # 拼接后只推送新增的部分，订阅者按offset拼出的内容与最终结果一致
+            response = self.api_client.generate_content(
+                self.continuation_prompt(prompt, content), params=params,
+                prefix=(*prefix, CONTINUATION_INSTRUCTIONS), task=task)
+            usage = add_usage(usage, response.get("usage"))
+            addition = response.get("content", "")
+            if not addition:
+                break
+            merged = merge_continuation(content, addition, self.tail_chars)
+            if on_delta is not None and len(merged) > len(content):
+                on_delta(merged[len(content):])
+            content = merged
+
+        flush_deltas(on_delta)
+        truncated = response.get("finish_reason") == "length"
+        if truncated:
+            logger.warning(f"续写{continuations}次后输出仍被截断，共{len(content)}字符")
+        return {
+            "content": content,
+            "finish_reason": response.get("finish_reason"),
+            "usage": usage,
+            "continuations": continuations,
+            "truncated": truncated,
+        }
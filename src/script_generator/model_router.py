@@ -0,0 +1,241 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import requests
+
+from config.constants import (API_BASE_URL, API_TIMEOUT, API_RETRY_COUNT, DEEPSEEK_API_KEY, LLM_ENDPOINTS,
+                              LLM_ROUTES, ROUTER_EWMA_ALPHA, ROUTER_ERROR_PENALTY, ROUTER_FAILURE_THRESHOLD,
+                              ROUTER_COOLDOWN_SECONDS)
+from src.script_generator.api_client import APIClient
+from src.utils.metrics import LLM_ROUTER_REQUESTS, LLM_ROUTER_FALLBACKS, LLM_ROUTER_LATENCY
+from src.utils.progress import flush_deltas
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK = "default"
+
+
+class Endpoint:
+    """一个OpenAI兼容端点及其健康统计
+
+    Args:
+        name: 端点名称，用于路由配置和指标标签
+        client: 访问该端点的API客户端
+        aliases: 除client.model外该端点还能响应的模型名
+    """
+
+    def __init__(self, name: str, client: APIClient, aliases: Sequence[str] = ()):
+        self.name = name
+        self.client = client
+        self.models = {client.model, *aliases}
+        self.latency: Optional[float] = None  # 请求耗时的EWMA，None表示还没有样本
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def score(self) -> float:
+        """得分越低越优先；从未请求过的端点得分为0，保证新端点至少被尝试一次"""
+        latency = self.latency
+        if latency is None:
+            # 只失败过的端点按超时时间计算
+            latency = self.client.timeout if self.error_rate else 0.0
+        return latency * (1 + self.error_rate * ROUTER_ERROR_PENALTY)
+
+    def record_success(self, seconds: float):
+        with self._lock:
+            self.latency = seconds if self.latency is None else (
+                ROUTER_EWMA_ALPHA * seconds + (1 - ROUTER_EWMA_ALPHA) * self.latency)
+            self.error_rate *= 1 - ROUTER_EWMA_ALPHA
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+            latency = self.latency
+        LLM_ROUTER_LATENCY.labels(self.name).set(latency)
+
+    def record_failure(self, retry_after: float = 0.0):
+        with self._lock:
+            self.error_rate = ROUTER_EWMA_ALPHA + (1 - ROUTER_EWMA_ALPHA) * self.error_rate
+            self.consecutive_failures += 1
+            if retry_after or self.consecutive_failures >= ROUTER_FAILURE_THRESHOLD:
+                # 冷却结束后重新参与选择，成功一次即恢复
+                cooldown = max(retry_after, ROUTER_COOLDOWN_SECONDS if
+                               self.consecutive_failures >= ROUTER_FAILURE_THRESHOLD else 0)
+                self.cooldown_until = time.monotonic() + cooldown
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "base_url": self.client.base_url,
+            "model": self.client.model,
+            "latency": self.latency,
+            "error_rate": round(self.error_rate, 4),
+            "available": self.available(time.monotonic()),
+        }
+
+
+class ModelRouter:
+    """在多个OpenAI兼容端点之间选择模型并自动切换
+
+    每个请求先按模板指定的模型或任务类型确定候选端点，再按延迟和错误率的EWMA得分排序，
+    依次尝试直到成功。连续失败的端点暂停使用一段时间，所有端点都暂停时仍会按得分尝试。
+    接口与APIClient.generate_content相同，可以直接替换APIClient传给VideoScriptGenerator。
+
+    Args:
+        endpoints: 端点列表，顺序作为得分相同时的优先顺序
+        routes: 任务类型到端点名称列表的映射
+    """
+
+    def __init__(self, endpoints: List[Endpoint], routes: Optional[Dict[str, List[str]]] = None):
+        if not endpoints:
+            raise ValueError("至少需要配置一个LLM端点")
+        self.endpoints = endpoints
+        names = {endpoint.name for endpoint in endpoints}
+        self.routes: Dict[str, List[str]] = {}
+        for task, route in (routes or {}).items():
+            unknown = set(route) - names
+            if unknown:
+                raise ValueError(f"路由 {task} 引用了不存在的端点: {', '.join(sorted(unknown))}")
+            self.routes[task] = list(route)
+
+    @classmethod
+    def from_config(cls, endpoints_json: str = LLM_ENDPOINTS, routes_json: str = LLM_ROUTES) -> "ModelRouter":
+        """根据LLM_ENDPOINTS/LLM_ROUTES配置创建路由，未配置端点时只使用API_BASE_URL
+
+        Raises:
+            ValueError: 配置不是合法的JSON或缺少必要字段
+        """
+        if not endpoints_json:
+            client = APIClient(API_BASE_URL, api_key=DEEPSEEK_API_KEY)
+            return cls([Endpoint("default", client)])
+
+        try:
+            configs = json.loads(endpoints_json)
+            routes = json.loads(routes_json) if routes_json else {}
+        except json.JSONDecodeError as e:
+            raise ValueError(f"LLM端点配置不是合法的JSON: {e}")
+        if not isinstance(configs, list) or not isinstance(routes, dict):
+            raise ValueError("LLM_ENDPOINTS应为数组，LLM_ROUTES应为对象")
+
+        endpoints = []
+        for index, config in enumerate(configs):
+            if not isinstance(config, dict) or not config.get("base_url") or not config.get("model"):
+                raise ValueError(f"第{index + 1}个LLM端点缺少base_url或model")
+            # 多个端点时失败直接切换到下一个端点，不在同一端点上退避重试
+            client = APIClient(config["base_url"],
+                               timeout=config.get("timeout", API_TIMEOUT),
+                               retry_count=API_RETRY_COUNT if len(configs) == 1 else 0,
+                               api_key=config.get("api_key") or DEEPSEEK_API_KEY,
+                               model=config["model"])
+            endpoints.append(Endpoint(config.get("name") or config["model"], client, config.get("aliases", ())))
+        return cls(endpoints, routes)
+
+    def candidates(self, task: Optional[str] = None, model: Optional[str] = None) -> List[Endpoint]:
+        """按优先顺序返回本次请求的候选端点
+
+        Args:
+            task: 任务类型，template:<模板名>未配置路由时使用custom的路由
+            model: 指定的模型，只选择能响应该模型的端点
+
+        Returns:
+            List[Endpoint]: 可用端点按得分排序在前，暂停中的端点排在最后
+        """
+        if model:
+            pool = [endpoint for endpoint in self.endpoints if model in endpoint.models]
+        else:
+            route = self.routes.get(task or DEFAULT_TASK)
+            if route is None and task and task.startswith("template:"):
+                route = self.routes.get("custom")
+            if route is None:
+                route = self.routes.get(DEFAULT_TASK)
+            pool = ([endpoint for endpoint in self.endpoints if endpoint.name in route]
+                    if route is not None else list(self.endpoints))
+        now = time.monotonic()
+        # sorted是稳定排序，得分相同时保持配置顺序
+        return sorted(pool, key=lambda endpoint: (not endpoint.available(now), endpoint.score()))
+
+    def generate_content(self, prompt: str, params: Dict[str, Any] = None,
+                         on_delta: Optional[Callable[[str], None]] = None,
+                         prefix: Sequence[str] = (), task: Optional[str] = None) -> Dict[str, Any]:
+        """选择端点生成内容，失败时切换到下一个候选端点
+
+        Args:
+            prompt: 提示词中每次请求不同的部分
+            params: 生成参数，包含model时只路由到能响应该模型的端点
+            on_delta: 增量内容回调，提供时使用流式请求
+            prefix: 任务固定的说明块
+            task: 任务类型
+
+        Returns:
+            Dict: 与APIClient.generate_content相同
+
+        Raises:
+            requests.exceptions.RequestException: 所有候选端点都失败
+        """
+        params = dict(params or {})
+        model = params.get("model")
+        endpoints = self.candidates(task, model)
+        if model and not endpoints:
+            logger.warning(f"没有端点提供模型 {model}，按任务类型路由")
+            params.pop("model")
+            endpoints = self.candidates(task)
+
+        # 已经推送过增量内容后不再切换端点，避免订阅者收到重复内容
+        streamed = False
+
+        def forward(delta: str):
+            nonlocal streamed
+            streamed = True
+            on_delta(delta)
+
+        last_error: Optional[Exception] = None
+        result: Dict[str, Any] = {"content": ""}
+        for attempt, endpoint in enumerate(endpoints):
+            if attempt:
+                LLM_ROUTER_FALLBACKS.labels(task or DEFAULT_TASK).inc()
+                logger.warning(f"端点 {endpoints[attempt - 1].name} 请求失败，改用 {endpoint.name}")
+            start = time.perf_counter()
+            try:
+                result = endpoint.client.generate_content(
+                    prompt, params=params, on_delta=forward if on_delta is not None else None, prefix=prefix)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                endpoint.record_failure(_retry_after(e))
+                LLM_ROUTER_REQUESTS.labels(endpoint.name, "error").inc()
+                last_error = e
+                if streamed:
+                    raise
+                continue
+            if not result.get("content"):
+                # 响应格式错误时APIClient返回空内容
+                endpoint.record_failure()
+                LLM_ROUTER_REQUESTS.labels(endpoint.name, "empty").inc()
+                continue
+            endpoint.record_success(time.perf_counter() - start)
+            LLM_ROUTER_REQUESTS.labels(endpoint.name, "ok").inc()
+            # 端点客户端只看到forward，由这里发送节流期间暂存的结尾内容
+            flush_deltas(on_delta)
+            return result
+
+        if last_error is not None and not result.get("content"):
+            raise last_error
+        return result
+
+    def status(self) -> List[Dict[str, Any]]:
+        """各端点的当前统计，用于健康检查"""
+        return [endpoint.to_dict() for endpoint in self.endpoints]
+
+
+def _retry_after(error: Exception) -> float:
+    """从429响应中读取Retry-After秒数"""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 429:
+        return 0.0
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except (TypeError, ValueError):
+        return 0.0
@@ -3,6 +3,7 @@ import re
 from typing import Dict, List, Any, Union
 
 from config.regex_patterns import HTML_TAG_PATTERN, HASHTAG_PATTERN, MENTION_PATTERN
+from src.utils.tracing import traced
 
 class ContentParser:
     """解析API返回的内容"""
@@ -46,6 +47,7 @@ class ContentParser:
         return response_data[content_key]
     
     @staticmethod
+    @traced(phase="parse")
     def clean_html_tags(text: str) -> str:
         """清除HTML标签
         
@@ -82,6 +84,7 @@ class ContentParser:
         return re.findall(MENTION_PATTERN, text)
     
     @staticmethod
+    @traced(phase="parse")
     def segment_paragraphs(text: str) -> List[str]:
         """将文本分段
         
@@ -0,0 +1,267 @@
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config.constants import (PROMPT_CONTEXT_WINDOW, PROMPT_MAX_INPUT_TOKENS, PROMPT_MAX_OUTPUT_TOKENS,
+                              PROMPT_MIN_OUTPUT_TOKENS, PROMPT_OUTPUT_TOKENS_PER_SECTION, PROMPT_SUMMARY_CHARS,
+                              TOKENS_PER_CJK_CHAR, TOKENS_PER_OTHER_CHAR)
+
+# 中日韩文字和全角标点
+_CJK = re.compile('[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+_SPACES = re.compile('[ \\t\u3000]+')
+_SENTENCE_END = re.compile(r'(?<=[。！？!?；;])')
+# 去重时忽略列表符号和标点
+_DEDUPE_STRIP = re.compile(r'^[\s\-*•·\d.、)）]+|[\s。，、！？!?,.;；:：]+$')
+
+# 所有请求共用的系统提示词。上游按请求前缀缓存，system消息和各任务的固定说明放在前面且保持逐字不变，
+# 标题、提纲、风格等每次不同的内容只放在最后的user消息中
+SYSTEM_PROMPT = (
+    "你是一名专业的视频文案策划和脚本撰稿人，负责为中文短视频和讲解视频撰写提纲、脚本和章节内容。"
+    "请严格按照要求的格式输出，不要添加与任务无关的说明、寒暄或Markdown代码块。"
+    "内容应准确、条理清晰、适合口播。"
+)
+
+
+class PromptBuilder:
+    """提示词的token估算与预算控制"""
+
+    @staticmethod
+    def messages(prompt: str, prefix: Sequence[str] = ()) -> List[Dict[str, str]]:
+        """组装对话消息，固定内容在前、可变内容在后，使上游的前缀缓存能够命中
+
+        Args:
+            prompt: 本次请求的可变内容
+            prefix: 任务固定的说明块(格式要求、模板正文等)，同一任务的每次请求必须逐字相同
+
+        Returns:
+            List[Dict]: system消息(SYSTEM_PROMPT和固定说明块)和user消息(可变内容)
+        """
+        return [
+            {"role": "system", "content": "\n\n".join([SYSTEM_PROMPT, *prefix])},
+            {"role": "user", "content": prompt},
+        ]
+
+    @staticmethod
+    def prefix_tokens(prefix: Sequence[str] = ()) -> int:
+        """估算固定前缀(包括SYSTEM_PROMPT)的token数"""
+        return PromptBuilder.estimate_tokens("\n\n".join([SYSTEM_PROMPT, *prefix]))
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """在本地估算文本的token数，不依赖分词器和网络
+
+        Args:
+            text: 文本
+
+        Returns:
+            int: 估算的token数，中日韩字符按TOKENS_PER_CJK_CHAR、其他字符按TOKENS_PER_OTHER_CHAR计算
+        """
+        if not text:
+            return 0
+        cjk = len(_CJK.findall(text))
+        return math.ceil(cjk * TOKENS_PER_CJK_CHAR + (len(text) - cjk) * TOKENS_PER_OTHER_CHAR)
+
+    @staticmethod
+    def output_tokens(section_count: int, input_tokens: int) -> int:
+        """按章节数确定max_tokens，并保证输入与输出之和不超过上下文长度"""
+        wanted = max(PROMPT_MIN_OUTPUT_TOKENS, section_count * PROMPT_OUTPUT_TOKENS_PER_SECTION)
+        return max(1, min(wanted, PROMPT_MAX_OUTPUT_TOKENS, PROMPT_CONTEXT_WINDOW - input_tokens))
+
+    @staticmethod
+    def normalize_sections(sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """统一章节结构，描述可能在description或content字段中
+
+        Returns:
+            List[Dict]: 包含title、description、priority的章节列表
+        """
+        normalized = []
+        for index, section in enumerate(sections or []):
+            if not isinstance(section, dict):
+                continue
+            description = section.get('description') or section.get('content') or ''
+            lines = [_SPACES.sub(' ', line).strip() for line in str(description).split('\n')]
+            priority = section.get('priority')
+            if not isinstance(priority, (int, float)):
+                # 未指定优先级时开头和结尾章节更重要
+                priority = 2 if index in (0, len(sections) - 1) else 1
+            normalized.append({
+                'title': _SPACES.sub(' ', str(section.get('title', ''))).strip(),
+                'description': '\n'.join(line for line in lines if line),
+                'priority': priority,
+            })
+        return normalized
+
+    @staticmethod
+    def compact_sections(sections: List[Dict[str, Any]], render: Callable[[List[Dict[str, Any]]], str],
+                         budget: int) -> Tuple[List[Dict[str, Any]], str, List[str]]:
+        """将提纲压缩到预算以内
+
+        依次尝试：去除重复的描述行；将低优先级章节的描述缩减为首句；统一截断所有描述；只保留章节标题。
+        每一步完成后如果已经在预算以内就停止。
+
+        Args:
+            sections: normalize_sections的结果
+            render: 根据章节生成完整提示词的函数
+            budget: 输入token预算
+
+        Returns:
+            Tuple[List[Dict], str, List[str]]: (压缩后的章节, 提示词, 执行过的压缩步骤)
+        """
+        steps: List[str] = []
+        prompt = render(sections)
+        if PromptBuilder.estimate_tokens(prompt) <= budget:
+            return sections, prompt, steps
+
+        def fits(candidate):
+            text = render(candidate)
+            return PromptBuilder.estimate_tokens(text) <= budget, text
+
+        # 1. 去除重复的描述行(包括与章节标题相同的行)
+        seen = set()
+        deduped = []
+        for section in sections:
+            seen.add(_DEDUPE_STRIP.sub('', section['title']))
+            kept = []
+            for line in section['description'].split('\n'):
+                key = _DEDUPE_STRIP.sub('', line)
+                if key and key in seen:
+                    continue
+                seen.add(key)
+                kept.append(line)
+            deduped.append(dict(section, description='\n'.join(kept)))
+        if [s['description'] for s in deduped] != [s['description'] for s in sections]:
+            steps.append('dedupe')
+        sections = deduped
+        ok, prompt = fits(sections)
+        if ok:
+            return sections, prompt, steps
+
+        # 2. 从优先级最低、描述最长的章节开始，描述只保留首句
+        order = sorted(range(len(sections)),
+                       key=lambda i: (sections[i]['priority'], -len(sections[i]['description'])))
+        sections = list(sections)
+        summarized = 0
+        for index in order:
+            description = sections[index]['description']
+            summary = _summarize(description, PROMPT_SUMMARY_CHARS)
+            if summary == description:
+                continue
+            sections[index] = dict(sections[index], description=summary)
+            summarized += 1
+            ok, prompt = fits(sections)
+            if ok:
+                break
+        if summarized:
+            steps.append(f'summarize:{summarized}')
+        if ok:
+            return sections, prompt, steps
+
+        # 3. 二分查找所有描述统一的最大长度
+        longest = max((len(s['description']) for s in sections), default=0)
+        low, high, best = 0, longest, None
+        while low <= high:
+            limit = (low + high) // 2
+            candidate = [dict(s, description=_truncate(s['description'], limit)) for s in sections]
+            ok, text = fits(candidate)
+            if ok:
+                best, prompt = (candidate, limit), text
+                low = limit + 1
+            else:
+                high = limit - 1
+        if best is not None and best[1] > 0:
+            steps.append(f'trim:{best[1]}')
+            return best[0], prompt, steps
+
+        # 4. 只保留章节标题
+        sections = [dict(s, description='') for s in sections]
+        steps.append('titles_only')
+        return sections, render(sections), steps
+
+    @staticmethod
+    def build(render: Callable[[List[Dict[str, Any]]], str], sections: List[Dict[str, Any]],
+              input_budget: int = PROMPT_MAX_INPUT_TOKENS, output_sections: Optional[int] = None,
+              prefix: Sequence[str] = ()) -> Tuple[str, Dict[str, Any]]:
+        """生成提示词并计算本次请求的token预算
+
+        Args:
+            render: 根据章节生成可变内容的函数
+            sections: 提纲章节(原始结构)
+            input_budget: 输入token预算，固定前缀也计入预算
+            output_sections: 计算max_tokens时使用的章节数，默认与提纲章节数相同
+            prefix: 随请求发送的固定说明块，见messages
+
+        Returns:
+            Tuple[str, Dict]: (可变内容, 预算信息)，预算信息包含input_tokens、prefix_tokens、input_budget、
+                original_input_tokens、max_tokens、compaction和over_budget
+        """
+        fixed = PromptBuilder.prefix_tokens(prefix)
+        normalized = PromptBuilder.normalize_sections(sections)
+        original_tokens = fixed + PromptBuilder.estimate_tokens(render(normalized))
+        _, prompt, steps = PromptBuilder.compact_sections(normalized, render, input_budget - fixed)
+        input_tokens = fixed + PromptBuilder.estimate_tokens(prompt)
+        section_count = len(normalized) if output_sections is None else output_sections
+        max_tokens = PromptBuilder.output_tokens(section_count, input_tokens)
+        return prompt, _budget(input_tokens, fixed, original_tokens, input_budget, max_tokens, steps)
+
+    @staticmethod
+    def build_text(render: Callable[[str], str], text: str, max_tokens: int,
+                   input_budget: int = PROMPT_MAX_INPUT_TOKENS,
+                   prefix: Sequence[str] = ()) -> Tuple[str, Dict[str, Any]]:
+        """生成只有一段可变文本的提示词，超出预算时截断该文本
+
+        Args:
+            render: 根据文本生成可变内容的函数
+            text: 可变文本，例如用户提供的主要内容
+            max_tokens: 期望的输出token数
+            input_budget: 输入token预算，固定前缀也计入预算
+            prefix: 随请求发送的固定说明块，见messages
+
+        Returns:
+            Tuple[str, Dict]: (可变内容, 预算信息)，字段与build相同
+        """
+        fixed = PromptBuilder.prefix_tokens(prefix)
+        budget = input_budget - fixed
+        text = (text or '').strip()
+        prompt = render(text)
+        original_tokens = fixed + PromptBuilder.estimate_tokens(prompt)
+        steps: List[str] = []
+        if original_tokens > input_budget and text:
+            low, high, best = 0, len(text) - 1, 0
+            while low <= high:
+                limit = (low + high) // 2
+                if PromptBuilder.estimate_tokens(render(_truncate(text, limit))) <= budget:
+                    best, low = limit, limit + 1
+                else:
+                    high = limit - 1
+            prompt = render(_truncate(text, best))
+            steps.append(f'trim:{best}')
+        input_tokens = fixed + PromptBuilder.estimate_tokens(prompt)
+        max_tokens = max(1, min(max_tokens, PROMPT_CONTEXT_WINDOW - input_tokens))
+        return prompt, _budget(input_tokens, fixed, original_tokens, input_budget, max_tokens, steps)
+
+
+def _budget(input_tokens: int, prefix_tokens: int, original_tokens: int, input_budget: int, max_tokens: int,
+            steps: List[str]) -> Dict[str, Any]:
+    return {
+        'input_tokens': input_tokens,
+        'prefix_tokens': prefix_tokens,
+        'input_budget': input_budget,
+        'original_input_tokens': original_tokens,
+        'max_tokens': max_tokens,
+        'compaction': steps,
+        'over_budget': input_tokens > input_budget,
+    }
+
+def _summarize(text: str, limit: int) -> str:
+    """取首句作为摘要，超过limit时截断"""
+    first_line = text.split('\n', 1)[0]
+    first = _SENTENCE_END.split(first_line, 1)[0]
+    return _truncate(first, limit)
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    if limit <= 0:
+        return ''
+    return text[:limit].rstrip() + '…'
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, List, Optional
+
+from config.constants import (SPECULATIVE_MAX_CONCURRENT, SPECULATIVE_MAX_INTERACTIVE, SPECULATIVE_TTL,
+                              SPECULATIVE_MAX_ENTRIES)
+from src.utils.admission import GENERATIONS_IN_FLIGHT
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# 预生成使用的默认参数，与VideoScriptGenerator.generate_script的默认值一致
+DEFAULT_PARAMS = ('专业', '简洁', '通用')
+
+SPECULATIVE_RESULTS = REGISTRY.counter(
+    "speculative_scripts_total", "投机生成脚本的结果", ("outcome",))
+
+
+def outline_fingerprint(title: str, sections: List[Dict[str, Any]]) -> str:
+    """提纲内容的摘要(忽略首尾空白)，提纲被修改后摘要不同，旧的预生成结果不会被使用"""
+    payload = json.dumps([(title or '').strip(),
+                          [[(s.get('title') or '').strip(), (s.get('content') or '').strip()] for s in sections]],
+                         ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "created", "cancelled", "started", "future")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.created = time.monotonic()
+        self.cancelled = threading.Event()
+        self.started = False
+        self.future: Optional[Future] = None
+
+
+class SpeculativeScripts:
+    """保存提纲后在后台按默认参数预先生成脚本，用户随后请求生成脚本时直接使用
+
+    后台生成使用独立的线程池，不经过生成接口的准入控制；有交互生成请求在执行时暂不开始，
+    等到空闲或结果过期。同一提纲再次保存时取消之前的预生成，结果按提纲内容摘要匹配，
+    提纲内容变化后不会使用旧结果。
+
+    Args:
+        generator: VideoScriptGenerator实例
+        max_workers: 同时进行的投机生成数
+        ttl: 预生成结果的有效期(秒)
+        busy: 返回True时暂不开始新的投机生成，默认在交互生成请求数达到SPECULATIVE_MAX_INTERACTIVE时为True
+        poll_interval: 等待空闲时的检查间隔(秒)
+        max_entries: 保留的预生成结果数上限，超出时丢弃最早的
+    """
+
+    def __init__(self, generator, max_workers: int = SPECULATIVE_MAX_CONCURRENT, ttl: float = SPECULATIVE_TTL,
+                 busy: Optional[Callable[[], bool]] = None, poll_interval: float = 0.5,
+                 max_entries: int = SPECULATIVE_MAX_ENTRIES):
+        self.generator = generator
+        self.ttl = ttl
+        self.busy = busy or (lambda: GENERATIONS_IN_FLIGHT.get() >= SPECULATIVE_MAX_INTERACTIVE)
+        self.poll_interval = poll_interval
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="speculative")
+
+    def schedule(self, outline_id: Any, title: str, sections: List[Dict[str, Any]]):
+        """提纲保存后安排预生成，取消该提纲之前的预生成
+
+        Args:
+            outline_id: 提纲ID
+            title: 提纲标题
+            sections: 提纲章节，包含title和content
+        """
+        outline_id = str(outline_id)
+        sections = [{'title': s.get('title', ''), 'content': s.get('content', '')} for s in sections]
+        entry = _Entry(outline_fingerprint(title, sections))
+        with self._lock:
+            self._discard(self._entries.pop(outline_id, None), "cancelled")
+            self._entries[outline_id] = entry
+            while len(self._entries) > self.max_entries:
+                _, oldest = self._entries.popitem(last=False)
+                self._discard(oldest, "evicted")
+            entry.future = self._executor.submit(self._run, outline_id, entry, title, sections)
+
+    def cancel(self, outline_id: Any):
+        """取消提纲的预生成并丢弃已有结果"""
+        with self._lock:
+            self._discard(self._entries.pop(str(outline_id), None), "cancelled")
+
+    def take(self, outline_id: Any, title: str, sections: List[Dict[str, Any]], style: str, tone: str,
+             audience: str) -> Optional[Dict[str, Any]]:
+        """取出与当前提纲内容和参数匹配的预生成脚本，每个结果只使用一次
+
+        预生成已开始时等待其结果，正在进行的上游请求不能取消，重新生成只会多一次相同的调用；
+        还未开始时取消它，由调用方直接生成。预生成失败时同样返回None。
+
+        Returns:
+            Optional[Dict]: 脚本，没有可用结果时返回None
+        """
+        if (style, tone, audience) != DEFAULT_PARAMS:
+            return None
+        with self._lock:
+            entry = self._entries.pop(str(outline_id), None)
+            if entry is not None and not entry.started:
+                # 在锁内作废，_run不会在此之后开始生成
+                self._discard(entry, "not_started")
+                return None
+        if entry is None:
+            SPECULATIVE_RESULTS.labels("miss").inc()
+            return None
+        if entry.fingerprint != outline_fingerprint(title, sections) or self._expired(entry):
+            self._discard(entry, "stale")
+            return None
+        try:
+            script = entry.future.result()
+        except Exception as e:
+            logger.warning(f"读取预生成脚本失败，提纲ID: {outline_id}: {e}")
+            self._discard(entry, "error")
+            return None
+        if script is None:
+            SPECULATIVE_RESULTS.labels("miss").inc()
+            return None
+        SPECULATIVE_RESULTS.labels("hit").inc()
+        return dict(script)
+
+    def _run(self, outline_id: str, entry: _Entry, title: str,
+             sections: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        # 有交互请求时等待，不与其争抢上游和数据库
+        while self.busy():
+            if entry.cancelled.is_set() or self._expired(entry):
+                return None
+            time.sleep(self.poll_interval)
+        with self._lock:
+            if entry.cancelled.is_set() or self._expired(entry):
+                return None
+            entry.started = True
+        try:
+            script = self.generator.generate_script(title, {"sections": sections}, *DEFAULT_PARAMS)
+        except Exception as e:
+            logger.warning(f"投机生成脚本失败，提纲ID: {outline_id}: {e}")
+            SPECULATIVE_RESULTS.labels("failed").inc()
+            return None
+        if "error" in script:
+            SPECULATIVE_RESULTS.labels("failed").inc()
+            return None
+        if entry.cancelled.is_set():
+            # 生成期间提纲被修改，结果作废
+            return None
+        SPECULATIVE_RESULTS.labels("generated").inc()
+        logger.info(f"已预生成脚本，提纲ID: {outline_id}")
+        return script
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    @staticmethod
+    def _discard(entry: Optional[_Entry], outcome: str):
+        if entry is None:
+            return
+        entry.cancelled.set()
+        if entry.future is not None:
+            entry.future.cancel()
+        SPECULATIVE_RESULTS.labels(outcome).inc()
+
+    def shutdown(self):
+        with self._lock:
+            for entry in self._entries.values():
+                entry.cancelled.set()
+            self._entries.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -3,6 +3,7 @@ from typing import List, Dict, Any, Tuple, Optional
 
 from config.constants import MAX_CONTENT_LENGTH, MIN_CONTENT_LENGTH
 from config.regex_patterns import SPECIAL_CHARS_PATTERN, EMAIL_PATTERN, URL_PATTERN
+from src.utils.tracing import traced
 
 class ContentValidator:
     """内容验证器，检查生成内容是否符合要求"""
@@ -72,6 +73,7 @@ class ContentValidator:
         return True, None
     
     @staticmethod
+    @traced(phase="validate")
     def validate_all(text: str) -> Dict[str, Any]:
         """执行所有验证
         
@@ -1,12 +1,49 @@
+import contextvars
 import logging
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 
 from src.script_generator.api_client import APIClient
+from src.script_generator.continuation import ContinuationEngine, add_usage
 from src.script_generator.parser import ContentParser
+from src.script_generator.prompt_builder import PromptBuilder
 from src.script_generator.validator import ContentValidator
+from src.utils.tracing import span, traced
+from src.utils.progress import report, token_reporter, current_job
+from config.constants import (PROMPT_OUTLINE_OUTPUT_TOKENS, PROMPT_OUTPUT_TOKENS_PER_SECTION, PROMPT_MAX_OUTPUT_TOKENS,
+                              SCRIPT_SECTION_WORKERS)
 
 logger = logging.getLogger(__name__)
 
+# 各任务固定的说明，作为请求的缓存前缀发送(见PromptBuilder.messages)，不要在其中插入标题等可变内容
+OUTLINE_INSTRUCTIONS = (
+    "任务：为用户给出标题的视频脚本生成详细的内容提纲。"
+    "\n\n请按照以下格式生成提纲："
+    "\n1. 第一部分标题"
+    "\n   - 这部分应该包含的要点和内容"
+    "\n2. 第二部分标题"
+    "\n   - 这部分应该包含的要点和内容"
+    "\n..."
+    "\n\n提纲应该包含3-5个主要部分，每个部分都应该有明确的标题和简短的内容描述。"
+    "\n请确保提纲逻辑清晰，结构合理，能够引导观众从头到尾理解主题。"
+)
+
+SCRIPT_INSTRUCTIONS = (
+    "任务：根据用户给出的视频标题和提纲生成完整的视频脚本内容。"
+    "\n请生成完整的脚本内容，包括开场白、每个章节的详细内容、转场和结束语。"
+    "每个章节的内容应该详细展开，使用用户指定的视频风格和语气，以及适合目标受众的语言风格。"
+)
+
+SCRIPT_PART_INSTRUCTIONS = (
+    "分章节撰写：本次只撰写用户指定的一个章节，只输出该章节的脚本内容，不要输出其他章节。"
+    "第一个章节以开场白开头，最后一个章节以结束语结尾，其余章节以承接上一章节的转场开头。"
+)
+
+SECTION_INSTRUCTIONS = (
+    "任务：为用户给出标题的视频章节生成详细的内容。内容应该清晰、有条理，并且包含相关的要点和细节。"
+    "\n\n生成的内容应该是一段连贯的文字，不需要包含标题，直接从正文内容开始。"
+)
+
 class VideoScriptGenerator:
     """视频文案脚本生成器，用于生成视频脚本提纲和内容"""
     
@@ -14,10 +51,12 @@ class VideoScriptGenerator:
         """初始化视频脚本生成器
         
         Args:
-            api_client: API客户端实例
+            api_client: API客户端实例，也可以传入ModelRouter在多个端点之间路由
         """
         self.api_client = api_client
+        self.continuation = ContinuationEngine(api_client)
     
+    @traced()
     def generate_outline(self, title: str, main_content: Optional[str] = None) -> Dict[str, Any]:
         """生成视频脚本提纲
         
@@ -34,15 +73,23 @@ class VideoScriptGenerator:
                         {"title": "章节2标题", "description": "章节2描述"},
                         ...
                     ],
-                    "raw_content": "原始生成内容"
+                    "raw_content": "原始生成内容",
+                    "budget": {"input_tokens": 估算的输入token数, "max_tokens": 输出上限, ...}
                 }
         """
         # 构建提示词
-        prompt = self._build_outline_prompt(title, main_content)
+        with span("build_outline_prompt", phase="prompt"):
+            prompt, budget = self._build_outline_prompt(title, main_content)
+        report("prompt_built", prompt_chars=len(prompt), input_tokens=budget["input_tokens"],
+               max_tokens=budget["max_tokens"])
         
-        # 调用API生成内容
+        # 调用API生成内容，有进度订阅时使用流式请求推送部分内容
         logger.info(f"正在为视频《{title}》生成脚本提纲...")
-        response = self.api_client.generate_content(prompt)
+        response = self.api_client.generate_content(prompt, params={"max_tokens": budget["max_tokens"]},
+                                                    on_delta=token_reporter(), prefix=(OUTLINE_INSTRUCTIONS,),
+                                                    task="outline")
+        if "usage" in response:
+            budget["usage"] = response["usage"]
         
         # 解析生成的内容
         content = response.get("content", "")
@@ -51,38 +98,35 @@ class VideoScriptGenerator:
             return {"error": "生成提纲失败，请重试"}
         
         # 解析提纲结构
-        outline = self._parse_outline(content)
+        report("parsing", content_chars=len(content))
+        with span("parse_outline", phase="parse"):
+            outline = self._parse_outline(content)
         outline["raw_content"] = content
         outline["title"] = title
+        outline["budget"] = budget
         
         return outline
     
-    def _build_outline_prompt(self, title: str, main_content: Optional[str] = None) -> str:
-        """构建生成提纲的提示词
+    def _build_outline_prompt(self, title: str, main_content: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """构建生成提纲的提示词中每次请求不同的部分，固定说明见OUTLINE_INSTRUCTIONS
+        
+        主要内容描述过长、超出输入预算时会被截断。
         
         Args:
             title: 视频标题/主题
             main_content: 主要内容描述（可选）
             
         Returns:
-            str: 构建好的提示词
+            Tuple[str, Dict]: 构建好的提示词和token预算信息
         """
-        prompt = f"请为一个标题为《{title}》的视频脚本生成详细的内容提纲。"
-        
-        if main_content:
-            prompt += f"\n\n视频的主要内容是：{main_content}"
-        
-        prompt += "\n\n请按照以下格式生成提纲："
-        prompt += "\n1. 第一部分标题"
-        prompt += "\n   - 这部分应该包含的要点和内容"
-        prompt += "\n2. 第二部分标题"
-        prompt += "\n   - 这部分应该包含的要点和内容"
-        prompt += "\n..."
-        
-        prompt += "\n\n提纲应该包含3-5个主要部分，每个部分都应该有明确的标题和简短的内容描述。"
-        prompt += "\n请确保提纲逻辑清晰，结构合理，能够引导观众从头到尾理解主题。"
-        
-        return prompt
+        def render(content: str) -> str:
+            parts = [f"视频标题：《{title}》"]
+            if content:
+                parts.append(f"\n\n视频的主要内容是：{content}")
+            return "".join(parts)
+        
+        return PromptBuilder.build_text(render, main_content or "", PROMPT_OUTLINE_OUTPUT_TOKENS,
+                                        prefix=(OUTLINE_INSTRUCTIONS,))
     
     def _parse_outline(self, content: str) -> Dict[str, Any]:
         """解析生成的提纲内容
@@ -133,6 +177,7 @@ class VideoScriptGenerator:
         
         return {"sections": sections}
     
+    @traced()
     def generate_script(self, title: str, outline: Dict[str, Any], style: str = '专业', tone: str = '简洁', audience: str = '通用') -> Dict[str, Any]:
         """根据提纲生成完整视频脚本
         
@@ -144,56 +189,130 @@ class VideoScriptGenerator:
             audience: 目标受众
             
         Returns:
-            Dict: 完整脚本内容
+            Dict: 完整脚本内容，budget字段为本次请求的token预算；续写后仍不完整时truncated为True
         """
         # 构建提示词
-        prompt = self._build_script_prompt(title, outline, style, tone, audience)
-        
-        # 调用API生成内容
-        logger.info(f"正在为视频《{title}》生成完整脚本...")
-        response = self.api_client.generate_content(prompt)
+        with span("build_script_prompt", phase="prompt"):
+            prompt, budget = self._build_script_prompt(title, outline, style, tone, audience)
+        if budget["compaction"]:
+            logger.info(f"提示词超出输入预算，已压缩提纲: {budget['original_input_tokens']} -> "
+                        f"{budget['input_tokens']} tokens ({', '.join(budget['compaction'])})")
+        report("prompt_built", prompt_chars=len(prompt), input_tokens=budget["input_tokens"],
+               max_tokens=budget["max_tokens"], compaction=budget["compaction"])
+        
+        section_titles = [section['title'] for section in PromptBuilder.normalize_sections(outline.get("sections", []))]
+        if len(section_titles) * PROMPT_OUTPUT_TOKENS_PER_SECTION > PROMPT_MAX_OUTPUT_TOKENS:
+            # 一次输出放不下时按章节并行生成
+            logger.info(f"正在为视频《{title}》按{len(section_titles)}个章节并行生成脚本...")
+            result = self._generate_by_section(prompt, budget, section_titles)
+            budget["mode"] = "sections"
+        else:
+            # 调用API生成内容，有进度订阅时使用流式请求推送部分内容，被截断时自动续写
+            logger.info(f"正在为视频《{title}》生成完整脚本...")
+            result = self.continuation.generate(prompt, params={"max_tokens": budget["max_tokens"]},
+                                                on_delta=token_reporter(), prefix=(SCRIPT_INSTRUCTIONS,),
+                                                task="script")
+            budget["mode"] = "single"
+        budget["continuations"] = result["continuations"]
+        if result["usage"]:
+            budget["usage"] = result["usage"]
         
         # 解析生成的内容
-        content = response.get("content", "")
+        content = result["content"]
         if not content:
             logger.error("生成脚本失败，API返回内容为空")
             return {"error": "生成脚本失败，请重试"}
         
         # 解析脚本结构
-        script = self._parse_script(content)
+        report("parsing", content_chars=len(content))
+        with span("parse_script", phase="parse"):
+            script = self._parse_script(content)
+        
+        # 校验结果只推送给进度订阅者，不影响返回内容
+        if current_job() is not None:
+            report("validation", **ContentValidator.validate_all(content))
         script["title"] = title
         script["raw_content"] = content
+        if result["truncated"]:
+            script["truncated"] = True
+        script["budget"] = budget
         
         return script
     
-    def _build_script_prompt(self, title: str, outline: Dict[str, Any], style: str, tone: str, audience: str) -> str:
-        """构建生成完整脚本的提示词
+    def _generate_by_section(self, prompt: str, budget: Dict[str, Any], section_titles: List[str]) -> Dict[str, Any]:
+        """每个章节单独请求并行生成，再按章节顺序拼接
+        
+        所有章节请求共用提纲作为提示词，只在结尾指定本次撰写的章节；每个章节被截断时各自续写。
+        
+        Args:
+            prompt: _build_script_prompt生成的提示词
+            budget: token预算信息，max_tokens改为单个章节的输出上限
+            section_titles: 章节标题
+            
+        Returns:
+            Dict: 与ContinuationEngine.generate相同，任一章节为空时content为空
+        """
+        total = len(section_titles)
+        budget["max_tokens"] = PromptBuilder.output_tokens(1, budget["input_tokens"])
+        params = {"max_tokens": budget["max_tokens"]}
+        
+        def generate_part(index: int) -> Dict[str, Any]:
+            part_prompt = f"{prompt}\n\n本次撰写第{index + 1}个章节(共{total}个)：{section_titles[index]}"
+            with span("generate_script_section", phase="llm", section=index + 1):
+                result = self.continuation.generate(part_prompt, params=params,
+                                                    prefix=(SCRIPT_INSTRUCTIONS, SCRIPT_PART_INSTRUCTIONS),
+                                                    task="script", section=index + 1)
+            report("section_done", section=index + 1, total=total, content_chars=len(result["content"]))
+            return result
+        
+        # 每个任务复制当前上下文，章节请求的进度事件和追踪记录仍属于本次请求
+        with ThreadPoolExecutor(max_workers=min(SCRIPT_SECTION_WORKERS, total),
+                                thread_name_prefix="script-section") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, generate_part, index)
+                       for index in range(total)]
+            parts = [future.result() for future in futures]
+        
+        usage = None
+        for part in parts:
+            usage = add_usage(usage, part["usage"])
+        complete = all(part["content"] for part in parts)
+        return {
+            "content": "\n\n".join(part["content"].strip() for part in parts) if complete else "",
+            "finish_reason": parts[-1]["finish_reason"],
+            "usage": usage,
+            "continuations": sum(part["continuations"] for part in parts),
+            "truncated": any(part["truncated"] for part in parts),
+        }
+    
+    def _build_script_prompt(self, title: str, outline: Dict[str, Any], style: str, tone: str,
+                             audience: str) -> Tuple[str, Dict[str, Any]]:
+        """构建生成完整脚本的提示词中每次请求不同的部分，固定说明见SCRIPT_INSTRUCTIONS
+        
+        提示词超出输入预算时按PromptBuilder.compact_sections的顺序压缩提纲描述，
+        max_tokens按章节数计算。
         
         Args:
             title: 视频标题
-            outline: 提纲结构
+            outline: 提纲结构，章节描述在description或content字段中
             style: 风格
             tone: 语气
             audience: 目标受众
             
         Returns:
-            str: 构建好的提示词
+            Tuple[str, Dict]: 构建好的提示词和token预算信息
         """
-        prompt = f"请根据以下提纲为标题为《{title}》的视频生成完整的脚本内容。\n\n"
-        prompt += f"视频风格: {style}\n"
-        prompt += f"语气: {tone}\n"
-        prompt += f"目标受众: {audience}\n\n"
-        
-        # 添加提纲内容
-        prompt += "视频提纲:\n"
-        for section in outline.get("sections", []):
-            prompt += f"{section.get('title', '')}\n"
-            prompt += f"{section.get('description', '')}\n\n"
-        
-        prompt += "\n请生成完整的脚本内容，包括开场白、每个章节的详细内容、转场和结束语。"
-        prompt += "每个章节的内容应该详细展开，使用适合目标受众的语言风格。"
-        
-        return prompt
+        settings = (f"视频风格: {style}\n"
+                    f"语气: {tone}\n"
+                    f"目标受众: {audience}")
+        
+        def render(sections: List[Dict[str, Any]]) -> str:
+            parts = [f"视频标题：《{title}》\n\n视频提纲:\n"]
+            for section in sections:
+                parts.append(f"{section['title']}\n{section['description']}\n\n")
+            parts.append(settings)
+            return "".join(parts)
+        
+        return PromptBuilder.build(render, outline.get("sections", []), prefix=(SCRIPT_INSTRUCTIONS,))
     
     def _parse_script(self, content: str) -> Dict[str, Any]:
         """解析生成的脚本内容
@@ -0,0 +1,288 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，只能使用进程内的并发控制
+    fcntl = None
+
+from config.constants import (RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST, MAX_CONCURRENT_GENERATIONS,
+                              GENERATION_QUEUE_SIZE, GENERATION_QUEUE_TIMEOUT, ADMISSION_STORE)
+from src.utils.metrics import REGISTRY
+
+# 获取项目根目录
+project_root = Path(__file__).parent.parent.parent
+
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "admission_rejections_total", "准入控制拒绝的请求数", ("reason",))
+GENERATIONS_IN_FLIGHT = REGISTRY.gauge(
+    "generations_in_flight", "本进程正在执行的生成请求数")
+GENERATIONS_WAITING = REGISTRY.gauge(
+    "generations_waiting", "本进程排队等待的生成请求数")
+
+
+class TokenBucket:
+    """令牌桶
+
+    Args:
+        rate: 每秒补充的令牌数
+        capacity: 桶容量(允许的突发请求数)
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: Optional[float] = None) -> Tuple[bool, float]:
+        """尝试取一个令牌
+
+        Returns:
+            Tuple[bool, float]: (是否允许, 需要等待的秒数)
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """按客户端划分的进程内令牌桶限流器，客户端数量超过上限时淘汰最久未访问的桶"""
+
+    def __init__(self, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str) -> Tuple[bool, float]:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take()
+
+
+class SharedRateLimiter:
+    """基于本地SQLite文件的令牌桶限流器，供同一台机器上的多个worker进程共享状态"""
+
+    def __init__(self, db_path: str, per_minute: float = RATE_LIMIT_PER_MINUTE,
+                 burst: float = RATE_LIMIT_BURST):
+        self.db_path = db_path
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def check(self, key: str) -> Tuple[bool, float]:
+        conn = self._connect()
+        # 多进程共享时只能用墙钟时间
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 空闲期间已补满的桶与新建的桶相同，删除后每个客户端不会一直占用一行
+            conn.execute("DELETE FROM buckets WHERE updated + (? - tokens) / ? <= ?", (self.burst, self.rate, now))
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            bucket = TokenBucket(self.rate, self.burst)
+            if row:
+                bucket.tokens, bucket.updated = row[0], min(row[1], now)
+            else:
+                bucket.updated = now
+            result = bucket.take(now)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, bucket.tokens, bucket.updated))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+
+class GenerationGate:
+    """全局生成并发闸门：超过并发上限时进入有界等待队列，队列满或等待超时则拒绝
+
+    Args:
+        max_concurrent: 同时执行的生成请求上限
+        max_queue: 等待队列长度上限
+        queue_timeout: 排队的最长等待时间(秒)
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_GENERATIONS,
+                 max_queue: int = GENERATION_QUEUE_SIZE,
+                 queue_timeout: float = GENERATION_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> Tuple[bool, str]:
+        """获取执行名额
+
+        Returns:
+            Tuple[bool, str]: (是否获得名额, 拒绝原因 queue_full/queue_timeout)
+        """
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self._enter()
+                return True, ""
+            if self.waiting >= self.max_queue:
+                return False, "queue_full"
+            self.waiting += 1
+            GENERATIONS_WAITING.set(self.waiting)
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False, "queue_timeout"
+                    self._cond.wait(remaining)
+                self._enter()
+                return True, ""
+            finally:
+                self.waiting -= 1
+                GENERATIONS_WAITING.set(self.waiting)
+
+    def _enter(self):
+        self.active += 1
+        GENERATIONS_IN_FLIGHT.set(self.active)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            GENERATIONS_IN_FLIGHT.set(self.active)
+            self._cond.notify()
+
+
+class FileSlotGate:
+    """基于文件锁的跨进程并发闸门，每个名额对应一个加锁的槽位文件
+
+    进程退出时操作系统自动释放文件锁，不会因worker崩溃而泄漏名额。
+    """
+
+    def __init__(self, lock_dir: str, max_concurrent: int = MAX_CONCURRENT_GENERATIONS,
+                 max_queue: int = GENERATION_QUEUE_SIZE, queue_timeout: float = GENERATION_QUEUE_TIMEOUT,
+                 poll_interval: float = 0.05):
+        if fcntl is None:
+            raise RuntimeError("当前平台不支持文件锁")
+        self.lock_dir = lock_dir
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self.waiting = 0
+        self._lock = threading.Lock()
+        self._held = threading.local()
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _try_slots(self) -> bool:
+        for index in range(self.max_concurrent):
+            fd = os.open(os.path.join(self.lock_dir, f"slot-{index}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            self._held.fd = fd
+            GENERATIONS_IN_FLIGHT.inc()
+            return True
+        return False
+
+    def acquire(self) -> Tuple[bool, str]:
+        if self._try_slots():
+            return True, ""
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                return False, "queue_full"
+            self.waiting += 1
+            GENERATIONS_WAITING.set(self.waiting)
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                if self._try_slots():
+                    return True, ""
+            return False, "queue_timeout"
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                GENERATIONS_WAITING.set(self.waiting)
+
+    def release(self):
+        fd = getattr(self._held, 'fd', None)
+        if fd is not None:
+            self._held.fd = None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            GENERATIONS_IN_FLIGHT.dec()
+
+
+class AdmissionController:
+    """生成类接口的准入控制：先按客户端限流，再获取全局并发名额"""
+
+    def __init__(self, limiter, gate):
+        self.limiter = limiter
+        self.gate = gate
+
+    def admit(self, client_key: str) -> Tuple[bool, int, str, int]:
+        """判断请求能否进入
+
+        Returns:
+            Tuple[bool, int, str, int]: (是否允许, 拒绝时的状态码, 拒绝原因, Retry-After秒数)
+        """
+        allowed, wait = self.limiter.check(client_key)
+        if not allowed:
+            ADMISSION_REJECTIONS.labels("rate_limited").inc()
+            return False, 429, "rate_limited", max(1, math.ceil(wait))
+        admitted, reason = self.gate.acquire()
+        if not admitted:
+            ADMISSION_REJECTIONS.labels(reason).inc()
+            return False, 503, reason, max(1, math.ceil(self.gate.queue_timeout))
+        return True, 0, "", 0
+
+    def release(self):
+        self.gate.release()
+
+
+def create_admission_controller(store: str = ADMISSION_STORE) -> AdmissionController:
+    """根据配置创建准入控制器
+
+    Args:
+        store: memory(进程内状态) 或 local(本机多个worker通过SQLite文件和文件锁共享状态)
+    """
+    if store == "local":
+        base_dir = os.path.join(project_root, "data", "admission")
+        return AdmissionController(SharedRateLimiter(os.path.join(base_dir, "rate_limit.db")),
+                                   FileSlotGate(os.path.join(base_dir, "slots")))
+    return AdmissionController(RateLimiter(), GenerationGate())
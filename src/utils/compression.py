@@ -0,0 +1,64 @@
+import gzip
+from typing import Optional
+
+from flask import Request, Response
+
+from config.constants import COMPRESSION_MIN_SIZE, COMPRESSION_LEVEL
+from src.utils.http_cache import tag_encoded_etag
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时只提供gzip
+    brotli = None
+
+# 值得压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/plain',
+    'text/html',
+    'text/csv',
+    'application/x-subrip',
+    'text/x-ass',
+}
+
+
+def supported_encodings():
+    """按优先级返回服务端支持的编码"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(request: Request) -> Optional[str]:
+    """根据Accept-Encoding(含q值)选择响应编码"""
+    if not request.accept_encodings:
+        return None
+    return request.accept_encodings.best_match(supported_encodings())
+
+
+def compress_response(request: Request, response: Response,
+                      min_size: int = COMPRESSION_MIN_SIZE) -> Response:
+    """按Accept-Encoding协商压缩响应体，小于阈值或不适合压缩的响应原样返回"""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or request.method == 'HEAD'):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=min(COMPRESSION_LEVEL, 11))
+    else:
+        compressed = gzip.compress(body, compresslevel=COMPRESSION_LEVEL, mtime=0)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    tag_encoded_etag(response, encoding)
+    return response
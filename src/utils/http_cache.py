@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+
+from flask import Request, Response
+
+from config.constants import HTTP_VALIDATOR_CACHE_SIZE, HTTP_VALIDATOR_TTL, CACHE_CONTROL_POLICIES
+
+# 压缩时附加到强ETag上的编码后缀，比较时需要去掉
+ENCODING_SUFFIXES = ('-gzip', '-br')
+
+
+class ValidatorCache:
+    """资源ETag的内存LRU缓存
+
+    只保存校验值而不保存响应体；命中时可以在不访问数据库的情况下回答304。
+    条目带有TTL，多进程部署时其他进程写入造成的过期校验值最多存活TTL秒。
+    """
+
+    def __init__(self, max_entries: int = HTTP_VALIDATOR_CACHE_SIZE, ttl: float = HTTP_VALIDATOR_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            etag, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return etag
+
+    def set(self, key: str, etag: str):
+        with self._lock:
+            self._entries[key] = (etag, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def content_etag(data: bytes) -> str:
+    """根据内容计算强ETag"""
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def files_etag(paths: Iterable[str]) -> str:
+    """根据文件路径、修改时间和大小计算ETag，无需读取文件内容"""
+    digest = hashlib.blake2b(digest_size=12)
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _client_etags(request: Request) -> Set[str]:
+    """If-None-Match中的ETag集合，去掉压缩后缀(弱比较)"""
+    tags = set()
+    for tag in request.if_none_match.as_set(include_weak=True):
+        for suffix in ENCODING_SUFFIXES:
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)]
+                break
+        tags.add(tag)
+    return tags
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """判断请求的If-None-Match是否匹配给定ETag"""
+    if not etag or not request.if_none_match:
+        return False
+    if request.if_none_match.star_tag:
+        return True
+    return etag in _client_etags(request)
+
+
+def apply_policy(response: Response, policy: str) -> Response:
+    """设置路由对应的Cache-Control策略"""
+    cache_control = CACHE_CONTROL_POLICIES.get(policy)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def not_modified(etag: str, policy: str) -> Response:
+    """构造304响应"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return apply_policy(response, policy)
+
+
+def cached_not_modified(request: Request, cache: ValidatorCache, key: str, policy: str) -> Optional[Response]:
+    """请求的ETag与缓存中的校验值一致时直接返回304，否则返回None"""
+    if not request.if_none_match:
+        return None
+    etag = cache.get(key)
+    if etag_matches(request, etag):
+        return not_modified(etag, policy)
+    return None
+
+
+def conditional(request: Request, response: Response, policy: str,
+                cache: Optional[ValidatorCache] = None, key: Optional[str] = None,
+                etag: Optional[str] = None) -> Response:
+    """为成功响应添加ETag和Cache-Control，并在If-None-Match匹配时转为304
+
+    Args:
+        request: 当前请求
+        response: 原始响应
+        policy: CACHE_CONTROL_POLICIES中的策略名
+        cache: 校验值缓存，提供时会记录该资源的ETag
+        key: 资源在缓存中的键
+        etag: 预先计算的ETag，为None时使用响应体的内容哈希
+    """
+    if response.status_code != 200:
+        return response
+    if etag is None:
+        etag = content_etag(response.get_data())
+    if cache is not None and key:
+        cache.set(key, etag)
+    if etag_matches(request, etag):
+        return not_modified(etag, policy)
+    response.set_etag(etag)
+    return apply_policy(response, policy)
+
+
+def tag_encoded_etag(response: Response, encoding: str):
+    """响应被压缩后为强ETag附加编码后缀，区分不同表示"""
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+
+
+# 全局校验值缓存
+validator_cache = ValidatorCache()
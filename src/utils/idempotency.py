@@ -0,0 +1,158 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from config.constants import IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_STORE
+from src.utils.metrics import REGISTRY
+
+# 获取项目根目录
+project_root = Path(__file__).parent.parent.parent
+
+IDEMPOTENCY_REPLAYS = REGISTRY.counter(
+    "idempotency_replays_total", "按Idempotency-Key重放的响应数", ("outcome",))
+
+# reserve()的结果
+NEW = "new"  # 首次请求，调用方执行后需调用complete或release
+REPLAY = "replay"  # 已完成，返回保存的响应
+IN_PROGRESS = "in_progress"  # 相同Key的请求仍在执行
+MISMATCH = "mismatch"  # 相同Key但请求内容不同
+
+
+class StoredResponse:
+    """保存的响应，只包含重放所需的部分"""
+
+    __slots__ = ("status", "content_type", "body")
+
+    def __init__(self, status: int, content_type: str, body: bytes):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """请求的指纹，用于识别同一Key被不同请求复用"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{method} {path}\n".encode('utf-8'))
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """进程内的幂等记录，按TTL过期，超过上限时淘汰最早的记录
+
+    Args:
+        ttl: 记录保存时间(秒)
+        max_entries: 记录数量上限
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """占用Key
+
+        Returns:
+            Tuple[str, Optional[StoredResponse]]: (NEW/REPLAY/IN_PROGRESS/MISMATCH, 已保存的响应)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._entries[key] = (fingerprint, None, now + self.ttl)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                return NEW, None
+            stored_fingerprint, response, _ = entry
+            if stored_fingerprint != fingerprint:
+                return MISMATCH, None
+            if response is None:
+                return IN_PROGRESS, None
+            return REPLAY, response
+
+    def complete(self, key: str, response: StoredResponse):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], response, time.monotonic() + self.ttl)
+
+    def release(self, key: str):
+        """执行失败时释放Key，允许客户端重试"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SharedIdempotencyStore:
+    """基于本地SQLite文件的幂等记录，供同一台机器上的多个worker进程共享"""
+
+    def __init__(self, db_path: str, ttl: float = IDEMPOTENCY_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "status INTEGER, content_type TEXT, body BLOB, expires REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        conn = self._connect()
+        # 多进程共享时只能用墙钟时间
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM idempotency_keys WHERE expires < ?", (now,))
+            row = conn.execute("SELECT fingerprint, status, content_type, body FROM idempotency_keys WHERE key = ?",
+                               (key,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO idempotency_keys (key, fingerprint, expires) VALUES (?, ?, ?)",
+                             (key, fingerprint, now + self.ttl))
+                result = NEW, None
+            elif row[0] != fingerprint:
+                result = MISMATCH, None
+            elif row[1] is None:
+                result = IN_PROGRESS, None
+            else:
+                result = REPLAY, StoredResponse(row[1], row[2], bytes(row[3]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def complete(self, key: str, response: StoredResponse):
+        self._connect().execute(
+            "UPDATE idempotency_keys SET status = ?, content_type = ?, body = ?, expires = ? WHERE key = ?",
+            (response.status, response.content_type, response.body, time.time() + self.ttl, key))
+
+    def release(self, key: str):
+        self._connect().execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+
+def create_idempotency_store(store: str = IDEMPOTENCY_STORE):
+    """根据配置创建幂等记录存储
+
+    Args:
+        store: memory(进程内状态) 或 local(本机多个worker通过SQLite文件共享)
+    """
+    if store == "local":
+        return SharedIdempotencyStore(os.path.join(project_root, "data", "admission", "idempotency.db"))
+    return IdempotencyStore()
@@ -0,0 +1,69 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+from config.constants import JSON_DATETIME_FORMAT
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时回退到标准库
+    orjson = None
+
+
+def _encode_datetime(value: Any) -> str:
+    """按配置格式编码日期时间，默认与Flask一致使用HTTP日期格式"""
+    if JSON_DATETIME_FORMAT == "iso":
+        return value.isoformat()
+    return http_date(value)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return _encode_datetime(value)
+    return DefaultJSONProvider.default(value)
+
+
+def dumps(obj: Any) -> str:
+    """序列化为JSON字符串(保留非ASCII字符)，用于写入数据库等场景"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, default=_default)
+
+
+def loads(data: Any) -> Any:
+    """解析JSON字符串或字节"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# orjson与标准库的解析错误统一捕获
+JSONDecodeError = orjson.JSONDecodeError if orjson is not None else json.JSONDecodeError
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """基于orjson的Flask JSON提供器，未安装orjson时行为与默认提供器一致"""
+
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None:
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            return json.dumps(obj, **kwargs)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
@@ -1,50 +1,249 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
+import threading
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Callable, Dict
 
-from config.constants import LOGS_DIR, LOG_LEVEL, LOG_FORMAT
+from config.constants import (LOGS_DIR, LOG_LEVEL, LOG_FORMAT, LOG_OUTPUT, LOG_QUEUE_SIZE, LOG_OVERLOAD_THRESHOLD,
+                              LOG_OVERLOAD_SAMPLE_RATE, LOG_MAX_FIELD_CHARS)
+from src.utils.metrics import REGISTRY
+from src.utils.tracing import current_trace
 
 # 获取项目根目录
 project_root = Path(__file__).parent.parent.parent
 
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "log_records_dropped_total", "日志队列过载时丢弃的日志条数", ("level", "reason"))
+
+# LogRecord的标准属性，其余属性视为通过extra传入的结构化字段
+_RECORD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "trace_id"}
+
+
+def truncate(text: str, limit: int = LOG_MAX_FIELD_CHARS) -> str:
+    """截断过长的日志文本，保留原始长度信息"""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(共{len(text)}字符)"
+
+
+class Lazy:
+    """延迟求值的日志参数，只有日志级别启用且消息被格式化时才调用func
+
+    Args:
+        func: 生成日志文本的函数
+        args: 传给func的参数
+    """
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func: Callable[..., Any], *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+def _dump(value: Any, limit: int) -> str:
+    if isinstance(value, str):
+        text = value
+    else:
+        try:
+            text = json.dumps(value, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            text = repr(value)
+    return truncate(text, limit)
+
+
+def lazy_json(value: Any, limit: int = LOG_MAX_FIELD_CHARS) -> Lazy:
+    """请求参数、提示词、模型响应等大对象的日志参数，延迟序列化并截断
+
+    用法: logger.debug("请求参数: %s", lazy_json(data))
+    """
+    return Lazy(_dump, value, limit)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，通过extra传入的字段原样保留"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """将日志放入有界队列，由后台线程写出，调用线程不做任何磁盘I/O
+
+    队列占用超过 overload_threshold 后，INFO及以下级别只按 sample_rate 抽样保留，
+    剩余容量留给WARNING及以上级别；队列满时直接丢弃。丢弃数计入 log_records_dropped_total，
+    并在队列恢复后补记一条汇总日志。
+
+    Args:
+        log_queue: 有界队列
+        overload_threshold: 开始抽样的队列占用比例
+        sample_rate: 过载时INFO及以下级别的保留比例
+    """
+
+    def __init__(self, log_queue: queue.Queue, overload_threshold: float = LOG_OVERLOAD_THRESHOLD,
+                 sample_rate: float = LOG_OVERLOAD_SAMPLE_RATE):
+        super().__init__(log_queue)
+        self.capacity = log_queue.maxsize
+        self.overload_threshold = overload_threshold
+        self.sample_rate = sample_rate
+        self._unreported = 0
+        self._drop_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord):
+        # 先决定是否丢弃再调用prepare，被丢弃的日志不合并参数，Lazy参数不求值
+        try:
+            reason = self._drop_reason(record)
+            if reason:
+                self._drop(record, reason)
+                return
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def _drop_reason(self, record: logging.LogRecord):
+        if self.capacity <= 0:
+            return None
+        size = self.queue.qsize()
+        if size >= self.capacity:
+            return "queue_full"
+        if (record.levelno < logging.WARNING and size >= self.capacity * self.overload_threshold
+                and random.random() >= self.sample_rate):
+            return "sampled"
+        return None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用线程中合并参数(Lazy参数此时才求值)并记录当前追踪ID；异常堆栈需要读源码文件，留给后台线程格式化
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if not hasattr(record, "trace_id"):
+            trace = current_trace()
+            record.trace_id = trace.trace_id if trace else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # 上面的检查和入队之间其他线程可能填满队列，这里仍按队列满丢弃
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._drop(record, "queue_full")
+            return
+        if self._unreported:
+            self._report_dropped(record)
+
+    def _drop(self, record: logging.LogRecord, reason: str):
+        LOG_RECORDS_DROPPED.labels(record.levelname, reason).inc()
+        with self._drop_lock:
+            self._unreported += 1
+
+    def _report_dropped(self, record: logging.LogRecord):
+        with self._drop_lock:
+            dropped, self._unreported = self._unreported, 0
+        if not dropped:
+            return
+        notice = logging.LogRecord(record.name, logging.WARNING, __file__, 0,
+                                   f"日志队列过载，已丢弃 {dropped} 条日志", None, None)
+        notice.message = notice.msg
+        notice.trace_id = None
+        try:
+            self.queue.put_nowait(notice)
+        except queue.Full:
+            with self._drop_lock:
+                self._unreported += dropped
+
+
+class _Listener(QueueListener):
+    """后台写日志的线程，退出时最多等待几秒写完队列"""
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+
+# 每个日志文件一条写出管道，多次调用setup_logger复用同一个处理器
+_pipelines: Dict[str, AsyncQueueHandler] = {}
+_setup_lock = threading.Lock()
+
+
+def _create_pipeline(log_path: str) -> AsyncQueueHandler:
+    formatter = JsonFormatter() if LOG_OUTPUT == "json" else logging.Formatter(LOG_FORMAT)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    file_handler = RotatingFileHandler(
+        log_path, maxBytes=10*1024*1024, backupCount=5, encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = _Listener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return AsyncQueueHandler(log_queue)
+
+
 def setup_logger(name: str, log_file: str = None) -> logging.Logger:
     """设置日志记录器
-    
+
+    日志先进入有界队列，由后台线程写到控制台和按大小轮转的文件；重复调用不会重复添加处理器。
+
     Args:
         name: 日志记录器名称
         log_file: 日志文件名，如果为None则使用name作为文件名
-        
+
     Returns:
         logging.Logger: 配置好的日志记录器
     """
     logger = logging.getLogger(name)
-    
+
     # 设置日志级别
     level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
     logger.setLevel(level)
-    
-    # 创建格式化器
-    formatter = logging.Formatter(LOG_FORMAT)
-    
-    # 添加控制台处理器
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # 添加文件处理器
+
     if log_file is None:
         log_file = f"{name}.log"
-    
+
     # 确保日志路径是基于项目根目录的绝对路径
-    log_path = os.path.join(project_root, LOGS_DIR, log_file)
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    
-    file_handler = RotatingFileHandler(
-        log_path, maxBytes=10*1024*1024, backupCount=5
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    return logger
\ No newline at end of file
+    log_path = os.path.abspath(os.path.join(project_root, LOGS_DIR, log_file))
+
+    with _setup_lock:
+        handler = _pipelines.get(log_path)
+        if handler is None:
+            handler = _pipelines[log_path] = _create_pipeline(log_path)
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
+
+    return logger
@@ -0,0 +1,350 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 默认延迟分桶(秒)，覆盖从毫秒级DB查询到分钟级LLM调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """将标签格式化为Prometheus文本格式"""
+    parts = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类，按标签值缓存子指标
+
+    子指标的创建需要加锁，之后的查找是无锁的字典读取；
+    每个子指标只持有一把很短的锁，记录一次样本只需几微秒。
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """获取指定标签值对应的子指标"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签: {self.labelnames}")
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def collect(self) -> List[str]:
+        """输出该指标的Prometheus文本行"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._collect_child(key, child))
+        return lines
+
+    def _collect_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"]
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def get(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_lock", "_callback")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._callback: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, callback: Callable[[], float]):
+        """设置采集时才求值的回调，适用于连接池使用率等状态量"""
+        self._callback = callback
+
+    def get(self) -> float:
+        if self._callback is not None:
+            try:
+                return float(self._callback())
+            except Exception:
+                return float('nan')
+        return self._value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set_function(self, callback: Callable[[], float]):
+        self._default().set_function(callback)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """返回计时上下文管理器，退出时记录耗时"""
+        return _Timer(self.observe)
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _collect_child(self, key, child) -> List[str]:
+        counts, total, count = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        plain = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{plain} {_format_value(total)}")
+        lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_observe", "_start")
+
+    def __init__(self, observe: Callable[[float], None]):
+        self._observe = observe
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._observe(time.perf_counter() - self._start)
+        return False
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标重复注册时返回已有实例"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = cls(name, documentation, labelnames, **kwargs)
+                    self._metrics[name] = metric
+        if not isinstance(metric, cls):
+            raise ValueError(f"指标 {name} 已注册为其他类型")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """以Prometheus文本格式导出所有指标"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+REGISTRY = MetricsRegistry()
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# HTTP路由指标
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP请求总数", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP请求处理耗时", ("method", "route"))
+
+# 上游LLM调用指标
+LLM_LATENCY = REGISTRY.histogram(
+    "llm_request_duration_seconds", "上游LLM单次请求耗时", ("endpoint", "outcome"))
+LLM_RETRIES = REGISTRY.counter(
+    "llm_retries_total", "上游LLM请求重试次数", ("endpoint",))
+LLM_BACKOFF = REGISTRY.counter(
+    "llm_backoff_seconds_total", "上游LLM请求退避等待总时长", ("endpoint",))
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "上游LLM消耗的token数", ("model", "type"))
+LLM_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "流式请求从发出到收到第一段内容的耗时", ("endpoint",))
+LLM_ROUTER_REQUESTS = REGISTRY.counter(
+    "llm_router_requests_total", "模型路由向各端点发出的请求数", ("endpoint", "outcome"))
+LLM_ROUTER_FALLBACKS = REGISTRY.counter(
+    "llm_router_fallbacks_total", "端点失败后改用下一个端点的次数", ("task",))
+LLM_ROUTER_LATENCY = REGISTRY.gauge(
+    "llm_router_latency_ewma_seconds", "各端点请求耗时的指数加权平均值", ("endpoint",))
+
+# 数据库指标
+DB_LATENCY = REGISTRY.histogram(
+    "db_operation_duration_seconds", "数据库操作耗时", ("operation", "outcome"))
+DB_POOL_IN_USE = REGISTRY.gauge(
+    "db_pool_connections_in_use", "连接池中已借出的连接数")
+DB_POOL_SIZE = REGISTRY.gauge(
+    "db_pool_size", "连接池容量")
+DB_POOL_CHECKOUT_FAILURES = REGISTRY.counter(
+    "db_pool_checkout_failures_total", "从连接池获取连接失败次数")
+
+
+# 当前计时操作的失败标记；捕获异常后返回None/False的操作通过mark_failed记为失败
+_operation_failed: ContextVar[Optional[List[bool]]] = ContextVar("operation_failed", default=None)
+
+
+def mark_failed():
+    """将当前timed_operation计时的操作记为失败，在内部捕获异常的except块中调用，不在计时操作中时不做任何事"""
+    failed = _operation_failed.get()
+    if failed is not None:
+        failed[0] = True
+
+
+def timed_operation(histogram: Histogram, name: Optional[str] = None):
+    """装饰器：记录函数耗时，标签为(操作名, 结果)
+
+    函数抛出异常或调用了mark_failed时结果为error，否则为ok。
+
+    Args:
+        histogram: 需要 (operation, outcome) 两个标签的直方图
+        name: 操作名，默认使用函数的 __qualname__
+    """
+    def decorator(func):
+        operation = name or func.__qualname__
+        ok_child = histogram.labels(operation, "ok")
+        error_child = histogram.labels(operation, "error")
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            failed = [False]
+            token = _operation_failed.set(failed)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                error_child.observe(time.perf_counter() - start)
+                raise
+            finally:
+                _operation_failed.reset(token)
+            (error_child if failed[0] else ok_child).observe(time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
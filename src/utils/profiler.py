@@ -0,0 +1,211 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.constants import LOGS_DIR, PROFILER_INTERVAL_MS, PROFILER_FLUSH_SECONDS
+
+# 获取项目根目录
+project_root = Path(__file__).parent.parent.parent
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse_stack(frame) -> str:
+    """将调用栈折叠为 flamegraph.pl / speedscope 可识别的 ``a;b;c`` 格式(从根到叶)"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """输出折叠栈文本，每行为 ``栈 次数``"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class StackSampler:
+    """定时采样线程调用栈的采样分析器
+
+    Args:
+        interval: 采样间隔(秒)
+        thread_id: 只采样指定线程，为None时采样除自身外的所有线程
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.exclude = set()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def drain(self) -> Counter:
+        """取出并清空已采集的栈"""
+        with self._lock:
+            stacks, self.stacks = self.stacks, Counter()
+        return stacks
+
+    def _run(self):
+        self.exclude.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                if self.thread_id is not None:
+                    frame = frames.get(self.thread_id)
+                    if frame is not None:
+                        self.stacks[collapse_stack(frame)] += 1
+                else:
+                    for thread_id, frame in frames.items():
+                        if thread_id not in self.exclude:
+                            self.stacks[collapse_stack(frame)] += 1
+                self.samples += 1
+
+
+class RuntimeProfiler:
+    """可在运行时开关的全进程采样分析器，定期将折叠栈写入日志目录
+
+    关闭时不存在采样线程，对请求没有任何开销。
+    """
+
+    def __init__(self, output_dir: str, interval_ms: int = PROFILER_INTERVAL_MS,
+                 flush_seconds: int = PROFILER_FLUSH_SECONDS):
+        self.output_dir = output_dir
+        self.interval_ms = interval_ms
+        self.flush_seconds = flush_seconds
+        self._sampler: Optional[StackSampler] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+        self.files_written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._sampler is not None
+
+    def start(self, interval_ms: Optional[int] = None, flush_seconds: Optional[int] = None):
+        with self._lock:
+            if self._sampler is not None:
+                return
+            if interval_ms:
+                self.interval_ms = interval_ms
+            if flush_seconds:
+                self.flush_seconds = flush_seconds
+            self._stop.clear()
+            self._sampler = StackSampler(self.interval_ms / 1000.0)
+            self._sampler.start()
+            self._flusher = threading.Thread(target=self._flush_loop, name="profiler-flush", daemon=True)
+            self._flusher.start()
+            # 不采样分析器自身的写盘线程
+            self._sampler.exclude.add(self._flusher.ident)
+            self.started_at = time.time()
+
+    def stop(self):
+        with self._lock:
+            if self._sampler is None:
+                return
+            self._stop.set()
+            self._flusher.join()
+            self._sampler.stop()
+            self._flush(self._sampler)
+            self._sampler = None
+            self._flusher = None
+            self.started_at = None
+
+    def status(self) -> Dict[str, object]:
+        return {
+            'enabled': self.enabled,
+            'interval_ms': self.interval_ms,
+            'flush_seconds': self.flush_seconds,
+            'started_at': self.started_at,
+            'files_written': self.files_written,
+            'output_dir': self.output_dir,
+        }
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            self._flush(self._sampler)
+
+    def _flush(self, sampler: StackSampler):
+        stacks = sampler.drain()
+        if not stacks:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        file_name = f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+        with open(os.path.join(self.output_dir, file_name), 'a', encoding='utf-8') as f:
+            f.write(format_collapsed(stacks))
+        self.files_written += 1
+
+
+class RequestProfiler:
+    """单个请求的分析器，支持cProfile(pstats)和折叠栈两种输出"""
+
+    FORMATS = ('pstats', 'collapsed')
+    SORT_KEYS = tuple(pstats.Stats.sort_arg_dict_default)
+
+    def __init__(self, output_format: str = 'pstats', interval_ms: float = 1.0, sort_by: str = 'cumulative'):
+        if output_format not in self.FORMATS:
+            raise ValueError(f"不支持的分析格式: {output_format}")
+        if sort_by not in self.SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {sort_by}，可选: {', '.join(self.SORT_KEYS)}")
+        self.output_format = output_format
+        self.sort_by = sort_by
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._interval = interval_ms / 1000.0
+        self._start = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.output_format == 'pstats':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(self._interval, thread_id=threading.get_ident())
+            self._sampler.start()
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.elapsed = time.perf_counter() - self._start
+
+    def report(self, limit: int = 60) -> str:
+        """返回分析结果文本"""
+        if self._profile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=stream)
+            stats.strip_dirs().sort_stats(self.sort_by).print_stats(limit)
+            return stream.getvalue()
+        return format_collapsed(self._sampler.drain())
+
+
+# 全局运行时分析器
+runtime_profiler = RuntimeProfiler(os.path.join(project_root, LOGS_DIR))
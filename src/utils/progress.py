@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config.constants import PROGRESS_HEARTBEAT_SECONDS, PROGRESS_JOB_TTL, PROGRESS_HISTORY_SIZE
+
+# 结束事件，收到后订阅流关闭
+TERMINAL_PHASES = ("completed", "failed")
+
+_current_job: ContextVar[Optional["ProgressJob"]] = ContextVar("current_progress_job", default=None)
+
+
+class ProgressJob:
+    """一个生成任务的进度事件序列，支持多个订阅者各自按序读取"""
+
+    def __init__(self, job_id: str, history_size: int = PROGRESS_HISTORY_SIZE, first_id: int = 1):
+        self.job_id = job_id
+        self.history_size = history_size
+        self.events: List[Dict[str, Any]] = []
+        self.next_id = first_id
+        self.finished_at: Optional[float] = None
+        self.updated_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def publish(self, phase: str, data: Dict[str, Any]):
+        with self._cond:
+            if self.finished:
+                return
+            self.events.append({'id': self.next_id, 'phase': phase, 'data': data, 'time': time.time()})
+            self.next_id += 1
+            # 只保留最近的事件；tokens事件按offset携带增量，过早的事件被丢弃后只能从完整结果获取该部分内容
+            if len(self.events) > self.history_size:
+                del self.events[:len(self.events) - self.history_size]
+            self.updated_at = time.monotonic()
+            if phase in TERMINAL_PHASES:
+                self.finished_at = self.updated_at
+            self._cond.notify_all()
+
+    def wait_events(self, after_id: int, timeout: float) -> List[Dict[str, Any]]:
+        """返回id大于after_id的事件，没有新事件时最多等待timeout秒"""
+        with self._cond:
+            if not self._has_after(after_id) and not self.finished:
+                self._cond.wait(timeout)
+            return [event for event in self.events if event['id'] > after_id]
+
+    def _has_after(self, after_id: int) -> bool:
+        return bool(self.events) and self.events[-1]['id'] > after_id
+
+
+class ProgressBroker:
+    """进程内的进度事件中转，订阅只等待内存中的事件，不占用数据库连接"""
+
+    def __init__(self, job_ttl: float = PROGRESS_JOB_TTL):
+        self.job_ttl = job_ttl
+        self._jobs: Dict[str, ProgressJob] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, job_id: str) -> ProgressJob:
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = ProgressJob(job_id)
+                self._jobs[job_id] = job
+            return job
+
+    def start(self, job_id: str) -> ProgressJob:
+        """生成请求开始时获取任务
+
+        任务ID被复用时已结束的旧任务不再接收事件，替换为新任务；事件ID接着旧任务编号，
+        带着旧任务Last-Event-ID重连的订阅者不会漏掉新任务的事件。
+        """
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                job = ProgressJob(job_id, first_id=job.next_id if job is not None else 1)
+                self._jobs[job_id] = job
+            return job
+
+    def get(self, job_id: str) -> Optional[ProgressJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items() if now - job.updated_at > self.job_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stream(self, job_id: str, last_event_id: int = 0,
+               heartbeat: float = PROGRESS_HEARTBEAT_SECONDS) -> Iterator[str]:
+        """以SSE格式输出任务事件，空闲时发送心跳注释，任务结束后关闭"""
+        job = self.get_or_create(job_id)
+        cursor = last_event_id
+        yield "retry: 3000\n\n"
+        while True:
+            events = job.wait_events(cursor, heartbeat)
+            if not events:
+                # 任务已结束，或长时间没有任务发布事件时关闭连接
+                if job.finished or time.monotonic() - job.updated_at > self.job_ttl:
+                    return
+                yield ": heartbeat\n\n"
+                continue
+            for event in events:
+                cursor = event['id']
+                payload = json.dumps({'phase': event['phase'], 'time': event['time'], **event['data']},
+                                     ensure_ascii=False)
+                yield f"id: {event['id']}\nevent: {event['phase']}\ndata: {payload}\n\n"
+                if event['phase'] in TERMINAL_PHASES:
+                    return
+
+
+def bind_job(job: Optional[ProgressJob]):
+    """将进度任务绑定到当前上下文，之后调用 report() 的事件都发送到该任务
+
+    Returns:
+        用于 unbind_job 的上下文令牌
+    """
+    return _current_job.set(job)
+
+
+def unbind_job(token):
+    _current_job.reset(token)
+
+
+def current_job() -> Optional[ProgressJob]:
+    return _current_job.get()
+
+
+def report(phase: str, **data):
+    """向当前上下文的任务发送进度事件，没有绑定任务时不做任何事"""
+    job = _current_job.get()
+    if job is not None:
+        job.publish(phase, data)
+
+
+class TokenReporter:
+    """流式生成时的增量回调，按时间间隔节流发送已接收的token数和新增内容
+
+    每个事件只携带上次发送之后的内容delta，以及其在完整内容中的字符偏移offset，
+    事件大小不随已生成内容增长；订阅者按offset拼接，offset与已拼接长度不一致时说明漏掉了事件。
+    节流期间的增量暂存在缓冲区，流结束时调用flush发送。
+
+    Args:
+        job: 接收事件的任务
+        min_interval: 两次发送的最小间隔(秒)
+    """
+
+    def __init__(self, job: ProgressJob, min_interval: float = 0.25):
+        self.job = job
+        self.min_interval = min_interval
+        self.chunks = 0
+        self.offset = 0
+        self._parts: List[str] = []
+        self._last = 0.0
+
+    def __call__(self, delta: str):
+        self.chunks += 1
+        self._parts.append(delta)
+        now = time.monotonic()
+        if now - self._last >= self.min_interval:
+            self._last = now
+            self.flush()
+
+    def flush(self):
+        """发送缓冲区中尚未发送的内容，没有时不做任何事"""
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts.clear()
+        self.job.publish("tokens", {'tokens_received': self.chunks, 'offset': self.offset, 'delta': text})
+        self.offset += len(text)
+
+
+def token_reporter(min_interval: float = 0.25) -> Optional[TokenReporter]:
+    """返回绑定到当前任务的增量回调
+
+    没有绑定任务时返回None，调用方据此决定是否使用流式请求。
+    """
+    job = _current_job.get()
+    if job is None:
+        return None
+    return TokenReporter(job, min_interval)
+
+
+def flush_deltas(on_delta: Optional[Callable[[str], None]]):
+    """流结束时发送增量回调中暂存的内容，回调没有flush方法时不做任何事"""
+    flush = getattr(on_delta, "flush", None)
+    if flush is not None:
+        flush()
+
+
+# 全局进度中转
+progress_broker = ProgressBroker()
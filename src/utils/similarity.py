@@ -0,0 +1,359 @@
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，只能使用进程内的索引
+    fcntl = None
+
+from config.constants import (SIMILARITY_INDEX_FILE, SIMILARITY_SHINGLE_SIZE, SIMILARITY_NUM_PERM, SIMILARITY_BANDS,
+                              SIMILARITY_THRESHOLD, SIMILARITY_MAX_RESULTS, SIMILARITY_STORE)
+from src.utils.metrics import REGISTRY
+
+# 获取项目根目录
+project_root = Path(__file__).parent.parent.parent
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_DOCUMENTS = REGISTRY.gauge(
+    "similarity_index_documents", "相似内容索引中的文档数")
+
+_PRIME = (1 << 61) - 1  # 梅森素数，MinHash置换 (a*x+b) mod p
+_SEED = 20240601  # 置换参数的随机种子，固定后签名在进程重启后仍可比较
+_NOISE = re.compile(r'[\W_]+')  # 空白和标点
+
+
+def shingles(text: str, size: int = SIMILARITY_SHINGLE_SIZE) -> Set[str]:
+    """去掉空白和标点后按字符切分为长度为size的重叠片段
+
+    中文没有空格分词，按字符切分可以不依赖分词词典。
+
+    Args:
+        text: 文本
+        size: 片段长度
+
+    Returns:
+        Set[str]: 片段集合，文本为空时为空集合
+    """
+    text = _NOISE.sub('', text.lower())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def outline_text(title: str, sections: Iterable[Dict[str, str]]) -> str:
+    """提纲用于相似度比较的文本：标题和各章节的标题、内容"""
+    parts = [title or '']
+    for section in sections:
+        parts.append(section.get('title') or '')
+        parts.append(section.get('content') or '')
+    return '\n'.join(parts)
+
+
+class MinHashIndex:
+    """基于MinHash签名和LSH分桶的近似重复内容索引
+
+    每个文档的字符片段集合压缩为num_perm个最小哈希值组成的签名，两个签名中相等值的比例即
+    Jaccard相似度的估计。签名分为bands段，任一段完全相同的文档落入同一个桶；查询只比较同桶的
+    候选文档，耗时与索引中的文档总数无关。
+
+    签名以追加日志的形式写入path，每行为一次添加或删除，启动时重放并在日志过长时重写。
+    索引参数变化后旧日志中的签名无法比较，会被丢弃。
+
+    shared为True时本机多个worker共用同一个日志：写入和重写时持有文件锁，每次查询前先重放
+    其他进程追加的记录，日志被其他进程重写后从头重放。
+
+    签名计算的耗时与去重后的片段数成正比，约1万字的脚本需要0.4~0.5秒CPU，调用方应避免在请求线程中
+    为长文本调用add。
+
+    Args:
+        path: 日志文件路径，为None时只保存在内存中
+        shingle_size: 字符片段长度
+        num_perm: 签名长度
+        bands: LSH分段数，num_perm需能被其整除
+        shared: 是否与其他进程共享日志
+    """
+
+    def __init__(self, path: Optional[str] = None, shingle_size: int = SIMILARITY_SHINGLE_SIZE,
+                 num_perm: int = SIMILARITY_NUM_PERM, bands: int = SIMILARITY_BANDS, shared: bool = False):
+        if num_perm % bands:
+            raise ValueError("num_perm需能被bands整除")
+        if shared and (not path or fcntl is None):
+            raise RuntimeError("共享索引需要日志文件路径和文件锁支持")
+        self.path = path
+        self.shared = shared
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(_SEED)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._header = f"#minhash shingle={shingle_size} perm={num_perm} bands={bands} seed={_SEED}"
+        self._signatures: Dict[str, array] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        # 已重放到的日志位置、日志文件的inode和已重放的记录数
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._records = 0
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return key in self._signatures
+
+    def signature(self, text: str) -> Optional[array]:
+        """计算文本的MinHash签名，没有可用字符时返回None"""
+        pieces = shingles(text, self.shingle_size)
+        if not pieces:
+            return None
+        hashes = [int.from_bytes(hashlib.blake2b(piece.encode('utf-8'), digest_size=8).digest(), 'little')
+                  for piece in pieces]
+        return array('Q', [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms])
+
+    def add(self, key: str, text: str) -> Optional[array]:
+        """添加或替换文档
+
+        Args:
+            key: 文档键，如outline:<提纲ID>
+            text: 文档文本
+
+        Returns:
+            Optional[array]: 文档签名，文本为空时删除已有文档并返回None
+        """
+        signature = self.signature(text)
+        with self._lock, self._file_lock():
+            self._refresh()
+            self._remove(key)
+            if signature is not None:
+                self._insert(key, signature)
+            self._append(key, signature)
+        SIMILARITY_DOCUMENTS.set(len(self._signatures))
+        return signature
+
+    def remove(self, key: str):
+        """删除文档"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            if key in self._signatures:
+                self._remove(key)
+                self._append(key, None)
+        SIMILARITY_DOCUMENTS.set(len(self._signatures))
+
+    def similar(self, key: str, prefix: str = '', threshold: float = SIMILARITY_THRESHOLD,
+                limit: int = SIMILARITY_MAX_RESULTS) -> Optional[List[Tuple[str, float]]]:
+        """查找与已索引文档相似的文档，不包括其本身
+
+        Returns:
+            Optional[List[Tuple[str, float]]]: 按相似度降序的(文档键, 估计相似度)，文档不在索引中时返回None
+        """
+        with self._lock:
+            self._refresh()
+            signature = self._signatures.get(key)
+            if signature is None:
+                return None
+            return self._query(signature, prefix, threshold, limit, exclude=key)
+
+    def query(self, text: str, prefix: str = '', threshold: float = SIMILARITY_THRESHOLD,
+              limit: int = SIMILARITY_MAX_RESULTS, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """查找与文本相似的文档
+
+        Args:
+            text: 查询文本
+            prefix: 只返回以该前缀开头的文档键
+            threshold: 估计相似度下限
+            limit: 最多返回数量
+            exclude: 不返回的文档键
+
+        Returns:
+            List[Tuple[str, float]]: 按相似度降序的(文档键, 估计相似度)
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        with self._lock:
+            self._refresh()
+            return self._query(signature, prefix, threshold, limit, exclude)
+
+    def _bands(self, signature: array) -> List[bytes]:
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.bands)]
+
+    def _query(self, signature: array, prefix: str, threshold: float, limit: int,
+               exclude: Optional[str]) -> List[Tuple[str, float]]:
+        candidates: Set[str] = set()
+        for buckets, band in zip(self._buckets, self._bands(signature)):
+            candidates.update(buckets.get(band, ()))
+        candidates.discard(exclude)
+        results = []
+        for candidate in candidates:
+            if not candidate.startswith(prefix):
+                continue
+            other = self._signatures[candidate]
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+            if similarity >= threshold:
+                results.append((candidate, round(similarity, 4)))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
+
+    def _insert(self, key: str, signature: array):
+        self._signatures[key] = signature
+        for buckets, band in zip(self._buckets, self._bands(signature)):
+            buckets.setdefault(band, set()).add(key)
+
+    def _remove(self, key: str):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band in zip(self._buckets, self._bands(signature)):
+            bucket = buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band]
+
+    @contextmanager
+    def _file_lock(self):
+        """共享日志时持有锁文件的排他锁，保证追加和重写不会交错"""
+        if not self.shared:
+            yield
+            return
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _append(self, key: str, signature: Optional[array]):
+        """追加一行日志：文档键、制表符和签名的十六进制，删除时签名为空；日志不存在时先写入参数头"""
+        if not self.path:
+            return
+        line = f"{key}\t{signature.tobytes().hex() if signature is not None else ''}\n"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'ab') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size == 0:
+                    line = f"{self._header}\n{line}"
+                f.write(line.encode('utf-8'))
+                # 持有文件锁时日志中只有自己刚写入的记录尚未重放
+                if stat.st_ino == self._inode or stat.st_size == 0:
+                    self._inode = stat.st_ino
+                    self._offset = f.tell()
+                    self._records += 1
+        except OSError as e:
+            logger.warning(f"写入相似内容索引失败: {e}")
+
+    def _refresh(self):
+        """共享日志时重放其他进程追加的记录"""
+        if self.shared:
+            self._replay()
+
+    def _replay(self) -> bool:
+        """从上次的位置继续重放日志，日志被重写或替换后清空内存索引从头重放
+
+        Returns:
+            bool: 日志头部的索引参数是否与当前一致，不一致时不重放其中的记录
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._inode or stat.st_size < self._offset:
+                    self._clear()
+                    self._inode = stat.st_ino
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            if self._inode is not None:
+                self._clear()
+            return True
+        except OSError as e:
+            logger.warning(f"读取相似内容索引失败: {e}")
+            return True
+
+        # 只重放完整的行，其他进程正在写入的行下次再读
+        data = data[:data.rfind(b'\n') + 1]
+        lines = data.decode('utf-8', 'replace').splitlines()
+        if self._offset == 0 and lines and lines[0] != self._header:
+            return False
+        self._offset += len(data)
+        for line in lines:
+            key, _, value = line.partition('\t')
+            if not key or key.startswith('#'):
+                continue
+            self._records += 1
+            self._remove(key)
+            if value:
+                try:
+                    signature = array('Q', bytes.fromhex(value))
+                except ValueError:
+                    continue
+                if len(signature) == self.num_perm:
+                    self._insert(key, signature)
+        SIMILARITY_DOCUMENTS.set(len(self._signatures))
+        return True
+
+    def _clear(self):
+        self._signatures.clear()
+        for buckets in self._buckets:
+            buckets.clear()
+        self._inode = None
+        self._offset = 0
+        self._records = 0
+
+    def _load(self):
+        """重放日志重建内存索引，参数变化或记录数远多于文档数时重写日志；日志不存在时不创建"""
+        with self._lock, self._file_lock():
+            if not self._replay():
+                logger.warning("相似内容索引参数已变化，丢弃旧索引")
+                self._clear()
+                self._rewrite()
+            elif self._records > 2 * len(self._signatures) + 100:
+                self._rewrite()
+        logger.info(f"已加载相似内容索引: {len(self._signatures)}个文档")
+
+    def _rewrite(self):
+        """将当前索引写入临时文件后原子替换日志，临时文件名带进程号，多个进程不会写同一个文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(f"{self._header}\n".encode('utf-8'))
+                for key, signature in self._signatures.items():
+                    f.write(f"{key}\t{signature.tobytes().hex()}\n".encode('utf-8'))
+                offset = f.tell()
+                inode = os.fstat(f.fileno()).st_ino
+            os.replace(temp_path, self.path)
+            self._inode, self._offset, self._records = inode, offset, len(self._signatures)
+        except OSError as e:
+            logger.warning(f"重写相似内容索引失败: {e}")
+
+
+def create_similarity_index(path: str = SIMILARITY_INDEX_FILE, store: str = SIMILARITY_STORE) -> MinHashIndex:
+    """创建使用项目目录下日志文件的相似内容索引
+
+    Args:
+        path: 相对项目目录的日志文件路径
+        store: memory(只在启动时读取日志) 或 local(本机多个worker通过日志和文件锁共享)
+    """
+    return MinHashIndex(os.path.join(project_root, path), shared=store == "local")
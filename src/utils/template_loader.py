@@ -22,6 +22,34 @@ class TemplateLoader:
         return [f.split('.')[0] for f in os.listdir(templates_path) 
                 if f.endswith('.json') or f.endswith('.txt')]
     
+    @staticmethod
+    def get_template_files() -> List[str]:
+        """列出所有模板文件的完整路径
+        
+        Returns:
+            List[str]: 模板文件路径列表
+        """
+        templates_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), TEMPLATES_DIR)
+        if not os.path.exists(templates_path):
+            return []
+        
+        return [os.path.join(templates_path, f) for f in os.listdir(templates_path)
+                if f.endswith('.json') or f.endswith('.txt')]
+    
+    @staticmethod
+    def get_template_paths(template_name: str) -> List[str]:
+        """返回指定模板可能对应的文件路径(JSON和文本)
+        
+        Args:
+            template_name: 模板名称
+            
+        Returns:
+            List[str]: 候选文件路径列表
+        """
+        templates_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), TEMPLATES_DIR)
+        return [os.path.join(templates_path, f"{template_name}.json"),
+                os.path.join(templates_path, f"{template_name}.txt")]
+    
     @staticmethod
     def load_template(template_name: str) -> Optional[Dict[str, Any]]:
         """加载指定模板
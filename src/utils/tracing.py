@@ -0,0 +1,273 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config.constants import LOGS_DIR, TRACE_SAMPLE_RATE, TRACE_EXPORT_FILE
+
+# 获取项目根目录
+project_root = Path(__file__).parent.parent.parent
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """一次操作的耗时记录"""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "phase", "count_phase", "attributes",
+                 "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"] = None,
+                 phase: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(64)
+        self.parent_id = parent.span_id if parent else None
+        self.phase = phase
+        # 与父span同阶段时不重复计入阶段耗时
+        self.count_phase = bool(phase) and (parent is None or parent.phase != phase)
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace._on_span_end(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """转换为OTLP JSON格式的span"""
+        attributes = [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()]
+        if self.phase:
+            attributes.append({"key": "phase", "value": {"stringValue": self.phase}})
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": attributes,
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    """一次请求的追踪上下文
+
+    未被采样的追踪同样记录各阶段耗时(用于Server-Timing)，只是不导出span。
+    """
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, sampled: bool = False):
+        self.trace_id = trace_id or _new_id(128)
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self.phase_durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.root = Span(self, name)
+
+    def _on_span_end(self, span: Span):
+        with self._lock:
+            if self.sampled:
+                self.spans.append(span)
+            if span.count_phase:
+                self.phase_durations[span.phase] = self.phase_durations.get(span.phase, 0.0) + span.duration_ms
+
+    def server_timing(self) -> str:
+        """生成Server-Timing响应头的内容"""
+        parts = [f"{phase};dur={duration:.1f}" for phase, duration in self.phase_durations.items()]
+        parts.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """转换为OTLP JSON格式(ExportTraceServiceRequest)"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": "testiflow-studio-server"}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "src.utils.tracing"},
+                    "spans": [span.to_otlp() for span in self.spans],
+                }],
+            }]
+        }
+
+
+class JsonFileExporter:
+    """将追踪以OTLP JSON格式逐行写入本地文件，由后台线程负责写盘"""
+
+    def __init__(self, file_path: str, max_queue: int = 1000):
+        self.file_path = file_path
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def export(self, trace: Trace):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            # 写盘跟不上时丢弃，不能阻塞请求线程
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        while True:
+            trace = self._queue.get()
+            try:
+                with open(self.file_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(trace.to_otlp(), ensure_ascii=False) + "\n")
+            except OSError:
+                self.dropped += 1
+
+
+class Tracer:
+    """追踪器，负责采样决策与导出"""
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, exporter: Optional[JsonFileExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None):
+        """开始一次追踪并设置为当前上下文
+
+        Args:
+            name: 根span名称
+            traceparent: W3C traceparent请求头，存在时沿用其trace_id和采样标记
+
+        Returns:
+            (Trace, token): 追踪对象和用于恢复上下文的token
+        """
+        trace_id, sampled = None, random.random() < self.sample_rate
+        parsed = _parse_traceparent(traceparent)
+        if parsed:
+            trace_id, sampled = parsed
+        trace = Trace(name, trace_id=trace_id, sampled=sampled)
+        token = (_current_trace.set(trace), _current_span.set(trace.root))
+        return trace, token
+
+    def end_trace(self, trace: Trace, token):
+        """结束追踪，恢复上下文并在采样时导出"""
+        trace.root.end()
+        _current_trace.reset(token[0])
+        _current_span.reset(token[1])
+        if trace.sampled and self.exporter:
+            self.exporter.export(trace)
+
+
+def _parse_traceparent(header: Optional[str]):
+    if not header:
+        return None
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32:
+        return None
+    try:
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], bool(flags & 1)
+
+
+class _SpanContext:
+    __slots__ = ("name", "phase", "attributes", "span", "token")
+
+    def __init__(self, name: str, phase: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.phase = phase
+        self.attributes = attributes
+        self.span = None
+        self.token = None
+
+    def __enter__(self) -> Optional[Span]:
+        trace = _current_trace.get()
+        if trace is None:
+            return None
+        parent = _current_span.get()
+        self.span = Span(trace, self.name, parent, self.phase, self.attributes)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            if exc is not None:
+                self.span.error = str(exc)
+            self.span.end()
+            _current_span.reset(self.token)
+        return False
+
+
+def span(name: str, phase: Optional[str] = None, **attributes) -> _SpanContext:
+    """创建子span的上下文管理器，没有活动追踪时不做任何事
+
+    Args:
+        name: span名称
+        phase: 所属阶段(db/prompt/llm/parse/validate等)，用于Server-Timing汇总
+        **attributes: span属性
+    """
+    return _SpanContext(name, phase, attributes)
+
+
+def traced(name: Optional[str] = None, phase: Optional[str] = None):
+    """装饰器：将函数调用记录为span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with _SpanContext(span_name, phase, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace() -> Optional[Trace]:
+    """获取当前上下文中的追踪"""
+    return _current_trace.get()
+
+
+# 全局追踪器
+tracer = Tracer(exporter=JsonFileExporter(os.path.join(project_root, LOGS_DIR, TRACE_EXPORT_FILE)))
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，只能保证进程内的并发安全
+    fcntl = None
+
+from config.constants import VIDEO_CLIP_CACHE_MAX_BYTES, VIDEO_CLIP_CACHE_GRACE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path: str) -> str:
+    """
+    计算文件内容哈希。
+
+    参数：
+        path (str): 文件路径
+
+    返回：
+        str: 十六进制哈希值
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ClipCache:
+    """
+    按内容寻址的标准化片段磁盘缓存。
+
+    键为源文件内容哈希加转码参数，同一素材在不同路径下也能命中。写入先生成临时文件再原子重命名；
+    同一个键由文件锁保证只有一个进程转码，其他进程等待后直接复用结果。总大小超过上限时按最近使用时间淘汰。
+
+    参数：
+        cache_dir (str): 缓存目录
+        max_bytes (int): 缓存总字节数上限
+        grace_seconds (float): 最近使用过的片段在这段时间内不会被淘汰，避免正在拼接的片段被删除
+    """
+
+    SUFFIX = ".mp4"
+
+    def __init__(self, cache_dir: str, max_bytes: int = VIDEO_CLIP_CACHE_MAX_BYTES,
+                 grace_seconds: float = VIDEO_CLIP_CACHE_GRACE_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self._lock_dir = os.path.join(cache_dir, "locks")
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._thread_locks_guard = threading.Lock()
+        # 源文件哈希按(路径, 大小, 修改时间)记忆，避免每次渲染都重新读取整个文件
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    def key(self, source_path: str, settings: str) -> str:
+        """根据源文件内容和转码参数计算缓存键"""
+        stat = os.stat(source_path)
+        memo_key = (os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            digest = file_digest(source_path)
+            self._digests[memo_key] = digest
+        return hashlib.blake2b(f"{digest}|{settings}".encode('utf-8'), digest_size=20).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        # 按前两位分目录，避免单个目录下文件过多
+        return os.path.join(self.cache_dir, key[:2], key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[str]:
+        """命中时返回缓存文件路径并刷新其使用时间"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_create(self, key: str, producer: Callable[[str], None]) -> str:
+        """
+        获取缓存片段，不存在时调用producer生成。
+
+        参数：
+            key (str): 缓存键
+            producer (Callable[[str], None]): 将结果写入给定临时路径的函数
+
+        返回：
+            str: 缓存文件路径
+        """
+        path = self.get(key)
+        if path:
+            return path
+        with self._key_lock(key):
+            # 等锁期间其他进程可能已经生成
+            path = self.get(key)
+            if path:
+                return path
+            path = self.path_for(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = os.path.join(os.path.dirname(path), f".tmp-{uuid.uuid4().hex}{self.SUFFIX}")
+            try:
+                producer(temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        self.evict()
+        return path
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        with self._thread_locks_guard:
+            thread_lock = self._thread_locks.setdefault(key, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self._lock_dir, exist_ok=True)
+            fd = os.open(os.path.join(self._lock_dir, f"{key}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            if root == self._lock_dir:
+                continue
+            for name in files:
+                if not name.endswith(self.SUFFIX) or name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def size(self) -> int:
+        """缓存当前占用的字节数"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """总大小超过上限时从最久未使用的片段开始删除；其他进程正在淘汰时直接跳过"""
+        fd = None
+        if fcntl is not None:
+            os.makedirs(self._lock_dir, exist_ok=True)
+            fd = os.open(os.path.join(self._lock_dir, "evict.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return
+        try:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            cutoff = time.time() - self.grace_seconds
+            for path, size, mtime in entries:
+                if total <= self.max_bytes:
+                    break
+                if mtime > cutoff:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                logger.info(f"淘汰缓存片段: {os.path.basename(path)} ({size} 字节)")
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
@@ -1,30 +1,279 @@
 import ffmpeg
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
+import logging
 import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from pathlib import Path
 
-def concat_videos(video_paths: List[str], output_path: str = "output_dynamic.mp4") -> str:
+from config.constants import (VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT, VIDEO_TARGET_FPS,
+                              VIDEO_TARGET_SAMPLE_RATE, VIDEO_NORMALIZE_WORKERS,
+                              VIDEO_CLIP_CACHE_DIR, VIDEO_CLIP_CACHE_MAX_BYTES, SUBTITLE_FONT,
+                              SUBTITLE_FONT_SIZE)
+from src.video_generator.clip_cache import ClipCache
+from src.video_generator.segmented import gop_frames, plan_segments, run_segments, threads_per_process
+
+logger = logging.getLogger(__name__)
+
+# 获取项目根目录
+project_root = Path(__file__).parent.parent.parent
+
+# 标准化后片段的编码参数，与直接拼接所需的输入参数保持一致
+TARGET_VIDEO_CODEC = "h264"
+TARGET_VIDEO_PROFILE = "High"  # libx264处理yuv420p时的默认profile，profile不同的码流直接拼接可能无法解码
+TARGET_AUDIO_CODEC = "aac"
+TARGET_PIX_FMT = "yuv420p"
+TARGET_AUDIO_CHANNELS = 2
+TARGET_TIMESCALE = 15360
+
+
+# 转码参数变化时需要修改版本号，使旧的缓存片段失效
+NORMALIZE_VERSION = 1
+
+# 标准化片段缓存，上限为0时不使用缓存
+clip_cache = (ClipCache(os.path.join(project_root, VIDEO_CLIP_CACHE_DIR))
+              if VIDEO_CLIP_CACHE_MAX_BYTES > 0 else None)
+
+
+def _normalize_settings(has_audio: bool) -> str:
+    """参与缓存键计算的转码参数"""
+    return f"v{NORMALIZE_VERSION}|libx264|{_target_signature()}|audio={has_audio}"
+
+
+def _target_signature() -> Tuple:
+    return (TARGET_VIDEO_CODEC, TARGET_VIDEO_PROFILE, VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT, TARGET_PIX_FMT,
+            Fraction(VIDEO_TARGET_FPS), Fraction(1, TARGET_TIMESCALE),
+            TARGET_AUDIO_CODEC, VIDEO_TARGET_SAMPLE_RATE, TARGET_AUDIO_CHANNELS)
+
+
+def stream_signature(probe: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    根据ffprobe结果提取决定能否直接拼接的流参数。
+
+    参数：
+        probe (Dict): ffmpeg.probe 的返回值
+
+    返回：
+        Optional[Tuple]: 视频编码及profile、分辨率、像素格式、帧率、时间基和音频编码、采样率、声道数；
+            缺少视频流或音频流时返回 None
+    """
+    streams = probe.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    if video is None or audio is None:
+        return None
+    try:
+        return (video.get('codec_name'), video.get('profile'), int(video['width']), int(video['height']),
+                video.get('pix_fmt'), Fraction(video.get('r_frame_rate', '0/1')), Fraction(video.get('time_base', '0/1')),
+                audio.get('codec_name'), int(audio.get('sample_rate', 0)), int(audio.get('channels', 0)))
+    except (KeyError, ValueError, ZeroDivisionError):
+        return None
+
+
+def _has_audio(probe: Dict[str, Any]) -> bool:
+    return any(s.get('codec_type') == 'audio' for s in probe.get('streams', []))
+
+
+def _worker_count(pending: int) -> int:
+    """同时运行的ffmpeg进程数，默认按CPU核数"""
+    limit = VIDEO_NORMALIZE_WORKERS or os.cpu_count() or 1
+    return max(1, min(pending, limit))
+
+
+def _normalize(path: str, output_path: str, has_audio: bool, threads: int) -> str:
+    """将单个片段转码为目标分辨率、帧率和编码，没有音轨时补静音"""
+    source = ffmpeg.input(path)
+    video = (source.video
+             .filter('scale', VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT)
+             .filter('fps', fps=VIDEO_TARGET_FPS)
+             .filter('setsar', 1))
+    if has_audio:
+        audio = source.audio
+    else:
+        audio = ffmpeg.input(f"anullsrc=channel_layout=stereo:sample_rate={VIDEO_TARGET_SAMPLE_RATE}",
+                             f='lavfi').audio
+    (ffmpeg
+     .output(video, audio, output_path, vcodec='libx264', pix_fmt=TARGET_PIX_FMT,
+             acodec=TARGET_AUDIO_CODEC, ar=VIDEO_TARGET_SAMPLE_RATE, ac=TARGET_AUDIO_CHANNELS,
+             shortest=None, threads=threads, video_track_timescale=TARGET_TIMESCALE)
+     .run(overwrite_output=True, quiet=True))
+    return output_path
+
+
+def _normalize_cached(path: str, output_path: str, has_audio: bool, threads: int) -> str:
+    """标准化片段，启用缓存时复用之前渲染过的相同素材"""
+    if clip_cache is None:
+        return _normalize(path, output_path, has_audio, threads)
+    key = clip_cache.key(path, _normalize_settings(has_audio))
+    return clip_cache.get_or_create(key, lambda temp_path: _normalize(path, temp_path, has_audio, threads))
+
+
+def concat_list_line(path: str) -> str:
+    """concat demuxer 列表文件中的一行，路径中的单引号需要转义"""
+    escaped = os.path.abspath(path).replace("'", "'\\''")
+    return f"file '{escaped}'\n"
+
+
+def _concat_copy(paths: List[str], output_path: str, work_dir: str):
+    """使用 concat demuxer 直接复制码流拼接，不重新编码"""
+    list_path = os.path.join(work_dir, "inputs.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.writelines(concat_list_line(p) for p in paths)
+    (ffmpeg
+     .input(list_path, f='concat', safe=0)
+     .output(output_path, c='copy', movflags='+faststart')
+     .run(overwrite_output=True, quiet=True))
+
+
+def _burn_subtitles(video, subtitle_path: str):
+    """在视频流上叠加字幕滤镜，字幕文件应位于工作目录中"""
+    if subtitle_path.lower().endswith('.ass'):
+        return video.filter('subtitles', subtitle_path)
+    # SRT没有样式，按libass的默认画布高度288换算字号
+    font_size = round(SUBTITLE_FONT_SIZE * 288 / VIDEO_TARGET_HEIGHT)
+    return video.filter('subtitles', subtitle_path, force_style=f"FontName={SUBTITLE_FONT},FontSize={font_size}")
+
+
+def _copy_subtitles(subtitle_path: str, work_dir: str) -> str:
+    # 复制到工作目录，避免原路径中的特殊字符破坏滤镜参数
+    extension = os.path.splitext(subtitle_path)[1].lower() or '.srt'
+    local_path = os.path.join(work_dir, f"subtitles{extension}")
+    shutil.copyfile(subtitle_path, local_path)
+    return local_path
+
+
+def _encode_segment(list_path: str, output_path: str, start: float, length: float, subtitle_path: str,
+                    threads: int):
+    """
+    编码拼接结果中的一段视频(不含音频)。
+
+    输入端跳转后保留原始时间戳(-copyts)，trim按时间戳精确截取该段，字幕滤镜看到的仍是全片时间，
+    最后把时间戳归零，使各段可以直接复制码流拼接。
+    """
+    source = ffmpeg.input(list_path, f='concat', safe=0, ss=start)
+    video = source.video.filter('trim', start=start, end=start + length)
+    video = _burn_subtitles(video, subtitle_path).filter('setpts', 'PTS-STARTPTS')
+    (ffmpeg
+     .output(video, output_path, copyts=None, vcodec='libx264', pix_fmt=TARGET_PIX_FMT, g=gop_frames(),
+             threads=threads, video_track_timescale=TARGET_TIMESCALE)
+     .run(overwrite_output=True, quiet=True))
+    return output_path
+
+
+def _concat_burn(paths: List[str], output_path: str, work_dir: str, subtitle_path: str):
+    """
+    拼接的同时烧录字幕。
+
+    视频需要重新编码：按核数和总时长切成关键帧对齐的若干段，每段由独立的ffmpeg进程并行编码，
+    再与直接复制的音频一起通过 concat demuxer 合并。
+    """
+    list_path = os.path.join(work_dir, "inputs.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.writelines(concat_list_line(p) for p in paths)
+    local_subtitles = _copy_subtitles(subtitle_path, work_dir)
+
+    duration = sum(float(probe['format']['duration']) for probe in _probe_all(paths))
+    segments = plan_segments(duration)
+    threads = threads_per_process(len(segments))
+    logger.info(f"烧录字幕: 总时长 {duration:.1f} 秒，分 {len(segments)} 段并行编码，每个进程 {threads} 线程")
+    tasks = [
+        lambda stop, index=index, start=start, length=length: _encode_segment(
+            list_path, os.path.join(work_dir, f"segment-{index}.mp4"), start, length, local_subtitles, threads)
+        for index, (start, length) in enumerate(segments)
+    ]
+    segment_paths = run_segments(tasks, len(segments))
+
+    segment_list = os.path.join(work_dir, "segments.txt")
+    with open(segment_list, 'w', encoding='utf-8') as f:
+        f.writelines(concat_list_line(p) for p in segment_paths)
+    video = ffmpeg.input(segment_list, f='concat', safe=0).video
+    audio = ffmpeg.input(list_path, f='concat', safe=0).audio
+    (ffmpeg
+     .output(video, audio, output_path, c='copy', movflags='+faststart')
+     .run(overwrite_output=True, quiet=True))
+
+
+def _concat_reencode(video_paths: List[str], output_path: str, work_dir: str, subtitle_path: Optional[str] = None):
+    """通过滤镜图统一缩放后重新编码拼接，探测失败时使用"""
+    # 加载视频和音频流
+    inputs = [ffmpeg.input(p) for p in video_paths]
+    videos = [i.video.filter('scale', VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT).filter('fps', fps=VIDEO_TARGET_FPS)
+              for i in inputs]
+    audios = [i.audio for i in inputs]
+
+    # 拼接视频和音频
+    concated = ffmpeg.concat(*[val for pair in zip(videos, audios) for val in pair], v=1, a=1).node
+    video = concated[0]
+    if subtitle_path:
+        video = _burn_subtitles(video, _copy_subtitles(subtitle_path, work_dir))
+    out = ffmpeg.output(video, concated[1], output_path)
+
+    # 执行合成
+    out.run(overwrite_output=True, quiet=True)
+
+
+def _probe_all(video_paths: List[str]) -> List[Dict[str, Any]]:
+    with ThreadPoolExecutor(max_workers=_worker_count(len(video_paths))) as executor:
+        return list(executor.map(ffmpeg.probe, video_paths))
+
+
+def concat_videos(video_paths: List[str], output_path: str = "output_dynamic.mp4",
+                  subtitle_path: Optional[str] = None) -> str:
     """
     将多个视频拼接为一个输出视频。
 
+    先用 ffprobe 探测各片段，已符合目标格式(1920x1080@30、H.264/AAC)的片段直接参与拼接，
+    其余片段并行转码为目标格式(相同素材的转码结果会被缓存复用)，最后通过 concat demuxer 复制码流拼接。
+    指定字幕文件时在拼接的同时烧录字幕，此时视频需要重新编码，按核数分段并行编码后再复制码流合并。
+
     参数：
         video_paths (List[str]): 待拼接视频的路径列表
         output_path (str): 输出视频路径（默认 output_dynamic.mp4）
+        subtitle_path (str): 要烧录的SRT/ASS字幕文件，可由 subtitles.generate_subtitles 生成
 
     返回：
         str: 最终输出的视频文件路径
     """
     try:
-        # 加载视频和音频流
-        inputs = [ffmpeg.input(p) for p in video_paths]
-        videos = [i.video.filter('scale', 1920, 1080).filter('fps', fps=30) for i in inputs]
-        audios = [i.audio for i in inputs]
+        work_dir = tempfile.mkdtemp(prefix="concat-")
+        try:
+            try:
+                probes = _probe_all(video_paths)
+            except ffmpeg.Error as e:
+                logger.warning(f"探测视频参数失败，改为整体重新编码: {(e.stderr or b'').decode('utf8', 'replace')}")
+                _concat_reencode(video_paths, output_path, work_dir, subtitle_path)
+                print(f"拼接成功，输出文件为 {output_path}")
+                return os.path.abspath(output_path)
+
+            target = _target_signature()
+            pending = [index for index, probe in enumerate(probes) if stream_signature(probe) != target]
+            parts = list(video_paths)
+            if pending:
+                workers = _worker_count(len(pending))
+                # 多个ffmpeg进程并行时平分CPU，避免线程数超过核数
+                threads = max(1, (os.cpu_count() or 1) // workers)
+                logger.info(f"{len(pending)}/{len(video_paths)} 个片段需要标准化，并行数 {workers}")
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        index: executor.submit(_normalize_cached, video_paths[index],
+                                               os.path.join(work_dir, f"part-{index}.mp4"),
+                                               _has_audio(probes[index]), threads)
+                        for index in pending
+                    }
+                    for index, future in futures.items():
+                        parts[index] = future.result()
+            else:
+                logger.info("所有片段格式一致，直接复制码流拼接")
 
-        # 拼接视频和音频
-        concated = ffmpeg.concat(*[val for pair in zip(videos, audios) for val in pair], v=1, a=1)
-        out = concated.output(output_path)
+            if subtitle_path:
+                _concat_burn(parts, output_path, work_dir, subtitle_path)
+            else:
+                _concat_copy(parts, output_path, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
-        # 执行合成
-        out.run(overwrite_output=True, quiet=True)
         print(f"拼接成功，输出文件为 {output_path}")
         return os.path.abspath(output_path)
 
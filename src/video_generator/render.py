@@ -0,0 +1,473 @@
+import itertools
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import ffmpeg
+
+from config.constants import (RENDER_MAX_CONCURRENT, RENDER_TIMEOUT_SECONDS, RENDER_CHARS_PER_SECOND,
+                              RENDER_MIN_SECTION_SECONDS, RENDER_MEDIA_DIR, RENDER_OUTPUT_DIR, RENDER_JOB_TTL,
+                              RENDER_MAX_PENDING,
+                              VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT, VIDEO_TARGET_FPS, VIDEO_TARGET_SAMPLE_RATE)
+from src.utils.progress import progress_broker
+from src.video_generator.contact_video import (TARGET_PIX_FMT, TARGET_AUDIO_CODEC, TARGET_AUDIO_CHANNELS,
+                                               TARGET_TIMESCALE, _burn_subtitles, _has_audio,
+                                               concat_list_line)
+from src.video_generator.segmented import (available_cores, gop_frames, run_segments, split_timeline,
+                                            threads_per_process)
+
+logger = logging.getLogger(__name__)
+
+# 获取项目根目录
+project_root = Path(__file__).parent.parent.parent
+
+# 渲染任务状态
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMEOUT = "timeout"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED, TIMEOUT)
+
+
+class RenderCancelled(Exception):
+    """渲染被取消"""
+
+
+class RenderTimeout(Exception):
+    """渲染超时"""
+
+
+def estimate_duration(text: str, chars_per_second: float = RENDER_CHARS_PER_SECOND) -> float:
+    """
+    按朗读速度估算一段文案的时长。
+
+    参数：
+        text (str): 文案
+        chars_per_second (float): 每秒朗读的字符数(不含空白)
+
+    返回：
+        float: 秒数，不低于 RENDER_MIN_SECTION_SECONDS
+    """
+    length = sum(1 for char in text if not char.isspace())
+    return max(RENDER_MIN_SECTION_SECONDS, round(length / chars_per_second, 2))
+
+
+def resolve_media_path(name: str, media_dir: str = None) -> str:
+    """
+    将请求中的素材名解析为素材目录下的绝对路径，拒绝目录之外的路径。
+
+    异常：
+        ValueError: 路径越出素材目录或文件不存在
+    """
+    base = os.path.realpath(media_dir or os.path.join(project_root, RENDER_MEDIA_DIR))
+    path = os.path.realpath(os.path.join(base, name))
+    if os.path.commonpath([base, path]) != base:
+        raise ValueError(f"素材路径不合法: {name}")
+    if not os.path.isfile(path):
+        raise ValueError(f"素材不存在: {name}")
+    return path
+
+
+def build_timeline(script_content: Dict[str, Any], clips: List[str],
+                   durations: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+    """
+    根据脚本章节生成时间线，每个章节对应一个片段。
+
+    参数：
+        script_content (Dict): 脚本JSON(包含 sections)
+        clips (List[str]): 素材路径，数量少于章节时循环使用
+        durations (List[float]): 各章节时长，未提供时按文案长度估算
+
+    返回：
+        List[Dict]: 时间线条目，包含 index、clip、text、start、duration
+    """
+    if not clips:
+        raise ValueError("至少需要一个素材")
+    sections = [section for section in script_content.get('sections', []) if isinstance(section, dict)]
+    if not sections:
+        raise ValueError("脚本没有可渲染的章节")
+
+    timeline = []
+    start = 0.0
+    for index, (section, clip) in enumerate(zip(sections, itertools.cycle(clips))):
+        text = str(section.get('content', '')).strip()
+        duration = durations[index] if durations and index < len(durations) else estimate_duration(text)
+        timeline.append({'index': index, 'clip': clip, 'text': text, 'start': round(start, 3),
+                         'duration': float(duration)})
+        start += float(duration)
+    return timeline
+
+
+def parse_progress(line: str, state: Dict[str, str]) -> Optional[float]:
+    """
+    解析 ffmpeg -progress 输出的一行，遇到一个进度块结束时返回已输出的秒数。
+
+    参数：
+        line (str): 形如 key=value 的一行
+        state (Dict): 当前进度块已读取的键值
+
+    返回：
+        Optional[float]: 进度块结束时返回已处理的秒数，否则返回 None
+    """
+    key, _, value = line.strip().partition('=')
+    if not key:
+        return None
+    state[key] = value
+    if key != 'progress':
+        return None
+    # out_time_ms 实际上也是微秒，新版本改名为 out_time_us
+    raw = state.get('out_time_us') or state.get('out_time_ms') or '0'
+    try:
+        return max(0.0, int(raw) / 1_000_000)
+    except ValueError:
+        return None
+
+
+def run_ffmpeg(stream, duration: float, on_progress: Callable[[float], None] = None,
+               cancel_event: threading.Event = None, deadline: float = None):
+    """
+    运行ffmpeg并报告进度，支持取消和超时。
+
+    参数：
+        stream: ffmpeg-python 的输出流
+        duration (float): 预期输出时长，用于计算完成比例
+        on_progress (Callable[[float], None]): 进度回调，参数为0到1之间的比例
+        cancel_event (threading.Event): 设置后终止ffmpeg
+        deadline (float): time.monotonic() 截止时间
+
+    异常：
+        RenderCancelled, RenderTimeout, ffmpeg.Error
+    """
+    args = stream.compile(overwrite_output=True)
+    args = args[:1] + ['-progress', 'pipe:1', '-nostats', '-loglevel', 'error'] + args[1:]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               stdin=subprocess.DEVNULL, text=True, encoding='utf-8', errors='replace')
+    stderr_tail: deque = deque(maxlen=50)
+
+    def read_progress():
+        state: Dict[str, str] = {}
+        for line in process.stdout:
+            seconds = parse_progress(line, state)
+            if seconds is not None and on_progress and duration > 0:
+                on_progress(min(1.0, seconds / duration))
+
+    def read_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line)
+
+    readers = [threading.Thread(target=read_progress, daemon=True),
+               threading.Thread(target=read_stderr, daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    try:
+        while True:
+            try:
+                process.wait(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if cancel_event is not None and cancel_event.is_set():
+                raise RenderCancelled()
+            if deadline is not None and time.monotonic() > deadline:
+                raise RenderTimeout()
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        for reader in readers:
+            reader.join(timeout=1)
+
+    if process.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', '', ''.join(stderr_tail).encode('utf-8'))
+
+
+class RenderJob:
+    """一次渲染任务的状态"""
+
+    def __init__(self, job_id: str, timeline: List[Dict[str, Any]], output_path: str,
+                 timeout: float = RENDER_TIMEOUT_SECONDS, subtitles: bool = True):
+        self.job_id = job_id
+        self.timeline = timeline
+        self.output_path = output_path
+        self.timeout = timeout
+        self.subtitles = subtitles
+        self.status = QUEUED
+        self.progress = 0.0
+        self.step = ""
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def total_duration(self) -> float:
+        return sum(entry['duration'] for entry in self.timeline)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'progress': round(self.progress * 100, 1),
+            'step': self.step,
+            'error': self.error,
+            'duration': round(self.total_duration, 2),
+            'sections': len(self.timeline),
+            'subtitles': self.subtitles,
+            'output': os.path.basename(self.output_path) if self.status == COMPLETED else None,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class RenderScheduler:
+    """
+    渲染任务调度器。
+
+    任务在后台线程中执行，不占用Flask的请求线程；同时运行的任务数不超过 max_concurrent，其余任务排队。
+    每个任务分到 CPU核数/max_concurrent 个核，在其中分段并行编码。任务状态保存在进程内存中，进度同时以 render 事件发布到进度订阅通道。
+
+    参数：
+        max_concurrent (int): 同时运行的渲染任务数
+        max_pending (int): 排队和运行中的任务总数上限
+        output_dir (str): 输出目录
+    """
+
+    def __init__(self, max_concurrent: int = RENDER_MAX_CONCURRENT, max_pending: int = RENDER_MAX_PENDING,
+                 output_dir: str = None):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.output_dir = output_dir or os.path.join(project_root, RENDER_OUTPUT_DIR)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="render")
+        self._jobs: Dict[str, RenderJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, timeline: List[Dict[str, Any]], timeout: float = RENDER_TIMEOUT_SECONDS,
+               subtitles: bool = True) -> Optional[RenderJob]:
+        """提交渲染任务，立即返回；未结束的任务数达到上限时返回None。subtitles为True时烧录各章节文案的字幕"""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.output_dir, exist_ok=True)
+        job = RenderJob(job_id, timeline, os.path.join(self.output_dir, f"{job_id}.mp4"), timeout, subtitles)
+        with self._lock:
+            self._expire()
+            active = sum(1 for item in self._jobs.values() if item.status not in FINISHED_STATES)
+            if active >= self.max_pending:
+                return None
+            self._jobs[job_id] = job
+        self._publish(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[RenderJob]:
+        """取消排队中或运行中的任务"""
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.cancel_event.set()
+        return job
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > RENDER_JOB_TTL]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _publish(self, job: RenderJob):
+        progress_job = progress_broker.get_or_create(job.job_id)
+        state = job.to_dict()
+        if job.status == COMPLETED:
+            progress_job.publish("completed", state)
+        elif job.status in FINISHED_STATES:
+            progress_job.publish("failed", state)
+        else:
+            progress_job.publish("render", state)
+
+    def _run(self, job: RenderJob):
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        deadline = time.monotonic() + job.timeout
+        try:
+            self._render(job, deadline)
+            job.progress = 1.0
+            self._finish(job, COMPLETED)
+        except RenderCancelled:
+            self._finish(job, CANCELLED)
+        except RenderTimeout:
+            self._finish(job, TIMEOUT, f"渲染超过 {job.timeout} 秒")
+        except ffmpeg.Error as e:
+            self._finish(job, FAILED, (e.stderr or b'').decode('utf-8', 'replace')[-2000:])
+        except Exception as e:
+            logger.error(f"渲染任务失败: {job.job_id}", exc_info=True)
+            self._finish(job, FAILED, str(e))
+
+    def _finish(self, job: RenderJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if status != COMPLETED and os.path.exists(job.output_path):
+            os.remove(job.output_path)
+        logger.info(f"渲染任务结束: {job.job_id}, 状态: {status}")
+        self._publish(job)
+
+    def _render(self, job: RenderJob, deadline: float):
+        """把时间线按关键帧边界切成工作量相近的单元并行编码视频，音频整段编码，再复制码流合并"""
+        work_dir = os.path.join(self.output_dir, f".work-{job.job_id}")
+        os.makedirs(work_dir, exist_ok=True)
+        try:
+            # 探测素材是否带音轨，没有音轨的章节补静音
+            job.step = "probe"
+            has_audio = {clip: _has_audio(ffmpeg.probe(clip)) for clip in {entry['clip'] for entry in job.timeline}}
+
+            subtitle_paths = self._write_subtitles(job.timeline, work_dir) if job.subtitles else {}
+
+            # 同时运行的渲染任务平分CPU
+            cores = max(1, available_cores() // self.max_concurrent)
+            units = split_timeline(job.timeline, cores)
+            workers = min(cores, len(units))
+            threads = threads_per_process(workers, cores)
+            total = job.total_duration or 1.0
+            encoded = [0.0] * len(units)
+            publish_lock = threading.Lock()
+            last_publish = 0.0
+            job.step = "encode"
+            logger.info(f"渲染任务 {job.job_id}: {len(units)} 个编码单元，并行数 {workers}，每个进程 {threads} 线程")
+
+            def on_progress(index, ratio):
+                nonlocal last_publish
+                encoded[index] = ratio * units[index]['duration']
+                job.progress = min(0.99, sum(encoded) / total)
+                now = time.monotonic()
+                with publish_lock:
+                    if now - last_publish < 0.5:
+                        return
+                    last_publish = now
+                self._publish(job)
+
+            def encode(unit):
+                def run(stop: threading.Event) -> str:
+                    if stop.is_set():
+                        raise RenderCancelled()
+                    part_path = os.path.join(work_dir, f"part-{unit['index']}.mp4")
+                    stream = self._unit_stream(unit, part_path, threads, subtitle_paths.get(unit['entry']['index']))
+                    run_ffmpeg(stream, unit['duration'], lambda ratio: on_progress(unit['index'], ratio),
+                               stop, deadline)
+                    return part_path
+                return run
+
+            def encode_audio(stop: threading.Event) -> str:
+                if stop.is_set():
+                    raise RenderCancelled()
+                audio_path = os.path.join(work_dir, "audio.m4a")
+                run_ffmpeg(self._audio_stream(job.timeline, audio_path, has_audio), total, None, stop, deadline)
+                return audio_path
+
+            # 音频按整条时间线只编码一次，每段单独编码AAC时各段的前置填充会在拆分处产生间隙
+            try:
+                *parts, audio_path = run_segments([encode(unit) for unit in units] + [encode_audio],
+                                                  workers + 1, job.cancel_event)
+            except CancelledError:
+                raise RenderCancelled()
+
+            job.step = "concat"
+            self._publish(job)
+            if job.cancel_event.is_set():
+                raise RenderCancelled()
+            self._mux(parts, audio_path, job.output_path, work_dir)
+        finally:
+            for name in os.listdir(work_dir):
+                os.remove(os.path.join(work_dir, name))
+            os.rmdir(work_dir)
+
+    @staticmethod
+    def _write_subtitles(timeline: List[Dict[str, Any]], work_dir: str) -> Dict[int, str]:
+        """为每个有文案的章节写一个ASS字幕文件，时间从章节开头算起，与编码单元滤镜中的时间一致
+
+        返回：
+            Dict[int, str]: 章节序号到字幕文件路径
+        """
+        # subtitles模块导入了本模块的estimate_duration，在这里导入避免循环导入
+        from src.video_generator.subtitles import build_cues, to_ass
+
+        paths = {}
+        for entry in timeline:
+            if not entry['text']:
+                continue
+            cues = build_cues({'sections': [{'content': entry['text']}]}, [entry['duration']])
+            path = os.path.join(work_dir, f"subtitles-{entry['index']}.ass")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(to_ass(cues))
+            paths[entry['index']] = path
+        return paths
+
+    def _unit_stream(self, unit: Dict[str, Any], output_path: str, threads: int, subtitle_path: str = None):
+        """单个编码单元的命令(只有视频)：素材循环到章节时长后取出该单元的区间，统一分辨率、帧率和编码，
+        提供字幕文件时烧录该章节的字幕"""
+        video = (ffmpeg.input(unit['entry']['clip'], stream_loop=-1).video
+                 .filter('scale', VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT)
+                 .filter('fps', fps=VIDEO_TARGET_FPS)
+                 .filter('setsar', 1))
+        if subtitle_path:
+            # 滤镜中的时间从章节开头算起，输出端的-ss在烧录之后截取，各单元的字幕时间无需调整
+            video = _burn_subtitles(video, subtitle_path)
+        options = {}
+        if unit['offset'] > 0:
+            # 输出端的-ss按帧精确丢弃章节前面的部分，起点是关键帧间隔的整数倍
+            options['ss'] = unit['offset']
+        return ffmpeg.output(video, output_path, t=unit['duration'], vcodec='libx264',
+                             pix_fmt=TARGET_PIX_FMT, g=gop_frames(), threads=threads,
+                             video_track_timescale=TARGET_TIMESCALE, **options)
+
+    def _audio_stream(self, timeline: List[Dict[str, Any]], output_path: str, has_audio: Dict[str, bool]):
+        """整条时间线的音频命令：各章节的素材音轨循环到章节时长后拼接，没有音轨的章节补静音"""
+        audios = []
+        for entry in timeline:
+            if has_audio[entry['clip']]:
+                source = ffmpeg.input(entry['clip'], stream_loop=-1).audio
+            else:
+                source = ffmpeg.input(f"anullsrc=channel_layout=stereo:sample_rate={VIDEO_TARGET_SAMPLE_RATE}",
+                                      f='lavfi').audio
+            audios.append(source
+                          .filter('atrim', duration=entry['duration'])
+                          .filter('asetpts', 'PTS-STARTPTS')
+                          .filter('aformat', sample_rates=VIDEO_TARGET_SAMPLE_RATE, channel_layouts='stereo'))
+        audio = ffmpeg.concat(*audios, v=0, a=1) if len(audios) > 1 else audios[0]
+        return ffmpeg.output(audio, output_path, acodec=TARGET_AUDIO_CODEC, ar=VIDEO_TARGET_SAMPLE_RATE,
+                             ac=TARGET_AUDIO_CHANNELS)
+
+    @staticmethod
+    def _mux(parts: List[str], audio_path: str, output_path: str, work_dir: str):
+        """复制码流拼接各单元的视频，与整段编码的音频合并"""
+        list_path = os.path.join(work_dir, "inputs.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(concat_list_line(p) for p in parts)
+        video = ffmpeg.input(list_path, f='concat', safe=0).video
+        audio = ffmpeg.input(audio_path).audio
+        (ffmpeg
+         .output(video, audio, output_path, c='copy', movflags='+faststart')
+         .run(overwrite_output=True, quiet=True))
+
+
+# 全局渲染调度器
+render_scheduler = RenderScheduler()
@@ -0,0 +1,132 @@
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError, wait, FIRST_EXCEPTION
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.constants import (VIDEO_TARGET_FPS, VIDEO_NORMALIZE_WORKERS, VIDEO_SEGMENT_MIN_SECONDS,
+                              VIDEO_KEYFRAME_SECONDS)
+
+
+def available_cores() -> int:
+    """可用于编码的CPU核数，VIDEO_NORMALIZE_WORKERS 非0时以其为准"""
+    return VIDEO_NORMALIZE_WORKERS or os.cpu_count() or 1
+
+
+def gop_frames() -> int:
+    """关键帧间隔的帧数"""
+    return max(1, round(VIDEO_KEYFRAME_SECONDS * VIDEO_TARGET_FPS))
+
+
+def segment_count(duration: float, cores: Optional[int] = None) -> int:
+    """
+    根据核数和输入时长选择分段数。
+
+    每段不短于 VIDEO_SEGMENT_MIN_SECONDS，段数不超过核数；短输入只用一段，避免进程启动开销超过收益。
+
+    参数：
+        duration (float): 输入总时长(秒)
+        cores (int): 可用核数，默认 available_cores()
+
+    返回：
+        int: 分段数
+    """
+    cores = cores or available_cores()
+    return max(1, min(cores, int(duration // VIDEO_SEGMENT_MIN_SECONDS)))
+
+
+def plan_segments(duration: float, cores: Optional[int] = None) -> List[Tuple[float, float]]:
+    """
+    将时长切分为关键帧对齐的分段。
+
+    段长向上取整为关键帧间隔的整数倍，每段从关键帧开始，拼接时无需重新编码。
+
+    参数：
+        duration (float): 输入总时长(秒)
+        cores (int): 可用核数
+
+    返回：
+        List[Tuple[float, float]]: 各段的(开始秒数, 时长)，最后一段可能较短
+    """
+    if duration <= 0:
+        return []
+    gop = gop_frames() / VIDEO_TARGET_FPS
+    step = math.ceil(duration / segment_count(duration, cores) / gop) * gop
+    segments = []
+    start = 0.0
+    while start < duration - 1e-6:
+        segments.append((round(start, 6), round(min(step, duration - start), 6)))
+        start += step
+    return segments
+
+
+def threads_per_process(processes: int, cores: Optional[int] = None) -> int:
+    """多个ffmpeg进程并行时平分CPU，避免线程总数超过核数"""
+    return max(1, (cores or available_cores()) // max(1, processes))
+
+
+def split_timeline(timeline: List[Dict[str, Any]], cores: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    把渲染时间线切成工作量相近的编码单元。
+
+    段长由 plan_segments 按总时长决定，比段长更长的章节在关键帧间隔的整数倍处拆分，较短的章节各自成为一个单元。
+
+    参数：
+        timeline (List[Dict]): 渲染时间线，条目包含 duration
+        cores (int): 可用核数
+
+    返回：
+        List[Dict]: 编码单元，包含 index、entry(所属章节)、offset(章节内的起始秒数)、duration
+    """
+    segments = plan_segments(sum(entry['duration'] for entry in timeline), cores)
+    if not segments:
+        return []
+    step = segments[0][1]
+    units = []
+    for entry in timeline:
+        offset = 0.0
+        while offset < entry['duration'] - 1e-6:
+            units.append({'index': len(units), 'entry': entry, 'offset': round(offset, 6),
+                          'duration': round(min(step, entry['duration'] - offset), 6)})
+            offset += step
+    return units
+
+
+def run_segments(tasks: List[Callable[[threading.Event], Any]], workers: int,
+                 cancel_event: Optional[threading.Event] = None) -> List[Any]:
+    """
+    并行执行分段编码任务，任一任务失败或外部取消时通知其余任务停止。
+
+    参数：
+        tasks (List[Callable]): 任务列表，参数为停止事件，任务应在事件设置后尽快结束
+        workers (int): 并行数
+        cancel_event (threading.Event): 外部取消事件
+
+    返回：
+        List[Any]: 按任务顺序排列的返回值
+
+    异常：
+        第一个失败任务抛出的异常；外部取消且没有任务失败时抛出 CancelledError
+    """
+    stop = threading.Event()
+    error: Optional[BaseException] = None
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="segment") as executor:
+        futures = [executor.submit(task, stop) for task in tasks]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if not future.cancelled() and future.exception() is not None and error is None:
+                    error = future.exception()
+            if error is None and cancel_event is not None and cancel_event.is_set():
+                stop.set()
+            if error is not None or stop.is_set():
+                stop.set()
+                # 尚未开始的任务直接取消
+                for future in pending:
+                    future.cancel()
+    if error is not None:
+        raise error
+    if stop.is_set():
+        raise CancelledError()
+    return [future.result() for future in futures]
@@ -0,0 +1,330 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.constants import (SUBTITLE_MAX_LINE_WIDTH, SUBTITLE_MAX_LINES, SUBTITLE_CACHE_SIZE, SUBTITLE_FONT,
+                              SUBTITLE_FONT_SIZE, RENDER_CHARS_PER_SECOND, VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT)
+from src.utils import json_provider
+from src.video_generator.render import estimate_duration
+
+# 字幕格式
+SRT = "srt"
+ASS = "ass"
+MIMETYPES = {
+    SRT: "application/x-subrip",
+    ASS: "text/x-ass",
+}
+
+# 句末标点；英文句点只有后面跟空白时才算句末，避免拆开小数和缩写
+_END = r'(?:[。！？!?；;…]|\.(?=\s|$))'
+# 句内停顿，句子过长时在这里断开
+_PAUSE = r'(?:[，、：]|[,:](?=\s))'
+# 紧跟在标点后面的右引号和右括号归入前一句
+_CLOSERS = r'[”’"」』）)》]*'
+_SENTENCE = re.compile(rf'(?:(?!{_END})[^\n])+(?:{_END})*{_CLOSERS}|(?:{_END})+{_CLOSERS}')
+_CLAUSE = re.compile(rf'(?:(?!{_PAUSE}).)+(?:{_PAUSE})*{_CLOSERS}|(?:{_PAUSE})+{_CLOSERS}')
+# 英文单词和数字整体换行，其余字符逐个处理
+_TOKEN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_'’.%+\-/]*|\s+|.")
+
+# 显示为全角的字符：CJK文字、全角标点和符号、谚文
+_WIDE = re.compile('[\u1100-\u115f\u2014\u2018\u2019\u201c\u201d\u2026\u2e80-\u303e\u3040-\ua4cf'
+                   '\uac00-\ud7a3\uf900-\ufaff\ufe30-\ufe4f\uff00-\uff60\uffe0-\uffe6'
+                   '\U00020000-\U0003fffd]')
+
+# 不能出现在行首和行尾的字符
+_NO_LINE_START = frozenset('，。、！？：；,.!?:;）)」』”’》…—%')
+_NO_LINE_END = frozenset('（(「『“‘《')
+
+# 字幕条目: (开始秒数, 结束秒数, 文本)，多行文本用换行分隔
+Cue = Tuple[float, float, str]
+
+
+def text_width(text: str) -> float:
+    """
+    计算文本的显示宽度。
+
+    参数：
+        text (str): 文本
+
+    返回：
+        float: 宽度，全角字符计1，半角字符计0.5
+    """
+    if text.isascii():
+        return len(text) * 0.5
+    return (len(text) + len(_WIDE.findall(text))) * 0.5
+
+
+# 折行时逐个字符计算宽度，常用字符的结果直接复用
+_token_width = lru_cache(maxsize=8192)(text_width)
+
+
+def wrap_text(text: str, max_width: float = SUBTITLE_MAX_LINE_WIDTH) -> List[str]:
+    """
+    按显示宽度将文本折行。
+
+    中文按字断行，英文单词不拆开(超过一行的单词除外)；标点不放在行首，左括号和左引号不放在行尾。
+
+    参数：
+        text (str): 单行文本
+        max_width (float): 每行最大宽度
+
+    返回：
+        List[str]: 折行后的各行
+    """
+    lines: List[str] = []
+    line: List[Tuple[str, float]] = []
+    used = 0.0
+    for token in _TOKEN.findall(text):
+        if token.isspace():
+            if line:
+                line.append((' ', 0.5))
+                used += 0.5
+            continue
+        width = _token_width(token)
+        pieces = [token] if width <= max_width else list(token)
+        for piece in pieces:
+            width = _token_width(piece) if len(pieces) > 1 else width
+            # 行尾标点允许略微超出宽度
+            if line and used + width > max_width and piece[0] not in _NO_LINE_START:
+                carry: List[Tuple[str, float]] = []
+                while line and (line[-1][0] == ' ' or line[-1][0] in _NO_LINE_END):
+                    item = line.pop()
+                    if item[0] != ' ':
+                        carry.insert(0, item)
+                if line:
+                    lines.append(''.join(item[0] for item in line))
+                line = carry
+                used = sum(item[1] for item in line)
+            line.append((piece, width))
+            used += width
+    if line:
+        lines.append(''.join(item[0] for item in line).rstrip())
+    return [item for item in lines if item]
+
+
+def split_captions(text: str, max_width: float = SUBTITLE_MAX_LINE_WIDTH,
+                   max_lines: int = SUBTITLE_MAX_LINES) -> List[str]:
+    """
+    将一段文案切分为字幕条目。
+
+    先按句末标点和换行断句，超过一条字幕容量的句子再按逗号等停顿处切分，
+    最后折行并按每条最多 max_lines 行分组。
+
+    参数：
+        text (str): 文案
+        max_width (float): 每行最大宽度
+        max_lines (int): 每条字幕最多行数
+
+    返回：
+        List[str]: 字幕文本，多行时用换行分隔
+    """
+    capacity = max_width * max_lines
+    captions: List[str] = []
+    for match in _SENTENCE.finditer(text):
+        sentence = match.group().strip()
+        if not sentence:
+            continue
+        if text_width(sentence) <= capacity:
+            chunks = [sentence]
+        else:
+            # 按停顿处贪心合并分句，使每块尽量接近一条字幕的容量
+            chunks = []
+            current = ''
+            for clause in _CLAUSE.findall(sentence):
+                if current and text_width(current) + text_width(clause) > capacity:
+                    chunks.append(current)
+                    current = clause
+                else:
+                    current += clause
+            if current:
+                chunks.append(current)
+        for chunk in chunks:
+            lines = wrap_text(chunk.strip(), max_width)
+            for start in range(0, len(lines), max_lines):
+                captions.append('\n'.join(lines[start:start + max_lines]))
+    return captions
+
+
+def _reading_weight(caption: str) -> int:
+    return max(1, len(caption) - caption.count(' ') - caption.count('\n'))
+
+
+def build_cues(script_content: Dict[str, Any], durations: Optional[List[float]] = None,
+               chars_per_second: float = RENDER_CHARS_PER_SECOND) -> List[Cue]:
+    """
+    根据脚本章节生成带时间的字幕条目。
+
+    章节时长与渲染时间线的规则一致：提供了素材时长时使用该时长，否则按朗读速度估算；
+    章节内各条字幕按字数比例分配章节时长，因此字幕与渲染出的视频对齐。
+
+    参数：
+        script_content (Dict): 脚本JSON(包含 sections)
+        durations (List[float]): 各章节(素材)时长
+        chars_per_second (float): 每秒朗读的字符数
+
+    返回：
+        List[Cue]: 按时间排序的字幕条目
+    """
+    sections = [section for section in script_content.get('sections', []) if isinstance(section, dict)]
+    cues: List[Cue] = []
+    start = 0.0
+    for index, section in enumerate(sections):
+        text = str(section.get('content', '')).strip()
+        if durations and index < len(durations):
+            duration = float(durations[index])
+        else:
+            duration = estimate_duration(text, chars_per_second)
+        captions = split_captions(text)
+        weights = [_reading_weight(caption) for caption in captions]
+        total = sum(weights)
+        cursor = start
+        for caption, weight in zip(captions, weights):
+            end = cursor + duration * weight / total
+            cues.append((cursor, end, caption))
+            cursor = end
+        start += duration
+    return cues
+
+
+def _split_time(seconds: float, unit: int) -> Tuple[int, int, int, int]:
+    ticks = int(round(seconds * unit))
+    total_seconds, fraction = divmod(ticks, unit)
+    minutes, secs = divmod(total_seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return hours, minutes, secs, fraction
+
+
+def to_srt(cues: List[Cue]) -> str:
+    """
+    输出SRT字幕。
+
+    参数：
+        cues (List[Cue]): 字幕条目
+
+    返回：
+        str: SRT文本
+    """
+    parts = []
+    for index, (start, end, text) in enumerate(cues, 1):
+        start_time = "%02d:%02d:%02d,%03d" % _split_time(start, 1000)
+        end_time = "%02d:%02d:%02d,%03d" % _split_time(end, 1000)
+        parts.append(f"{index}\n{start_time} --> {end_time}\n{text}\n")
+    return '\n'.join(parts)
+
+
+def _ass_text(text: str) -> str:
+    # 大括号和反斜杠在ASS中表示样式代码，替换为全角字符
+    text = text.replace('\\', '＼').replace('{', '｛').replace('}', '｝')
+    return text.replace('\n', '\\N')
+
+
+def to_ass(cues: List[Cue], font: str = SUBTITLE_FONT, font_size: int = SUBTITLE_FONT_SIZE) -> str:
+    """
+    输出ASS字幕，画布与渲染目标分辨率一致，底部居中显示。
+
+    参数：
+        cues (List[Cue]): 字幕条目
+        font (str): 字体
+        font_size (int): 字号
+
+    返回：
+        str: ASS文本
+    """
+    header = (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        f"PlayResX: {VIDEO_TARGET_WIDTH}\n"
+        f"PlayResY: {VIDEO_TARGET_HEIGHT}\n"
+        # 已经按宽度折行，禁止播放器再次自动换行
+        "WrapStyle: 2\n"
+        "ScaledBorderAndShadow: yes\n"
+        "\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, "
+        "Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding\n"
+        f"Style: Default,{font},{font_size},&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,"
+        "1,3,0,2,60,60,60,1\n"
+        "\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+    events = []
+    for start, end, text in cues:
+        start_time = "%d:%02d:%02d.%02d" % _split_time(start, 100)
+        end_time = "%d:%02d:%02d.%02d" % _split_time(end, 100)
+        events.append(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{_ass_text(text)}\n")
+    return header + ''.join(events)
+
+
+class SubtitleCache:
+    """生成结果的内存LRU缓存，键包含脚本内容哈希，脚本产生新版本后自然不再命中"""
+
+    def __init__(self, max_entries: int = SUBTITLE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+subtitle_cache = SubtitleCache()
+
+
+def subtitle_key(content: str, fmt: str, durations: Optional[List[float]] = None,
+                 chars_per_second: float = RENDER_CHARS_PER_SECOND) -> str:
+    """字幕的缓存键，同时可作为ETag"""
+    digest = hashlib.blake2b(content.encode('utf-8'), digest_size=16)
+    digest.update(f"|{fmt}|{chars_per_second}|{durations or ''}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def generate_subtitles(content: str, fmt: str = SRT, durations: Optional[List[float]] = None,
+                       chars_per_second: float = RENDER_CHARS_PER_SECOND) -> str:
+    """
+    根据存储的脚本JSON生成字幕，同一脚本版本和参数的结果会被缓存。
+
+    参数：
+        content (str): 脚本JSON字符串
+        fmt (str): srt 或 ass
+        durations (List[float]): 各章节(素材)时长，未提供时按朗读速度估算
+        chars_per_second (float): 每秒朗读的字符数
+
+    返回：
+        str: 字幕文本
+
+    异常：
+        ValueError: 格式不支持或脚本内容无法解析
+    """
+    if fmt not in MIMETYPES:
+        raise ValueError(f"不支持的字幕格式: {fmt}")
+    key = subtitle_key(content, fmt, durations, chars_per_second)
+    cached = subtitle_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        script_content = json_provider.loads(content)
+    except json_provider.JSONDecodeError as e:
+        raise ValueError(f"脚本内容无法解析: {e}")
+    if not isinstance(script_content, dict):
+        raise ValueError("脚本内容格式不正确")
+    cues = build_cues(script_content, durations, chars_per_second)
+    result = to_ass(cues) if fmt == ASS else to_srt(cues)
+    subtitle_cache.set(key, result)
+    return result
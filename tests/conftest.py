@@ -0,0 +1,10 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# 测试请求被采样的追踪写入临时目录，不在 data/logs 下留下 traces.jsonl；必须在导入config之前设置
+if "TRACE_EXPORT_FILE" not in os.environ:
+    _trace_dir = tempfile.mkdtemp(prefix="traces-")
+    atexit.register(shutil.rmtree, _trace_dir, ignore_errors=True)
+    os.environ["TRACE_EXPORT_FILE"] = os.path.join(_trace_dir, "traces.jsonl")
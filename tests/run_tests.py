@@ -6,6 +6,9 @@ from pathlib import Path
 # 添加项目根目录到Python路径
 sys.path.append(str(Path(__file__).parent.parent))
 
+# 追踪导出写入临时目录，与pytest共用conftest中的设置
+import conftest  # noqa: F401
+
 # 创建测试套件
 def create_test_suite():
     # 获取测试目录
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.admission import (TokenBucket, RateLimiter, SharedRateLimiter, GenerationGate,
+                                 FileSlotGate, AdmissionController)
+
+class TestAdmission(unittest.TestCase):
+    """测试限流和并发准入控制"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """测试后清理工作"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_token_bucket_refill(self):
+        """测试令牌桶的突发容量和补充"""
+        bucket = TokenBucket(rate=1.0, capacity=2)
+        now = bucket.updated
+        self.assertTrue(bucket.take(now)[0])
+        self.assertTrue(bucket.take(now)[0])
+        allowed, wait = bucket.take(now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+        self.assertTrue(bucket.take(now + 1.0)[0])
+    
+    def test_rate_limiter_per_client(self):
+        """测试不同客户端独立限流"""
+        limiter = RateLimiter(per_minute=60, burst=1)
+        self.assertTrue(limiter.check("a")[0])
+        self.assertFalse(limiter.check("a")[0])
+        self.assertTrue(limiter.check("b")[0])
+    
+    def test_shared_rate_limiter(self):
+        """测试SQLite共享限流状态在实例间可见"""
+        path = os.path.join(self.temp_dir, "rate.db")
+        first = SharedRateLimiter(path, per_minute=60, burst=1)
+        second = SharedRateLimiter(path, per_minute=60, burst=1)
+        self.assertTrue(first.check("a")[0])
+        self.assertFalse(second.check("a")[0])
+    
+    def test_shared_rate_limiter_evicts_full_buckets(self):
+        """测试空闲期间补满的桶被删除，未补满的桶保留"""
+        path = os.path.join(self.temp_dir, "rate.db")
+        limiter = SharedRateLimiter(path, per_minute=60, burst=2)
+        with patch('src.utils.admission.time.time', return_value=1000.0):
+            limiter.check("a")
+            limiter.check("b")
+            limiter.check("b")
+        with patch('src.utils.admission.time.time', return_value=1001.5):
+            self.assertTrue(limiter.check("c")[0])
+        keys = [row[0] for row in limiter._connect().execute("SELECT key FROM buckets ORDER BY key")]
+        self.assertEqual(keys, ["b", "c"])
+    
+    def test_gate_rejects_when_queue_full(self):
+        """测试并发已满且队列已满时立即拒绝"""
+        gate = GenerationGate(max_concurrent=1, max_queue=0, queue_timeout=1)
+        self.assertEqual(gate.acquire(), (True, ""))
+        self.assertEqual(gate.acquire(), (False, "queue_full"))
+        gate.release()
+        self.assertEqual(gate.acquire(), (True, ""))
+    
+    def test_gate_queue_waits_for_release(self):
+        """测试排队请求在名额释放后获得执行权"""
+        gate = GenerationGate(max_concurrent=1, max_queue=1, queue_timeout=5)
+        gate.acquire()
+        timer = threading.Timer(0.05, gate.release)
+        timer.start()
+        self.assertEqual(gate.acquire(), (True, ""))
+        timer.join()
+        
+        short = GenerationGate(max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        short.acquire()
+        self.assertEqual(short.acquire(), (False, "queue_timeout"))
+    
+    def test_file_slot_gate(self):
+        """测试文件锁槽位在实例间互斥"""
+        lock_dir = os.path.join(self.temp_dir, "slots")
+        first = FileSlotGate(lock_dir, max_concurrent=1, max_queue=0)
+        second = FileSlotGate(lock_dir, max_concurrent=1, max_queue=0)
+        self.assertTrue(first.acquire()[0])
+        self.assertEqual(second.acquire(), (False, "queue_full"))
+        first.release()
+        self.assertTrue(second.acquire()[0])
+        second.release()
+    
+    def test_controller_status_codes(self):
+        """测试限流返回429，并发饱和返回503"""
+        controller = AdmissionController(RateLimiter(per_minute=60, burst=1),
+                                         GenerationGate(max_concurrent=1, max_queue=0))
+        self.assertTrue(controller.admit("a")[0])
+        self.assertEqual(controller.admit("a")[1:3], (429, "rate_limited"))
+        self.assertEqual(controller.admit("b")[1:3], (503, "queue_full"))
+        controller.release()
+        self.assertTrue(controller.admit("c")[0])
+
+    def test_client_key_requires_known_api_key(self):
+        """测试只有已配置的API Key用作客户端标识，未知的Key按来源IP限流"""
+        from src.api.app import app, _client_key
+        with patch('src.api.app.CLIENT_API_KEYS', frozenset({'known'})):
+            for api_key, expected in (('known', 'key:known'), ('forged', 'ip:10.0.0.1'), (None, 'ip:10.0.0.1')):
+                headers = {'X-API-Key': api_key} if api_key else {}
+                with app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+                    self.assertEqual(_client_key(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ import requests
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.script_generator.api_client import APIClient
+from src.utils.metrics import LLM_TOKENS
 
 class TestAPIClient(unittest.TestCase):
     """测试API客户端功能"""
@@ -121,5 +122,18 @@ class TestAPIClient(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 2)
         mock_sleep.assert_called_once()
 
+    def test_cache_usage_metrics(self):
+        """测试记录usage中报告的前缀缓存命中token数"""
+        hit = LLM_TOKENS.labels("test-model", "cache_hit")
+        miss = LLM_TOKENS.labels("test-model", "cache_miss")
+        before = hit.get(), miss.get()
+        
+        APIClient._record_usage("test-model", {"prompt_tokens": 100, "prompt_cache_hit_tokens": 64,
+                                               "prompt_cache_miss_tokens": 36})
+        APIClient._record_usage("test-model", {"prompt_tokens": 50, "prompt_tokens_details": {"cached_tokens": 20}})
+        
+        self.assertEqual(hit.get() - before[0], 84)
+        self.assertEqual(miss.get() - before[1], 66)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
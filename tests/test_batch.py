@@ -0,0 +1,85 @@
+import unittest
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.app import app
+from src.database.models import Outline, OutlineSection, Script
+from config.constants import BATCH_MAX_IDS
+
+CREATED = datetime(2024, 6, 1, 12, 0, 0)
+
+
+class TestBatch(unittest.TestCase):
+    """测试提纲和脚本的批量查询接口"""
+
+    def setUp(self):
+        """测试前准备工作"""
+        self.client = app.test_client()
+
+    def test_invalid_ids(self):
+        """测试缺少ids、ids不是数组、超过数量上限和不支持的字段返回400"""
+        for body in ({}, {'ids': []}, {'ids': '1,2'}, {'ids': [str(i) for i in range(BATCH_MAX_IDS + 1)]},
+                     {'ids': ['1'], 'fields': 'title'}, {'ids': ['1'], 'fields': ['password']}):
+            for path in ('/api/outlines/batch', '/api/scripts/batch'):
+                response = self.client.post(path, json=body)
+                self.assertEqual(response.status_code, 400, (path, body))
+                self.assertIn('error', response.get_json())
+        response = self.client.post('/api/outlines/batch', json={'ids': ['1'], 'fields': ['bogus']})
+        self.assertIn('title', response.get_json()['allowed_fields'])
+
+    @patch('src.database.operations.OutlineOperations.get_outlines_by_ids')
+    def test_outlines_order_and_missing(self, mock_get):
+        """测试结果按请求顺序返回并去重，非数字ID不查询数据库，不存在的ID列在missing中"""
+        mock_get.return_value = {
+            '2': Outline("提纲二", "2", [OutlineSection("开场", "内容")], CREATED, CREATED),
+            '1': Outline("提纲一", "1", [], CREATED, CREATED),
+        }
+        response = self.client.post('/api/outlines/batch', json={'ids': [2, '1', 'abc', '9', '2']})
+        data = response.get_json()
+
+        self.assertEqual(response.status_code, 200)
+        mock_get.assert_called_once_with(['2', '1', '9'], include_sections=True, include_content=True)
+        self.assertEqual([item['id'] for item in data['outlines']], ['2', '1'])
+        self.assertEqual(data['outlines'][0]['outline'], [{'title': '开场', 'content': '内容'}])
+        self.assertEqual(data['missing'], ['abc', '9'])
+
+    @patch('src.database.operations.OutlineOperations.get_outlines_by_ids')
+    def test_outline_projection(self, mock_get):
+        """测试字段投影：只要章节标题时不查询章节内容，未请求的字段不返回"""
+        mock_get.return_value = {'1': Outline("提纲一", "1", [OutlineSection("开场")], CREATED, CREATED)}
+        response = self.client.post('/api/outlines/batch', json={'ids': ['1'], 'fields': ['outline.title']})
+
+        mock_get.assert_called_once_with(['1'], include_sections=True, include_content=False)
+        self.assertEqual(response.get_json()['outlines'], [{'id': '1', 'outline': [{'title': '开场'}]}])
+
+        mock_get.reset_mock()
+        self.client.post('/api/outlines/batch', json={'ids': ['1'], 'fields': ['title', 'updated_at']})
+        self.assertFalse(mock_get.call_args.kwargs['include_sections'])
+
+    @patch('src.database.operations.ScriptOperations.get_scripts_by_ids')
+    def test_scripts(self, mock_get):
+        """测试脚本按请求顺序返回，内容损坏的脚本单独报错，只要元数据时不读取内容"""
+        mock_get.return_value = {
+            'o-7': Script("s2", "7", '{"title": "脚本", "sections": [{"content": "正文"}]}', CREATED, 3),
+            's1': Script("s1", "5", '{broken', CREATED),
+        }
+        response = self.client.post('/api/scripts/batch', json={'ids': ['missing', 'o-7', 's1'],
+                                                                 'fields': ['title', 'version']})
+        data = response.get_json()
+        self.assertEqual(data['scripts'], [{'id': 'o-7', 'title': '脚本', 'version': 3},
+                                           {'id': 's1', 'error': '脚本内容格式不正确'}])
+        self.assertEqual(data['missing'], ['missing'])
+
+        mock_get.return_value = {'s1': Script("s1", "5", None, CREATED, 2)}
+        response = self.client.post('/api/scripts/batch', json={'ids': ['s1'], 'fields': ['outline_id', 'version']})
+        self.assertFalse(mock_get.call_args.kwargs['include_content'])
+        self.assertEqual(response.get_json()['scripts'], [{'id': 's1', 'outline_id': '5', 'version': 2}])
+
+
+if __name__ == '__main__':
+    unittest.main()
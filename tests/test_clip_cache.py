@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.video_generator.clip_cache import ClipCache
+
+class TestClipCache(unittest.TestCase):
+    """测试标准化片段缓存"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, "intro.mp4")
+        with open(self.source, 'wb') as f:
+            f.write(b"source clip")
+        self.cache = ClipCache(os.path.join(self.temp_dir, "cache"), max_bytes=250, grace_seconds=0)
+        self.calls = 0
+    
+    def tearDown(self):
+        """测试后清理工作"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _producer(self, size=100):
+        def produce(path):
+            self.calls += 1
+            with open(path, 'wb') as f:
+                f.write(b"x" * size)
+        return produce
+    
+    def test_content_addressed_hit(self):
+        """测试相同内容、不同路径的素材命中同一缓存，转码参数不同则不命中"""
+        copy = os.path.join(self.temp_dir, "copy.mp4")
+        shutil.copy(self.source, copy)
+        first = self.cache.get_or_create(self.cache.key(self.source, "a"), self._producer())
+        second = self.cache.get_or_create(self.cache.key(copy, "a"), self._producer())
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+        self.assertNotEqual(self.cache.key(self.source, "a"), self.cache.key(self.source, "b"))
+    
+    def test_failed_producer_leaves_no_entry(self):
+        """测试转码失败时不留下缓存文件和临时文件"""
+        def fail(path):
+            with open(path, 'wb') as f:
+                f.write(b"partial")
+            raise RuntimeError("ffmpeg failed")
+        key = self.cache.key(self.source, "a")
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_create(key, fail)
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(os.listdir(os.path.dirname(self.cache.path_for(key))), [])
+    
+    def test_lru_eviction_by_bytes(self):
+        """测试超过总字节数上限时淘汰最久未使用的片段"""
+        paths = []
+        self.cache.max_bytes = 1000
+        for index in range(3):
+            paths.append(self.cache.get_or_create(f"{index:02d}key", self._producer()))
+            # 保证修改时间有先后
+            os.utime(paths[-1], (time.time() - 10 + index, time.time() - 10 + index))
+        self.cache.get("00key")
+        self.cache.max_bytes = 250
+        self.cache.evict()
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertLessEqual(self.cache.size(), 250)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import gzip
+import unittest
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from flask import Response
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.app import app
+from src.database.models import Script
+from src.utils.compression import brotli, compress_response, negotiate_encoding
+from src.utils.http_cache import validator_cache
+
+BODY = ('{"content": "' + '内容' * 400 + '"}').encode('utf-8')
+
+
+class TestCompression(unittest.TestCase):
+    """测试响应压缩的编码协商、大小阈值和Vary"""
+
+    def _compress(self, body=BODY, accept='gzip', mimetype='application/json', **kwargs):
+        headers = {'Accept-Encoding': accept} if accept else {}
+        with app.test_request_context(headers=headers) as context:
+            return compress_response(context.request, Response(body, mimetype=mimetype), **kwargs)
+
+    def test_gzip_and_size_floor(self):
+        """测试超过阈值的响应被gzip压缩，小响应原样返回但同样带Vary"""
+        response = self._compress()
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.get_data()), BODY)
+        self.assertIn('Accept-Encoding', response.vary)
+
+        small = self._compress(body=b'{"a": 1}')
+        self.assertNotIn('Content-Encoding', small.headers)
+        self.assertIn('Accept-Encoding', small.vary)
+        self.assertEqual(small.get_data(), b'{"a": 1}')
+        self.assertNotIn('Content-Encoding', self._compress(min_size=len(BODY) + 1).headers)
+
+    def test_negotiation(self):
+        """测试按q值协商编码，未安装brotli时br请求回退到gzip，不接受任何编码时不压缩"""
+        uncompressed = self._compress(accept=None)
+        self.assertNotIn('Content-Encoding', uncompressed.headers)
+        self.assertIn('Accept-Encoding', uncompressed.vary)
+        self.assertNotIn('Content-Encoding', self._compress(accept='gzip;q=0, identity').headers)
+        self.assertNotIn('Content-Encoding', self._compress(mimetype='image/png').headers)
+
+        with patch('src.utils.compression.brotli', None):
+            with app.test_request_context(headers={'Accept-Encoding': 'br, gzip;q=0.5'}) as context:
+                self.assertEqual(negotiate_encoding(context.request), 'gzip')
+            self.assertNotIn('Content-Encoding', self._compress(accept='br').headers)
+
+    @unittest.skipIf(brotli is None, "未安装brotli")
+    def test_brotli(self):
+        """测试客户端优先br且已安装brotli时使用br压缩"""
+        response = self._compress(accept='gzip;q=0.5, br')
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.get_data()), BODY)
+
+    @patch('src.database.operations.ScriptOperations.get_script')
+    def test_raw_script_passthrough(self, mock_get):
+        """测试raw=1原样返回存储的JSON，压缩后解压与存储内容逐字节一致"""
+        validator_cache.clear()
+        content = '{"sections": [{"title": "开场", "content": "' + '内容' * 400 + '"}], "b": 1,  "a": 2}'
+        mock_get.return_value = Script("s1", "7", content, created_at=datetime(2024, 1, 1, 12))
+        client = app.test_client()
+
+        response = client.get('/api/script/s1?raw=1', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.get_data()).decode('utf-8'), content)
+        self.assertEqual(response.headers['X-Outline-Id'], '7')
+        self.assertIn('Accept-Encoding', response.vary)
+
+        formatted = client.get('/api/script/s1')
+        self.assertNotEqual(formatted.headers['ETag'], response.headers['ETag'])
+        self.assertEqual(formatted.get_json()['outline_id'], '7')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.video_generator.contact_video import stream_signature, concat_list_line, _target_signature
+
+def _probe(width=1920, height=1080, fps='30/1', audio=True):
+    """构造ffprobe结果"""
+    streams = [{'codec_type': 'video', 'codec_name': 'h264', 'profile': 'High', 'width': width,
+                'height': height, 'pix_fmt': 'yuv420p', 'r_frame_rate': fps, 'time_base': '1/15360'}]
+    if audio:
+        streams.append({'codec_type': 'audio', 'codec_name': 'aac', 'sample_rate': '48000', 'channels': 2})
+    return {'streams': streams}
+
+class TestContactVideo(unittest.TestCase):
+    """测试视频拼接前的兼容性判断"""
+    
+    def test_compatible_clip(self):
+        """测试符合目标格式的片段可以直接拼接"""
+        self.assertEqual(stream_signature(_probe()), _target_signature())
+    
+    def test_incompatible_clips(self):
+        """测试分辨率、帧率不同或缺少音轨的片段需要标准化"""
+        self.assertNotEqual(stream_signature(_probe(width=1280, height=720)), _target_signature())
+        self.assertNotEqual(stream_signature(_probe(fps='30000/1001')), _target_signature())
+        self.assertIsNone(stream_signature(_probe(audio=False)))
+    
+    def test_concat_list_escaping(self):
+        """测试列表文件中的路径转义"""
+        self.assertEqual(concat_list_line("/tmp/it's.mp4"), "file '/tmp/it'\\''s.mp4'\n")
+
+if __name__ == '__main__':
+    unittest.main()
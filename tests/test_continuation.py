@@ -0,0 +1,112 @@
+import threading
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.script_generator.continuation import (ContinuationEngine, CONTINUATION_INSTRUCTIONS, merge_continuation,
+                                               written_summary)
+from src.script_generator.video_script import VideoScriptGenerator, SCRIPT_PART_INSTRUCTIONS
+
+
+class ScriptedClient:
+    """按顺序返回预设响应的API客户端，记录每次请求"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, params=None, on_delta=None, prefix=(), task=None):
+        with self._lock:
+            self.requests.append({"prompt": prompt, "params": params, "prefix": tuple(prefix), "task": task})
+            content, finish_reason = self.responses.pop(0) if self.responses else ("", "stop")
+        if on_delta is not None:
+            on_delta(content)
+        return {"content": content, "finish_reason": finish_reason,
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(content)}}
+
+
+class SectionClient:
+    """按提示词中指定的章节返回对应内容"""
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, params=None, on_delta=None, prefix=(), task=None):
+        with self._lock:
+            self.requests.append({"prompt": prompt, "params": params, "prefix": tuple(prefix)})
+        index = prompt.rsplit("本次撰写第", 1)[1].split("个章节", 1)[0]
+        return {"content": f"# 第{index}部分\n第{index}部分的脚本内容。", "finish_reason": "stop"}
+
+
+class TestContinuation(unittest.TestCase):
+    """测试输出被截断后的续写与按章节并行生成"""
+
+    def test_merge_continuation(self):
+        """测试去掉续写开头与已写内容结尾重复的部分"""
+        previous = "第一段内容。\n第二段讲到一半"
+        self.assertEqual(merge_continuation(previous, "第二段讲到一半，然后继续。"),
+                         "第一段内容。\n第二段讲到一半，然后继续。")
+        # 重叠太短时视为巧合，原样拼接
+        self.assertEqual(merge_continuation("结尾是一半", "一半的内容"), "结尾是一半一半的内容")
+        self.assertEqual(written_summary("第一句。第二句。\n\n另一段。后面的话"), "第一句。\n另一段。")
+
+    def test_continues_until_complete(self):
+        """测试finish_reason为length时续写，续写请求携带已写内容结尾并追加续写说明"""
+        client = ScriptedClient([("开场白。\n第一章讲到了", "length"), ("第一章讲到了这里，然后结束。", "stop")])
+        result = ContinuationEngine(client, tail_chars=8).generate("写脚本", params={"max_tokens": 100},
+                                                                  prefix=("任务说明",))
+
+        self.assertEqual(result["content"], "开场白。\n第一章讲到了这里，然后结束。")
+        self.assertEqual(result["continuations"], 1)
+        self.assertFalse(result["truncated"])
+        self.assertEqual(result["usage"]["prompt_tokens"], 20)
+        self.assertEqual(client.requests[1]["prefix"], ("任务说明", CONTINUATION_INSTRUCTIONS))
+        self.assertTrue(client.requests[1]["prompt"].startswith("写脚本"))
+        self.assertIn("已写内容概要：\n开场白", client.requests[1]["prompt"])
+        self.assertTrue(client.requests[1]["prompt"].endswith("。\n第一章讲到了"))
+
+    def test_continuation_deltas_match_content(self):
+        """测试续写只推送去掉重复部分后的新增内容，按顺序拼接的增量与最终内容一致"""
+        client = ScriptedClient([("开场白。\n第一章讲到了", "length"), ("第一章讲到了这里，然后结束。", "stop")])
+        deltas = []
+        result = ContinuationEngine(client, tail_chars=8).generate("写脚本", on_delta=deltas.append)
+
+        self.assertEqual(deltas, ["开场白。\n第一章讲到了", "这里，然后结束。"])
+        self.assertEqual("".join(deltas), result["content"])
+
+    def test_gives_up_after_limit(self):
+        """测试达到续写次数上限后返回已生成内容并标记truncated"""
+        client = ScriptedClient([("第一部分内容", "length")] * 5)
+        result = ContinuationEngine(client, max_continuations=2).generate("写脚本")
+
+        self.assertEqual(len(client.requests), 3)
+        self.assertEqual(result["continuations"], 2)
+        self.assertTrue(result["truncated"])
+
+        generator = VideoScriptGenerator(ScriptedClient([("# 开场\n内容", "length")]))
+        generator.continuation.max_continuations = 0
+        script = generator.generate_script("标题", {"sections": [{"title": "1. 开场", "content": "引出问题"}]})
+        self.assertTrue(script["truncated"])
+        self.assertEqual(script["budget"]["mode"], "single")
+
+    def test_long_outline_by_section(self):
+        """测试章节过多时按章节并行生成并按顺序拼接"""
+        client = SectionClient()
+        generator = VideoScriptGenerator(client)
+        sections = [{"title": f"{i}. 第{i}章", "content": f"第{i}章的描述"} for i in range(1, 16)]
+        script = generator.generate_script("标题", {"sections": sections})
+
+        self.assertEqual(len(client.requests), 15)
+        self.assertEqual(script["budget"]["mode"], "sections")
+        self.assertTrue(all(request["prefix"][-1] == SCRIPT_PART_INSTRUCTIONS for request in client.requests))
+        positions = [script["raw_content"].index(f"# 第{i}部分\n") for i in range(1, 16)]
+        self.assertEqual(positions, sorted(positions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.app import app
+from src.database.models import Outline, OutlineSection
+from src.utils.http_cache import ValidatorCache, validator_cache
+
+class TestHTTPCache(unittest.TestCase):
+    """测试ETag、条件请求和响应压缩"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        validator_cache.clear()
+        self.client = app.test_client()
+        self.outline = Outline(
+            title="测试提纲",
+            outline_id="1",
+            sections=[OutlineSection(title="开场", content="内容" * 400)],
+            created_at=datetime(2024, 1, 1, 12),
+            updated_at=datetime(2024, 1, 1, 12)
+        )
+    
+    def test_validator_cache_lru_and_ttl(self):
+        """测试校验值缓存的容量和过期"""
+        cache = ValidatorCache(max_entries=2, ttl=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        
+        expired = ValidatorCache(ttl=-1)
+        expired.set("a", "1")
+        self.assertIsNone(expired.get("a"))
+    
+    @patch('src.database.operations.OutlineOperations.get_outline_by_id')
+    def test_outline_not_modified_without_db(self, mock_get):
+        """测试ETag匹配时直接返回304且不访问数据库"""
+        mock_get.return_value = self.outline
+        first = self.client.get('/api/outline/1')
+        etag = first.headers['ETag']
+        self.assertEqual(first.headers['Cache-Control'], 'private, no-cache')
+        
+        second = self.client.get('/api/outline/1', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['ETag'], etag)
+        self.assertEqual(mock_get.call_count, 1)
+        
+        # 缓存失效后重新查询数据库，内容未变仍返回304
+        validator_cache.invalidate("outline:1")
+        third = self.client.get('/api/outline/1', headers={'If-None-Match': etag})
+        self.assertEqual(third.status_code, 304)
+        self.assertEqual(mock_get.call_count, 2)
+    
+    @patch('src.database.operations.OutlineOperations.get_outline_by_id')
+    def test_compressed_etag_revalidates(self, mock_get):
+        """测试压缩响应的ETag带编码后缀且可用于条件请求"""
+        mock_get.return_value = self.outline
+        first = self.client.get('/api/outline/1', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(first.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(first.headers['ETag'].endswith('-gzip"'))
+        
+        second = self.client.get('/api/outline/1', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+    
+    def test_templates_etag(self):
+        """测试模板列表的ETag和缓存策略"""
+        first = self.client.get('/api/templates')
+        self.assertEqual(first.headers['Cache-Control'], 'public, max-age=60')
+        second = self.client.get('/api/templates', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+    def test_missing_template_not_modified(self):
+        """测试模板不存在时返回404，即使If-None-Match为*或不存在文件的ETag"""
+        from src.utils.http_cache import files_etag
+        for tag in ('*', f'"{files_etag([])}"'):
+            response = self.client.get('/api/templates/no_such_template', headers={'If-None-Match': tag})
+            self.assertEqual(response.status_code, 404, tag)
+
+if __name__ == '__main__':
+    unittest.main()
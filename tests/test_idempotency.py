@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.idempotency import (IdempotencyStore, SharedIdempotencyStore, StoredResponse,
+                                   request_fingerprint, NEW, REPLAY, IN_PROGRESS, MISMATCH)
+
+class TestIdempotency(unittest.TestCase):
+    """测试Idempotency-Key记录的占用、重放和释放"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.fingerprint = request_fingerprint('POST', '/api/outline/save?', b'{"title": "t"}')
+    
+    def tearDown(self):
+        """测试后清理工作"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _check_store(self, store):
+        self.assertEqual(store.reserve("k", self.fingerprint), (NEW, None))
+        self.assertEqual(store.reserve("k", self.fingerprint)[0], IN_PROGRESS)
+        self.assertEqual(store.reserve("k", "other")[0], MISMATCH)
+        
+        store.complete("k", StoredResponse(200, 'application/json', b'{"outline_id": "1"}'))
+        state, stored = store.reserve("k", self.fingerprint)
+        self.assertEqual(state, REPLAY)
+        self.assertEqual((stored.status, stored.body), (200, b'{"outline_id": "1"}'))
+        
+        # 释放后同一Key可以重新执行
+        store.reserve("failed", self.fingerprint)
+        store.release("failed")
+        self.assertEqual(store.reserve("failed", self.fingerprint)[0], NEW)
+    
+    def test_memory_store(self):
+        """测试进程内存储"""
+        self._check_store(IdempotencyStore())
+    
+    def test_shared_store(self):
+        """测试SQLite共享存储"""
+        self._check_store(SharedIdempotencyStore(os.path.join(self.temp_dir, "idempotency.db")))
+    
+    def test_expired_entry(self):
+        """测试过期记录不再重放"""
+        store = IdempotencyStore(ttl=-1)
+        store.reserve("k", self.fingerprint)
+        store.complete("k", StoredResponse(200, 'application/json', b'{}'))
+        self.assertEqual(store.reserve("k", self.fingerprint)[0], NEW)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import unittest
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.app import app
+from src.utils import json_provider
+from src.utils.json_provider import FastJSONProvider
+
+CREATED = datetime(2024, 1, 1, 12, 30, 0)
+
+
+class TestJSONProvider(unittest.TestCase):
+    """测试orjson提供器与标准库回退的输出一致"""
+
+    def setUp(self):
+        self.provider = FastJSONProvider(app)
+
+    def _both(self, func):
+        """分别在使用orjson(已安装时)和回退到标准库时调用"""
+        results = [func()]
+        with patch('src.utils.json_provider.orjson', None):
+            results.append(func())
+        return results
+
+    def test_datetime_formats(self):
+        """测试日期时间默认为HTTP日期格式，可切换为ISO 8601"""
+        data = {'created_at': CREATED, 'day': date(2024, 1, 2)}
+        for output in self._both(lambda: self.provider.dumps(data)):
+            self.assertEqual(json.loads(output), {'created_at': 'Mon, 01 Jan 2024 12:30:00 GMT',
+                                                  'day': 'Tue, 02 Jan 2024 00:00:00 GMT'})
+
+        with patch('src.utils.json_provider.JSON_DATETIME_FORMAT', 'iso'):
+            for output in self._both(lambda: json_provider.dumps({'created_at': CREATED})):
+                self.assertEqual(json.loads(output), {'created_at': '2024-01-01T12:30:00'})
+
+    def test_non_ascii_and_sort_keys(self):
+        """测试中文不转义，sort_keys和非字符串键与标准库行为一致"""
+        data = {'title': '测试提纲', 'b': 1, 'a': [1, 2]}
+        for output in self._both(lambda: self.provider.dumps(data, sort_keys=True)):
+            self.assertIn('测试提纲', output)
+            self.assertLess(output.index('"a"'), output.index('"b"'))
+        for output in self._both(lambda: json_provider.dumps({'title': '提纲'})):
+            self.assertIn('提纲', output)
+        self.assertEqual(json.loads(self.provider.dumps({1: 'x'})), {'1': 'x'})
+
+    def test_loads_and_errors(self):
+        """测试解析字符串和字节，解析错误统一为JSONDecodeError"""
+        self.assertEqual(json_provider.loads('{"标题": 1}'), {'标题': 1})
+        self.assertEqual(json_provider.loads('{"a": [1]}'.encode('utf-8')), {'a': [1]})
+        with self.assertRaises(json_provider.JSONDecodeError):
+            json_provider.loads('{bad')
+        with self.assertRaises(ValueError):
+            json_provider.loads('{bad')
+
+    def test_app_response(self):
+        """测试应用使用该提供器，jsonify的响应保留中文"""
+        self.assertIsInstance(app.json, FastJSONProvider)
+        with app.test_request_context():
+            response = app.json.response({'title': '测试', 'created_at': CREATED})
+        self.assertIn('测试'.encode('utf-8'), response.get_data())
+        self.assertEqual(response.mimetype, 'application/json')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.logger import setup_logger, Lazy, lazy_json, AsyncQueueHandler, JsonFormatter, LOG_RECORDS_DROPPED
+
+class TestLogger(unittest.TestCase):
+    """测试异步日志管道"""
+    
+    def test_setup_idempotent(self):
+        """测试重复调用不会叠加处理器，日志由后台线程写入文件"""
+        with tempfile.TemporaryDirectory() as log_dir:
+            log_file = os.path.join(log_dir, "test.log")
+            logger = setup_logger("test_logger_setup", log_file)
+            setup_logger("test_logger_setup", log_file)
+            self.assertEqual(len(logger.handlers), 1)
+            
+            logger.info("写入文件")
+            for _ in range(50):
+                if os.path.exists(log_file) and "写入文件" in Path(log_file).read_text(encoding="utf-8"):
+                    break
+                time.sleep(0.05)
+            self.assertIn("写入文件", Path(log_file).read_text(encoding="utf-8"))
+            logger.removeHandler(logger.handlers[0])
+    
+    def test_lazy_formatting(self):
+        """测试级别未启用时不序列化大对象，启用时截断"""
+        calls = []
+        
+        class Payload:
+            def __str__(self):
+                calls.append(1)
+                return "x" * 5000
+        
+        logger = logging.getLogger("test_logger_lazy")
+        log_queue = queue.Queue(maxsize=10)
+        logger.addHandler(AsyncQueueHandler(log_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        
+        logger.debug("请求参数: %s", lazy_json(Payload()))
+        self.assertEqual(calls, [])
+        self.assertTrue(log_queue.empty())
+        
+        logger.info("请求参数: %s", lazy_json({"prompt": "提" * 5000}, limit=100))
+        message = log_queue.get_nowait().getMessage()
+        self.assertTrue(message.endswith("字符)"))
+        self.assertLess(len(message), 200)
+    
+    def test_overload_policy(self):
+        """测试过载时抽样丢弃INFO，WARNING使用剩余容量"""
+        log_queue = queue.Queue(maxsize=10)
+        handler = AsyncQueueHandler(log_queue, overload_threshold=0.5, sample_rate=0)
+        dropped = LOG_RECORDS_DROPPED.labels("INFO", "sampled").get()
+        
+        def record(level):
+            return logging.LogRecord("test", level, __file__, 0, "消息", None, None)
+        
+        for _ in range(8):
+            handler.handle(record(logging.INFO))
+        self.assertEqual(log_queue.qsize(), 5)
+        self.assertEqual(LOG_RECORDS_DROPPED.labels("INFO", "sampled").get() - dropped, 3)
+        
+        # 第一条WARNING入队后补记一条丢弃汇总
+        for _ in range(3):
+            handler.handle(record(logging.WARNING))
+        self.assertEqual(log_queue.qsize(), 9)
+        messages = [log_queue.get_nowait().getMessage() for _ in range(9)]
+        self.assertIn("日志队列过载，已丢弃 3 条日志", messages)
+    
+    def test_dropped_records_not_formatted(self):
+        """测试抽样或队列满丢弃的日志不对Lazy参数求值"""
+        calls = []
+        log_queue = queue.Queue(maxsize=4)
+        logger = logging.getLogger("test_logger_dropped")
+        logger.addHandler(AsyncQueueHandler(log_queue, overload_threshold=0.5, sample_rate=0))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        payload = Lazy(lambda: calls.append(1) or "内容")
+        
+        for _ in range(4):
+            logger.info("请求参数: %s", payload)
+        self.assertEqual((log_queue.qsize(), len(calls)), (2, 2))
+        
+        # 第一条WARNING和丢弃汇总填满队列，之后的WARNING直接丢弃
+        for _ in range(3):
+            logger.warning("请求参数: %s", payload)
+        self.assertEqual((log_queue.qsize(), len(calls)), (4, 3))
+    
+    def test_json_formatter(self):
+        """测试JSON格式包含extra字段和异常"""
+        try:
+            raise ValueError("失败")
+        except ValueError:
+            record = logging.LogRecord("test", logging.ERROR, __file__, 0, "出错: %s", ("原因",), sys.exc_info())
+        record.job_id = "abc"
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "出错: 原因")
+        self.assertEqual(entry["job_id"], "abc")
+        self.assertIn("ValueError", entry["exc_info"])
+
+if __name__ == '__main__':
+    unittest.main()
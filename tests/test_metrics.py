@@ -0,0 +1,99 @@
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.metrics import MetricsRegistry, timed_operation, mark_failed
+
+class TestMetrics(unittest.TestCase):
+    """测试指标采集功能"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.registry = MetricsRegistry()
+    
+    def test_counter_with_labels(self):
+        """测试带标签的计数器"""
+        counter = self.registry.counter("test_total", "测试计数", ("route",))
+        counter.labels("/a").inc()
+        counter.labels("/a").inc(2)
+        counter.labels("/b").inc()
+        
+        output = self.registry.render()
+        self.assertIn('test_total{route="/a"} 3', output)
+        self.assertIn('test_total{route="/b"} 1', output)
+        self.assertIn("# TYPE test_total counter", output)
+    
+    def test_registry_returns_existing_metric(self):
+        """测试重复注册返回同一指标"""
+        first = self.registry.counter("dup_total", "测试")
+        second = self.registry.counter("dup_total", "测试")
+        self.assertIs(first, second)
+        with self.assertRaises(ValueError):
+            self.registry.gauge("dup_total", "测试")
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """测试直方图分桶为累计值"""
+        histogram = self.registry.histogram("latency_seconds", "测试耗时", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 5.0):
+            histogram.observe(value)
+        
+        output = self.registry.render()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', output)
+        self.assertIn('latency_seconds_bucket{le="1"} 3', output)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', output)
+        self.assertIn('latency_seconds_count 4', output)
+        self.assertIn('latency_seconds_sum 6.25', output)
+    
+    def test_gauge_callback(self):
+        """测试回调型仪表盘在采集时求值"""
+        gauge = self.registry.gauge("pool_in_use", "测试")
+        state = {"value": 1}
+        gauge.set_function(lambda: state["value"])
+        state["value"] = 4
+        self.assertIn("pool_in_use 4", self.registry.render())
+    
+    def test_timed_operation(self):
+        """测试耗时装饰器区分成功和失败"""
+        histogram = self.registry.histogram("op_seconds", "测试", ("operation", "outcome"))
+        
+        @timed_operation(histogram, name="op")
+        def operation(should_fail):
+            if should_fail:
+                raise RuntimeError("失败")
+            return "ok"
+        
+        self.assertEqual(operation(False), "ok")
+        with self.assertRaises(RuntimeError):
+            operation(True)
+        
+        output = self.registry.render()
+        self.assertIn('op_seconds_count{operation="op",outcome="ok"} 1', output)
+        self.assertIn('op_seconds_count{operation="op",outcome="error"} 1', output)
+
+    def test_timed_operation_mark_failed(self):
+        """测试内部捕获异常并调用mark_failed的操作记为失败，不影响外层操作"""
+        histogram = self.registry.histogram("handled_seconds", "测试", ("operation", "outcome"))
+        
+        @timed_operation(histogram, name="inner")
+        def inner():
+            try:
+                raise RuntimeError("失败")
+            except RuntimeError:
+                mark_failed()
+                return None
+        
+        @timed_operation(histogram, name="outer")
+        def outer():
+            return inner()
+        
+        self.assertIsNone(outer())
+        mark_failed()
+        output = self.registry.render()
+        self.assertIn('handled_seconds_count{operation="inner",outcome="error"} 1', output)
+        self.assertIn('handled_seconds_count{operation="outer",outcome="ok"} 1', output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.mock_llm_server import MockLLMServer, MockConfig, LatencyDistribution
+from src.script_generator.model_router import ModelRouter
+
+
+class TestModelRouter(unittest.TestCase):
+    """测试多端点模型路由，使用本地模拟LLM服务作为端点"""
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def start_server(self, **config):
+        server = MockLLMServer(config=MockConfig(seed=1, **config)).start()
+        self.servers.append(server)
+        return server
+
+    def make_router(self, servers, routes=None, aliases=None):
+        endpoints = [{"name": name, "base_url": server.base_url, "model": f"{name}-model",
+                      "aliases": (aliases or {}).get(name, [])}
+                     for name, server in servers.items()]
+        return ModelRouter.from_config(json.dumps(endpoints), json.dumps(routes or {}))
+
+    def test_fallback_on_error(self):
+        """测试端点失败时自动切换，之后优先使用健康端点"""
+        broken = self.start_server(error_rate=1.0)
+        healthy = self.start_server()
+        router = self.make_router({"broken": broken, "healthy": healthy})
+
+        for _ in range(3):
+            self.assertTrue(router.generate_content("测试")["content"])
+        self.assertEqual(broken.request_count, 1)
+        self.assertEqual(healthy.request_count, 3)
+        status = {item["name"]: item for item in router.status()}
+        self.assertGreater(status["broken"]["error_rate"], 0)
+        self.assertIsNotNone(status["healthy"]["latency"])
+
+    def test_prefers_faster_endpoint(self):
+        """测试每个端点先各尝试一次，之后选择延迟更低的端点"""
+        slow = self.start_server(latency=LatencyDistribution("fixed", 0.2))
+        fast = self.start_server()
+        router = self.make_router({"slow": slow, "fast": fast})
+
+        for _ in range(4):
+            router.generate_content("测试")
+        self.assertEqual(slow.request_count, 1)
+        self.assertEqual(fast.request_count, 3)
+
+    def test_routes_by_task_and_model(self):
+        """测试按任务类型和模板指定的模型选择端点"""
+        first = self.start_server()
+        second = self.start_server()
+        router = self.make_router({"first": first, "second": second},
+                                  routes={"script": ["second"], "custom": ["first"]},
+                                  aliases={"second": ["deepseek-chat"]})
+
+        router.generate_content("测试", task="script")
+        router.generate_content("测试", task="template:ad_copy")
+        router.generate_content("测试", params={"model": "deepseek-chat"}, task="template:ad_copy")
+        self.assertEqual((first.request_count, second.request_count), (1, 2))
+
+        # 没有端点提供的模型按任务类型路由
+        router.generate_content("测试", params={"model": "unknown"}, task="template:ad_copy")
+        self.assertEqual(first.request_count, 2)
+
+        with self.assertRaises(ValueError):
+            self.make_router({"first": first}, routes={"script": ["missing"]})
+
+    def test_all_endpoints_fail(self):
+        """测试所有端点都失败时抛出错误，429的Retry-After和连续失败都会暂停端点"""
+        limited = self.start_server(rate_limit_rate=1.0, retry_after=60)
+        broken = self.start_server(error_rate=1.0)
+        router = self.make_router({"limited": limited, "broken": broken})
+
+        with self.assertRaises(Exception):
+            router.generate_content("测试")
+        status = {item["name"]: item for item in router.status()}
+        self.assertFalse(status["limited"]["available"])
+        self.assertTrue(status["broken"]["available"])
+
+        # 所有端点都暂停时仍然按得分尝试
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                router.generate_content("测试")
+        status = {item["name"]: item for item in router.status()}
+        self.assertFalse(status["broken"]["available"])
+        self.assertEqual(limited.request_count, 3)
+        self.assertEqual(broken.request_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import unittest
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.database.models import Outline, OutlineSection, Script, RowMapper
+from src.database.operations import OutlineOperations, ScriptOperations
+
+CREATED = datetime(2024, 6, 1, 12, 0, 0)
+
+
+class FakeCursor:
+    """按执行顺序返回预设结果的元组游标，记录执行的SQL"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.queries = []
+        self.params = []
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+        self.params.append(params)
+        self.rows = iter(self.results.pop(0))
+
+    def fetchone(self):
+        return next(self.rows, None)
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return self.rows
+
+
+def fake_connection(*results):
+    cursor = FakeCursor(results)
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+class TestModels(unittest.TestCase):
+    """测试slots模型和元组行映射"""
+
+    def test_row_mapper(self):
+        """测试按列名映射属性，未查询的属性使用默认值"""
+        mapper = RowMapper(Outline, ("CAST(o.id AS CHAR) AS id", "o.title", "o.created_at"))
+        self.assertEqual(mapper.names, ("id", "title", "created_at"))
+        first, second = mapper.map_all([("1", "标题一", CREATED), ("2", "标题二", CREATED)])
+        self.assertEqual((first.outline_id, first.title, first.created_at), ("1", "标题一", CREATED))
+        self.assertIsInstance(first.updated_at, datetime)
+        first.sections.append(OutlineSection("章节"))
+        self.assertEqual(second.sections, [])
+        self.assertFalse(hasattr(first, "__dict__"))
+
+        script = RowMapper(Script, ("id", "outline_id", "created_at")).map(("s1", 1, CREATED))
+        self.assertIsNone(script.content)
+        self.assertEqual(script.version, 1)
+        with self.assertRaises(ValueError):
+            RowMapper(Script, ("id", "missing"))
+
+    def test_outlines_by_ids(self):
+        """测试批量查询的章节按提纲分组，查询使用明确的列"""
+        conn, cursor = fake_connection(
+            [("1", "提纲一", CREATED, CREATED), ("2", "提纲二", CREATED, CREATED)],
+            [(1, 10, "开场", "引出问题"), (1, 11, "总结", "回顾"), (2, 20, "开场", None)])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            outlines = OutlineOperations.get_outlines_by_ids(["1", "2"])
+
+        self.assertEqual([s.section_id for s in outlines["1"].sections], [10, 11])
+        self.assertEqual(outlines["2"].sections[0].title, "开场")
+        self.assertTrue(all("SELECT *" not in query for query in cursor.queries))
+        conn.close.assert_called_once()
+
+    def test_outlines_by_ids_without_sections(self):
+        """测试不需要章节时只查询主表，不存在的ID不在结果中"""
+        conn, cursor = fake_connection([("2", "提纲二", CREATED, CREATED)])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            outlines = OutlineOperations.get_outlines_by_ids(["2", "9"], include_sections=False)
+
+        self.assertEqual(list(outlines), ["2"])
+        self.assertEqual(outlines["2"].sections, [])
+        self.assertEqual(len(cursor.queries), 1)
+        self.assertEqual(OutlineOperations.get_outlines_by_ids([]), {})
+
+    def test_scripts_by_ids(self):
+        """测试先按脚本ID匹配，其次按提纲ID匹配该提纲的最新脚本，只有数字ID作为提纲ID查询"""
+        conn, cursor = fake_connection([
+            ("s3", 7, "{}", CREATED, 2),
+            ("s1", 5, "{}", CREATED, 1),
+            ("s2", 7, "{}", CREATED, 1),
+        ])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            scripts = ScriptOperations.get_scripts_by_ids(["7", "s2", "5", "missing"])
+
+        self.assertEqual({key: script.script_id for key, script in scripts.items()},
+                         {"7": "s3", "s2": "s2", "5": "s1"})
+        self.assertIn("ORDER BY latest.created_at DESC", cursor.queries[0])
+        self.assertEqual(cursor.params[0], ("7", "s2", "5", "missing", 7, 5))
+        conn.close.assert_called_once()
+
+        conn, cursor = fake_connection([])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            self.assertEqual(ScriptOperations.get_scripts_by_ids(["s9"]), {})
+        self.assertNotIn("outline_id IN", cursor.queries[0])
+        self.assertEqual(cursor.params[0], ("s9",))
+
+    def test_create_outline_dedupe_window(self):
+        """测试只在时间窗口内的相同提纲返回已有ID，检查和插入期间持有命名锁"""
+        outline = Outline("提纲", sections=[OutlineSection("开场", "内容")])
+        conn, cursor = fake_connection([(1,)], [(12,)], [(1,)])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            self.assertEqual(OutlineOperations.create_outline(outline), "12")
+        self.assertIn("GET_LOCK", cursor.queries[0])
+        self.assertIn("created_at >= %s", cursor.queries[1])
+        self.assertIn("RELEASE_LOCK", cursor.queries[-1])
+        self.assertFalse(any("INSERT" in query for query in cursor.queries))
+
+        conn, cursor = fake_connection([], [])
+        cursor.lastrowid = 13
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            self.assertEqual(OutlineOperations.create_outline(outline, dedupe_window=0), "13")
+        self.assertEqual(len(cursor.queries), 2)
+        self.assertTrue(all("LOCK" not in query for query in cursor.queries))
+        conn.commit.assert_called_once()
+
+    def test_first_script_version_without_history(self):
+        """测试第一个版本只写入scripts表，未写历史时版本列表和版本查询从scripts表读取"""
+        script = Script("s1", "7", '{"sections": []}', created_at=CREATED)
+        conn, cursor = fake_connection([], [])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            self.assertEqual(ScriptOperations.save_script_version(script), 1)
+        self.assertEqual(len(cursor.queries), 2)
+        self.assertTrue(all("script_versions" not in query for query in cursor.queries))
+        conn.commit.assert_called_once()
+
+        conn, cursor = fake_connection([], [("s1", 7, '{"sections": []}', CREATED, 1)])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            self.assertEqual(ScriptOperations.get_script_version("7", 1).script_id, "s1")
+        self.assertIn("FROM scripts", cursor.queries[1])
+
+        conn, _ = fake_connection([], [("s1", 7, '{"sections": []}', CREATED, 1)])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            self.assertIsNone(ScriptOperations.get_script_version("7", 2))
+
+    def test_list_ids_as_strings(self):
+        """测试列表查询的ID由SQL转换为字符串，结果为字典列表"""
+        conn, cursor = fake_connection([(2,)], [("12", "提纲", CREATED, CREATED)])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            result = OutlineOperations.get_outline_list(1, 10)
+
+        self.assertEqual(result["total"], 2)
+        self.assertEqual(result["data"], [{"id": "12", "title": "提纲", "created_at": CREATED, "updated_at": CREATED}])
+        self.assertIn("CAST(id AS CHAR)", cursor.queries[1])
+
+    def test_iter_outlines(self):
+        """测试逐行组装提纲，提前停止时读完剩余结果再归还连接"""
+        conn, _ = fake_connection([
+            ("1", "提纲一", CREATED, CREATED, 10, "开场", "引出问题"),
+            ("1", "提纲一", CREATED, CREATED, 11, "总结", "回顾"),
+            ("2", "提纲二", CREATED, CREATED, None, None, None),
+            ("3", "提纲三", CREATED, CREATED, 30, "开场", "内容"),
+        ])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            outlines = list(OutlineOperations.iter_outlines())
+        self.assertEqual([(o.outline_id, len(o.sections)) for o in outlines], [("1", 2), ("2", 0), ("3", 1)])
+
+        conn, cursor = fake_connection([("s1", 1, "{}", CREATED, 1), ("s2", 2, "{}", CREATED, 3)])
+        with patch("src.database.operations.db_config.get_connection", return_value=conn):
+            scripts = ScriptOperations.iter_scripts()
+            self.assertEqual(next(scripts).script_id, "s1")
+            scripts.close()
+        # 每个提纲只读取最新的一行脚本
+        self.assertIn("ORDER BY latest.created_at DESC", cursor.queries[0])
+        self.assertIn("LIMIT 1", cursor.queries[0])
+        conn.consume_results.assert_called_once()
+        conn.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
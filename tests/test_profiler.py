@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.app import app
+from src.utils.profiler import RuntimeProfiler
+
+ADMIN = {'X-Admin-Token': 'test-token'}
+
+
+class TestProfiler(unittest.TestCase):
+    """测试单请求性能分析和运行时采样分析器的管理接口"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.profiler = RuntimeProfiler(self.temp_dir.name, interval_ms=10, flush_seconds=60)
+        patchers = [patch('src.api.app.ADMIN_TOKEN', 'test-token'),
+                    patch('src.api.app.runtime_profiler', self.profiler)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.profiler.stop()
+        self.temp_dir.cleanup()
+
+    def test_request_profile(self):
+        """测试管理员请求的响应被替换为分析结果，非管理员请求不受影响"""
+        response = self.client.get('/api/health?profile=1&profile_sort=tottime', headers=ADMIN)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertEqual(response.headers['X-Profiled-Status'], '200')
+        self.assertIn('function calls', response.get_data(as_text=True))
+
+        response = self.client.get('/api/health?profile=1&profile_format=collapsed', headers=ADMIN)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Profiled-Duration-Ms', response.headers)
+
+        response = self.client.get('/api/health?profile=1')
+        self.assertEqual(response.get_json()['status'], 'ok')
+
+    def test_request_profile_bad_params(self):
+        """测试不支持的分析格式和排序字段返回400"""
+        for query in ('profile_sort=bogus', 'profile_format=bogus'):
+            response = self.client.get(f'/api/health?profile=1&{query}', headers=ADMIN)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.get_json())
+
+    def test_runtime_profiler_toggle(self):
+        """测试开关运行时分析器，非管理员无权访问"""
+        self.assertEqual(self.client.get('/api/admin/profiler').status_code, 403)
+
+        response = self.client.post('/api/admin/profiler', headers=ADMIN,
+                                    json={'enabled': True, 'interval_ms': 5, 'flush_seconds': 30})
+        self.assertTrue(response.get_json()['enabled'])
+        self.assertEqual((self.profiler.interval_ms, self.profiler.flush_seconds), (5, 30))
+
+        response = self.client.post('/api/admin/profiler', headers=ADMIN, json={'enabled': False})
+        self.assertFalse(response.get_json()['enabled'])
+
+    def test_runtime_profiler_bad_input(self):
+        """测试非正数的采样参数返回400且不修改配置，之后仍可正常开启"""
+        for body in ({'interval_ms': '5'}, {'interval_ms': 0}, {'interval_ms': -1},
+                     {'flush_seconds': True}, {'flush_seconds': [1]}):
+            response = self.client.post('/api/admin/profiler', headers=ADMIN, json={'enabled': True, **body})
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(self.profiler.enabled)
+        self.assertEqual((self.profiler.interval_ms, self.profiler.flush_seconds), (10, 60))
+
+        response = self.client.post('/api/admin/profiler', headers=ADMIN, json={'enabled': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()['enabled'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import threading
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.progress import ProgressBroker, bind_job, unbind_job, report, token_reporter, flush_deltas
+
+class TestProgress(unittest.TestCase):
+    """测试生成进度事件的发布和订阅"""
+
+    def setUp(self):
+        """测试前准备工作"""
+        self.broker = ProgressBroker()
+
+    def test_multiple_subscribers(self):
+        """测试多个订阅者都能按序收到全部事件"""
+        results = {}
+
+        def subscribe(name):
+            results[name] = "".join(self.broker.stream("job", heartbeat=0.05))
+
+        threads = [threading.Thread(target=subscribe, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        job = self.broker.get_or_create("job")
+        job.publish("prompt_built", {'prompt_chars': 10})
+        job.publish("completed", {'status': 200})
+        for thread in threads:
+            thread.join(2)
+
+        self.assertEqual(len(results), 3)
+        for output in results.values():
+            self.assertIn("event: prompt_built", output)
+            self.assertTrue(output.rstrip().endswith('"status": 200}'))
+
+    def test_heartbeat_and_resume(self):
+        """测试空闲时发送心跳，重连时从Last-Event-ID之后补发"""
+        job = self.broker.get_or_create("job")
+        stream = self.broker.stream("job", heartbeat=0.01)
+        next(stream)
+        self.assertEqual(next(stream), ": heartbeat\n\n")
+
+        job.publish("parsing", {})
+        job.publish("failed", {'status': 500})
+        output = "".join(self.broker.stream("job", last_event_id=1))
+        self.assertNotIn("event: parsing", output)
+        self.assertIn("event: failed", output)
+
+    def test_report_requires_bound_job(self):
+        """测试未绑定任务时report和token_reporter不产生事件"""
+        report("parsing")
+        self.assertIsNone(token_reporter())
+
+        job = self.broker.get_or_create("job")
+        token = bind_job(job)
+        try:
+            report("parsing", content_chars=3)
+            token_reporter(min_interval=0)("你好")
+        finally:
+            unbind_job(token)
+        self.assertEqual([event['phase'] for event in job.events], ["parsing", "tokens"])
+        self.assertEqual(job.events[1]['data']['delta'], "你好")
+
+    def test_token_deltas(self):
+        """测试tokens事件只携带新增内容和偏移，节流期间的增量合并到下一个事件"""
+        job = self.broker.get_or_create("job")
+        token = bind_job(job)
+        try:
+            on_delta = token_reporter(min_interval=60)
+            for delta in ("开场", "白：", "大家好"):
+                on_delta(delta)
+            on_delta_now = token_reporter(min_interval=0)
+        finally:
+            unbind_job(token)
+        on_delta_now("第一")
+        on_delta_now("段")
+        data = [event['data'] for event in job.events]
+        self.assertEqual(data[0], {'tokens_received': 1, 'offset': 0, 'delta': "开场"})
+        self.assertEqual([(item['offset'], item['delta']) for item in data[1:]], [(0, "第一"), (2, "段")])
+
+    def test_flush_tail(self):
+        """测试流结束时flush发送节流期间暂存的结尾内容，拼接结果与完整内容一致"""
+        job = self.broker.get_or_create("job")
+        token = bind_job(job)
+        try:
+            on_delta = token_reporter(min_interval=60)
+        finally:
+            unbind_job(token)
+        for delta in "abcd":
+            on_delta(delta)
+        flush_deltas(on_delta)
+        flush_deltas(on_delta)
+        flush_deltas(None)
+        data = [event['data'] for event in job.events]
+        self.assertEqual([(item['offset'], item['delta']) for item in data], [(0, "a"), (1, "bcd")])
+        self.assertEqual(data[-1]['tokens_received'], 4)
+
+    def test_reused_job_id(self):
+        """测试复用已结束任务的ID时替换为新任务，事件编号接着旧任务"""
+        old = self.broker.start("job")
+        old.publish("completed", {'status': 200})
+        self.assertIs(self.broker.start("job"), self.broker.start("job"))
+
+        job = self.broker.start("job")
+        self.assertIsNot(job, old)
+        job.publish("parsing", {})
+        self.assertEqual([(event['id'], event['phase']) for event in job.events], [(2, "parsing")])
+        job.publish("completed", {'status': 200})
+        output = "".join(self.broker.stream("job", last_event_id=1))
+        self.assertIn("event: parsing", output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.script_generator.prompt_builder import PromptBuilder, SYSTEM_PROMPT
+from src.script_generator.video_script import VideoScriptGenerator
+
+
+def render(sections):
+    return "提纲:\n" + "".join(f"{s['title']}\n{s['description']}\n\n" for s in sections)
+
+
+class TestPromptBuilder(unittest.TestCase):
+    """测试提示词token估算与预算压缩"""
+
+    def test_estimate_tokens(self):
+        """测试中文字符和其他字符按不同系数估算"""
+        self.assertEqual(PromptBuilder.estimate_tokens(""), 0)
+        self.assertEqual(PromptBuilder.estimate_tokens("一二三四五"), 3)
+        self.assertEqual(PromptBuilder.estimate_tokens("hello world"), 4)
+        self.assertEqual(PromptBuilder.estimate_tokens("你好，world"), 4)
+
+    def test_within_budget_unchanged(self):
+        """测试未超出预算时不压缩，content字段也作为描述"""
+        sections = [{'title': '1. 开场', 'content': '介绍主题'}, {'title': '2. 结尾', 'description': '总结'}]
+        prompt, budget = PromptBuilder.build(render, sections, input_budget=1000)
+        self.assertEqual(prompt, render([{'title': '1. 开场', 'description': '介绍主题'},
+                                         {'title': '2. 结尾', 'description': '总结'}]))
+        self.assertEqual(budget['compaction'], [])
+        self.assertFalse(budget['over_budget'])
+        self.assertEqual(budget['max_tokens'], 1400)
+
+    def test_compaction_order(self):
+        """测试先去重，再从中间章节开始缩减为首句，开头和结尾章节保留"""
+        middle = "关键要点。" + "补充说明" * 50
+        sections = [
+            {'title': '1. 开场', 'description': '- 引出问题\n- 开场'},
+            {'title': '2. 分析', 'description': middle},
+            {'title': '3. 结论', 'description': '- 引出问题\n- 给出答案'},
+        ]
+        full = PromptBuilder.prefix_tokens() + PromptBuilder.estimate_tokens(
+            render(PromptBuilder.normalize_sections(sections)))
+        prompt, budget = PromptBuilder.build(render, sections, input_budget=full - 100)
+        self.assertEqual(budget['compaction'], ['dedupe', 'summarize:1'])
+        self.assertIn("2. 分析\n关键要点。\n", prompt)
+        self.assertIn("- 给出答案", prompt)
+        self.assertNotIn("- 开场\n", prompt)
+        self.assertLessEqual(budget['input_tokens'], budget['input_budget'])
+        self.assertEqual(budget['original_input_tokens'], full)
+
+    def test_trim_and_generator_params(self):
+        """测试预算很小时统一截断描述，生成器按预算设置max_tokens"""
+        sections = [{'title': f'{i}. 章节', 'description': f'第{i}章' + '很长的描述' * 40} for i in range(1, 5)]
+        input_budget = PromptBuilder.prefix_tokens() + 80
+        prompt, budget = PromptBuilder.build(render, sections, input_budget=input_budget)
+        self.assertTrue(budget['compaction'][-1].startswith('trim:'))
+        self.assertLessEqual(budget['input_tokens'], input_budget)
+
+        api_client = MagicMock()
+        api_client.generate_content.return_value = {"content": "脚本内容", "usage": {"prompt_tokens": 10}}
+        script = VideoScriptGenerator(api_client).generate_script("标题", {"sections": sections})
+        params = api_client.generate_content.call_args.kwargs["params"]
+        self.assertEqual(params["max_tokens"], script["budget"]["max_tokens"])
+        self.assertEqual(script["budget"]["max_tokens"], 2800)
+        self.assertEqual(script["budget"]["usage"], {"prompt_tokens": 10})
+
+    def test_stable_prefix(self):
+        """测试不同标题和风格的请求发送相同的前缀，可变内容只在最后的user消息中"""
+        api_client = MagicMock()
+        api_client.generate_content.return_value = {"content": "脚本内容"}
+        generator = VideoScriptGenerator(api_client)
+        outline = {"sections": [{"title": "1. 开场", "description": "引出问题"}]}
+        generator.generate_script("第一个标题", outline, "专业", "简洁", "通用")
+        generator.generate_script("第二个标题", outline, "轻松", "详细", "学生")
+        first, second = [call.args[0] for call in api_client.generate_content.call_args_list]
+        first_prefix, second_prefix = [call.kwargs["prefix"] for call in api_client.generate_content.call_args_list]
+        self.assertEqual(first_prefix, second_prefix)
+        self.assertIn("第一个标题", first)
+        self.assertIn("目标受众: 学生", second)
+
+        messages = PromptBuilder.messages(second, second_prefix)
+        self.assertEqual(messages[0], PromptBuilder.messages(first, first_prefix)[0])
+        self.assertEqual(messages[0]["content"], "\n\n".join([SYSTEM_PROMPT, *first_prefix]))
+        self.assertNotIn("标题》", messages[0]["content"])
+        self.assertEqual(messages[1], {"role": "user", "content": second})
+
+
+if __name__ == '__main__':
+    unittest.main()
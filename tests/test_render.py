@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.video_generator.render import (build_timeline, parse_progress, resolve_media_path, RenderScheduler,
+                                        RenderCancelled, CANCELLED)
+
+class TestRender(unittest.TestCase):
+    """测试脚本渲染的时间线和任务调度"""
+    
+    def test_build_timeline(self):
+        """测试按章节生成时间线，素材不足时循环使用"""
+        script = {'sections': [{'content': '一' * 45}, {'content': '短'}, {'content': '二' * 9}]}
+        timeline = build_timeline(script, ['a.mp4', 'b.mp4'])
+        self.assertEqual([entry['clip'] for entry in timeline], ['a.mp4', 'b.mp4', 'a.mp4'])
+        self.assertEqual([entry['duration'] for entry in timeline], [10.0, 2.0, 2.0])
+        self.assertEqual([entry['start'] for entry in timeline], [0.0, 10.0, 12.0])
+        
+        timeline = build_timeline(script, ['a.mp4'], durations=[3, 4])
+        self.assertEqual([entry['duration'] for entry in timeline], [3.0, 4.0, 2.0])
+    
+    def test_parse_progress(self):
+        """测试解析ffmpeg进度输出"""
+        state = {}
+        self.assertIsNone(parse_progress("out_time_us=2500000\n", state))
+        self.assertEqual(parse_progress("progress=continue\n", state), 2.5)
+    
+    def test_resolve_media_path(self):
+        """测试拒绝素材目录之外的路径"""
+        with tempfile.TemporaryDirectory() as media_dir:
+            Path(media_dir, 'clip.mp4').write_bytes(b'')
+            self.assertEqual(resolve_media_path('clip.mp4', media_dir),
+                             os.path.join(os.path.realpath(media_dir), 'clip.mp4'))
+            for name in ('../clip.mp4', '/etc/passwd', 'missing.mp4'):
+                with self.assertRaises(ValueError):
+                    resolve_media_path(name, media_dir)
+    
+    def test_audio_encoded_once(self):
+        """测试编码单元只输出视频，整条时间线的音频由一条命令编码，没有音轨的章节补静音"""
+        scheduler = RenderScheduler(max_concurrent=1, output_dir=tempfile.gettempdir())
+        timeline = [{'index': 0, 'clip': 'a.mp4', 'text': '', 'start': 0, 'duration': 40.0},
+                    {'index': 1, 'clip': 'b.mp4', 'text': '', 'start': 40, 'duration': 3.0}]
+        unit = {'index': 1, 'entry': timeline[0], 'offset': 18, 'duration': 18}
+        args = scheduler._unit_stream(unit, 'part.mp4', 2).compile()
+        self.assertNotIn('-acodec', args)
+        self.assertIn('-ss', args)
+        
+        args = scheduler._audio_stream(timeline, 'audio.m4a', {'a.mp4': True, 'b.mp4': False}).compile()
+        graph = args[args.index('-filter_complex') + 1]
+        self.assertIn('concat=a=1:n=2:v=0', graph)
+        self.assertIn('atrim=duration=40.0', graph)
+        self.assertIn('anullsrc', " ".join(args))
+        self.assertEqual(args[args.index('-acodec') + 1], 'aac')
+    
+    def test_burn_section_subtitles(self):
+        """测试每个有文案的章节写出从章节开头计时的字幕，编码单元烧录所属章节的字幕"""
+        timeline = [{'index': 0, 'clip': 'a.mp4', 'text': '第一句。第二句。', 'start': 0, 'duration': 4.0},
+                    {'index': 1, 'clip': 'b.mp4', 'text': '', 'start': 4, 'duration': 2.0}]
+        with tempfile.TemporaryDirectory() as work_dir:
+            paths = RenderScheduler._write_subtitles(timeline, work_dir)
+            self.assertEqual(list(paths), [0])
+            content = Path(paths[0]).read_text(encoding='utf-8')
+            self.assertIn("Dialogue: 0,0:00:00.00,0:00:02.00,Default,,0,0,0,,第一句。", content)
+            self.assertIn("0:00:02.00,0:00:04.00", content)
+            
+            scheduler = RenderScheduler(max_concurrent=1, output_dir=work_dir)
+            unit = {'index': 0, 'entry': timeline[0], 'offset': 0, 'duration': 4.0}
+            graph = " ".join(scheduler._unit_stream(unit, 'part.mp4', 2, paths[0]).compile())
+            self.assertIn("subtitles=", graph)
+            self.assertNotIn("subtitles=", " ".join(scheduler._unit_stream(unit, 'part.mp4', 2).compile()))
+    
+    def test_cancel_running_job(self):
+        """测试取消运行中的任务"""
+        started = threading.Event()
+        
+        def fake_render(job, deadline):
+            started.set()
+            job.cancel_event.wait(5)
+            raise RenderCancelled()
+        
+        with tempfile.TemporaryDirectory() as output_dir:
+            scheduler = RenderScheduler(max_concurrent=1, max_pending=1, output_dir=output_dir)
+            scheduler._render = fake_render
+            job = scheduler.submit([{'index': 0, 'clip': 'a.mp4', 'text': '', 'start': 0, 'duration': 2.0}])
+            self.assertTrue(started.wait(5))
+            # 未结束的任务达到上限时拒绝新任务
+            self.assertIsNone(scheduler.submit(job.timeline))
+            
+            scheduler.cancel(job.job_id)
+            for _ in range(50):
+                if job.status == CANCELLED:
+                    break
+                time.sleep(0.1)
+            self.assertEqual(job.status, CANCELLED)
+
+    @patch('src.database.operations.ScriptOperations.get_script_version')
+    def test_render_rejects_bad_version(self, mock_get):
+        """测试version不是正整数时返回400且不查询数据库"""
+        from src.api.app import app
+        client = app.test_client()
+        for version in ([1], {'v': 1}, True, 0, -1, 1.5, 'abc'):
+            response = client.post('/api/render', json={'script_id': 's1', 'clips': ['a.mp4'], 'version': version})
+            self.assertEqual(response.status_code, 400, version)
+            self.assertIn('version', response.get_json()['error'])
+        response = client.post('/api/render', json={'script_id': 's1', 'clips': ['a.mp4'], 'subtitles': 'no'})
+        self.assertEqual(response.status_code, 400)
+        mock_get.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
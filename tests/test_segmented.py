@@ -0,0 +1,50 @@
+import threading
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.video_generator.segmented import plan_segments, split_timeline, run_segments, segment_count
+
+class TestSegmented(unittest.TestCase):
+    """测试分段并行编码的调度"""
+    
+    def test_plan_segments(self):
+        """测试分段数取决于核数和时长，边界与关键帧间隔对齐"""
+        self.assertEqual(segment_count(5, cores=8), 1)
+        self.assertEqual(segment_count(35, cores=8), 3)
+        self.assertEqual(segment_count(600, cores=8), 8)
+        
+        segments = plan_segments(95, cores=8)
+        self.assertEqual(len(segments), 8)
+        self.assertTrue(all(start % 2 == 0 for start, _ in segments))
+        self.assertAlmostEqual(sum(length for _, length in segments), 95)
+    
+    def test_split_timeline(self):
+        """测试长章节被拆成多个单元，短章节各自一个单元"""
+        timeline = [{'index': 0, 'duration': 45.0}, {'index': 1, 'duration': 3.0}, {'index': 2, 'duration': 20.0}]
+        units = split_timeline(timeline, cores=4)
+        self.assertEqual([(unit['entry']['index'], unit['offset'], unit['duration']) for unit in units],
+                         [(0, 0, 18), (0, 18, 18), (0, 36, 9), (1, 0, 3), (2, 0, 18), (2, 18, 2)])
+    
+    def test_run_segments(self):
+        """测试结果按任务顺序返回，一个任务失败时通知其余任务停止"""
+        self.assertEqual(run_segments([lambda stop, i=i: i * i for i in range(5)], workers=3), [0, 1, 4, 9, 16])
+        
+        stopped = threading.Event()
+        
+        def slow(stop):
+            if stop.wait(5):
+                stopped.set()
+        
+        def fail(stop):
+            raise RuntimeError("encode failed")
+        
+        with self.assertRaises(RuntimeError):
+            run_segments([slow, fail, slow], workers=2)
+        self.assertTrue(stopped.is_set())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.similarity import MinHashIndex, shingles, outline_text
+
+SECTIONS = [
+    {"title": "1. 开场", "content": "介绍Python的发展历史和应用领域，说明为什么值得学习"},
+    {"title": "2. 安装环境", "content": "演示在Windows和macOS上安装Python解释器和代码编辑器"},
+    {"title": "3. 基础语法", "content": "讲解变量、数据类型、条件判断和循环，并编写第一个小程序"},
+    {"title": "4. 总结", "content": "回顾本期内容，布置课后练习并预告下一期的函数与模块"},
+]
+
+
+class TestMinHashIndex(unittest.TestCase):
+    """测试提纲和脚本的近似重复索引"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "similarity.idx")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_shingles(self):
+        """测试切分前去掉空白和标点并统一大小写"""
+        self.assertEqual(shingles("Ab, c!", size=2), {"ab", "bc"})
+        self.assertEqual(shingles("好", size=5), {"好"})
+        self.assertEqual(shingles(" ，。 "), set())
+
+    def test_near_duplicate(self):
+        """测试略有修改的提纲被识别为相似，无关内容和其他类型的文档不返回"""
+        index = MinHashIndex()
+        edited = [dict(section) for section in SECTIONS]
+        edited[3]["content"] = "回顾本期内容，布置课后作业并预告下一期的函数"
+        index.add("outline:1", outline_text("Python入门教程", SECTIONS))
+        index.add("outline:2", outline_text("Python入门教程(新版)", edited))
+        index.add("outline:3", outline_text("家常红烧肉", [{"title": "1. 备料", "content": "五花肉切块，准备冰糖和酱油"}]))
+        index.add("script:1", outline_text("Python入门教程", SECTIONS))
+
+        similar = index.similar("outline:1", prefix="outline:")
+        self.assertEqual([key for key, _ in similar], ["outline:2"])
+        self.assertGreater(similar[0][1], 0.6)
+        self.assertEqual(index.query(outline_text("Python入门教程", SECTIONS), prefix="script:")[0],
+                         ("script:1", 1.0))
+        self.assertIsNone(index.similar("outline:missing"))
+
+    def test_persistence(self):
+        """测试重启后从日志恢复，替换和删除同样生效"""
+        index = MinHashIndex(self.path)
+        index.add("outline:1", outline_text("Python入门教程", SECTIONS))
+        index.add("outline:2", outline_text("Python入门教程", SECTIONS[:3]))
+        index.add("outline:3", "临时内容，稍后删除")
+        index.add("outline:2", outline_text("家常红烧肉", [{"title": "备料", "content": "五花肉切块"}]))
+        index.remove("outline:3")
+
+        reloaded = MinHashIndex(self.path)
+        self.assertEqual(len(reloaded), 2)
+        self.assertNotIn("outline:3", reloaded)
+        self.assertEqual(reloaded.similar("outline:1"), [])
+        self.assertEqual(reloaded.query(outline_text("家常红烧肉", [{"title": "备料", "content": "五花肉切块"}])),
+                         [("outline:2", 1.0)])
+
+    def test_parameters_changed(self):
+        """测试索引参数变化后丢弃无法比较的旧签名"""
+        MinHashIndex(self.path).add("outline:1", outline_text("Python入门教程", SECTIONS))
+        self.assertEqual(len(MinHashIndex(self.path)), 1)
+        self.assertEqual(len(MinHashIndex(self.path, shingle_size=3)), 0)
+        with self.assertRaises(ValueError):
+            MinHashIndex(num_perm=100, bands=32)
+
+    def test_shared_log(self):
+        """测试多个进程共用日志时，查询前能看到其他实例追加和重写后的签名，启动时不创建日志"""
+        first = MinHashIndex(self.path, shared=True)
+        second = MinHashIndex(self.path, shared=True)
+        self.assertFalse(os.path.exists(self.path))
+
+        first.add("outline:1", outline_text("Python入门教程", SECTIONS))
+        self.assertIn("outline:1", second)
+        second.add("outline:2", outline_text("Python入门教程", SECTIONS))
+        self.assertEqual(first.similar("outline:1"), [("outline:2", 1.0)])
+
+        second.remove("outline:2")
+        second._rewrite()
+        self.assertEqual(first.similar("outline:1"), [])
+        self.assertEqual(len(first), 1)
+
+    def test_rebuild_in_background(self):
+        """测试重建接口立即返回并在后台只索引每个提纲的最新脚本"""
+        from src.api.app import app
+        from src.database.models import Outline, OutlineSection, Script
+        outline = Outline("Python入门教程", "1", [OutlineSection(s["title"], s["content"]) for s in SECTIONS])
+        script = Script("s1", "1", '{"raw_content": "讲解变量、数据类型、条件判断和循环"}')
+        headers = {'X-Admin-Token': 'test-token'}
+        with patch('src.api.app.ADMIN_TOKEN', 'test-token'), \
+                patch('src.api.app.similarity_index', MinHashIndex(self.path)) as index, \
+                patch('src.api.app.similarity_rebuild', {'status': 'idle'}), \
+                patch('src.database.operations.OutlineOperations.iter_outlines', return_value=iter([outline])), \
+                patch('src.database.operations.ScriptOperations.iter_scripts', return_value=iter([script])):
+            client = app.test_client()
+            self.assertEqual(client.post('/api/admin/similarity/rebuild').status_code, 403)
+            response = client.post('/api/admin/similarity/rebuild', headers=headers)
+            self.assertEqual(response.status_code, 202)
+
+            deadline = time.monotonic() + 5
+            state = response.get_json()
+            while state['status'] in ('queued', 'running') and time.monotonic() < deadline:
+                time.sleep(0.01)
+                state = client.get('/api/admin/similarity/rebuild', headers=headers).get_json()
+            self.assertEqual((state['status'], state['outlines'], state['scripts'], state['documents']),
+                             ('completed', 1, 1, 2))
+            self.assertIn("script:1", index)
+
+
+if __name__ == '__main__':
+    unittest.main()
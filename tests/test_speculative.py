@@ -0,0 +1,111 @@
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.script_generator.speculative import SpeculativeScripts, SPECULATIVE_RESULTS
+
+
+class FakeGenerator:
+    """记录调用参数的脚本生成器，release未设置时阻塞"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def generate_script(self, title, outline, style, tone, audience):
+        self.calls.append((title, outline["sections"][0]["content"], style, tone, audience))
+        self.release.wait(5)
+        return {"title": title, "sections": [{"content": outline["sections"][0]["content"]}]}
+
+
+SECTIONS = [{"title": "1. 开场", "content": "引出问题"}]
+
+
+class TestSpeculativeScripts(unittest.TestCase):
+    """测试保存提纲后的脚本预生成"""
+
+    def setUp(self):
+        self.generator = FakeGenerator()
+        self.busy = False
+        self.speculative = SpeculativeScripts(self.generator, busy=lambda: self.busy, poll_interval=0.01)
+
+    def tearDown(self):
+        self.speculative.shutdown()
+
+    def wait_started(self, count=1):
+        deadline = time.monotonic() + 5
+        while len(self.generator.calls) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_take_default_script(self):
+        """测试按默认参数预生成，结果只使用一次"""
+        self.speculative.schedule(1, "标题", SECTIONS)
+        self.wait_started()
+        script = self.speculative.take("1", "标题", SECTIONS, '专业', '简洁', '通用')
+        self.assertEqual(script["title"], "标题")
+        self.assertEqual(self.generator.calls, [("标题", "引出问题", '专业', '简洁', '通用')])
+        self.assertIsNone(self.speculative.take("1", "标题", SECTIONS, '专业', '简洁', '通用'))
+
+    def test_edit_cancels_previous(self):
+        """测试提纲再次保存后旧内容的预生成结果作废"""
+        self.generator.release.clear()
+        self.speculative.schedule(1, "标题", SECTIONS)
+        self.wait_started()
+        edited = [{"title": "1. 开场", "content": "修改后的描述"}]
+        self.speculative.schedule(1, "标题", edited)
+        self.generator.release.set()
+        self.wait_started(2)
+
+        self.assertIsNone(self.speculative.take(1, "标题", SECTIONS, '专业', '简洁', '通用'))
+        self.speculative.schedule(1, "标题", edited)
+        self.wait_started(3)
+        script = self.speculative.take(1, "标题", edited, '专业', '简洁', '通用')
+        self.assertEqual(script["sections"][0]["content"], "修改后的描述")
+
+    def test_waits_for_interactive_requests(self):
+        """测试有交互请求时不开始预生成，未开始的预生成被取消"""
+        self.busy = True
+        self.speculative.schedule(1, "标题", SECTIONS)
+        time.sleep(0.05)
+        self.assertIsNone(self.speculative.take(1, "标题", SECTIONS, '专业', '简洁', '通用'))
+        self.busy = False
+        time.sleep(0.05)
+        self.assertEqual(self.generator.calls, [])
+
+    def test_non_default_params(self):
+        """测试非默认参数不使用预生成结果"""
+        self.speculative.schedule(1, "标题", SECTIONS)
+        self.wait_started()
+        self.assertIsNone(self.speculative.take(1, "标题", SECTIONS, '轻松', '简洁', '通用'))
+        self.assertIsNotNone(self.speculative.take(1, "标题", SECTIONS, '专业', '简洁', '通用'))
+
+
+    def test_take_adopts_running(self):
+        """测试预生成已开始时请求等待并使用其结果，不重复调用生成"""
+        hits = SPECULATIVE_RESULTS.labels("hit")
+        before = hits.get()
+        self.generator.release.clear()
+        self.speculative.schedule(1, "标题", SECTIONS)
+        self.wait_started()
+
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(
+            script=self.speculative.take(1, "标题", SECTIONS, '专业', '简洁', '通用')))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertTrue(waiter.is_alive())
+        self.generator.release.set()
+        waiter.join(5)
+
+        self.assertEqual(result["script"]["title"], "标题")
+        self.assertEqual(len(self.generator.calls), 1)
+        self.assertEqual(hits.get(), before + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import json
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.video_generator.subtitles import (split_captions, wrap_text, build_cues, to_srt, to_ass,
+                                           generate_subtitles, text_width)
+
+class TestSubtitles(unittest.TestCase):
+    """测试根据脚本生成字幕"""
+    
+    def test_split_captions(self):
+        """测试按句末标点断句，长句在停顿处切分并折行"""
+        captions = split_captions("第一句话。第二句话！“引号里的话。”最后", max_width=10, max_lines=2)
+        self.assertEqual(captions, ["第一句话。", "第二句话！", "“引号里的话。”", "最后"])
+        
+        long_sentence = "这是一个比较长的句子，中间有多个停顿，每个分句都不算太长，但是合在一起超过了容量。"
+        for caption in split_captions(long_sentence, max_width=10, max_lines=2):
+            lines = caption.split('\n')
+            self.assertLessEqual(len(lines), 2)
+            for line in lines:
+                self.assertLessEqual(text_width(line), 11)
+    
+    def test_wrap_text(self):
+        """测试标点不在行首，英文单词不拆开"""
+        self.assertEqual(wrap_text("一二三四五，六七", max_width=5), ["一二三四五，", "六七"])
+        self.assertEqual(wrap_text("hello world again", max_width=3), ["hello", "world", "again"])
+        self.assertEqual(wrap_text("一二三四（五六", max_width=5), ["一二三四", "（五六"])
+    
+    def test_timing_and_formats(self):
+        """测试按素材时长分配字幕时间并输出SRT/ASS"""
+        script = {'sections': [{'content': '一二。三四五六七。'}, {'content': '{尾}'}]}
+        cues = build_cues(script, durations=[6, 1.5])
+        self.assertEqual([(round(start, 3), round(end, 3)) for start, end, _ in cues],
+                         [(0, 2), (2, 6), (6, 7.5)])
+        self.assertIn("00:00:02,000 --> 00:00:06,000\n三四五六七。\n", to_srt(cues))
+        self.assertIn("Dialogue: 0,0:00:06.00,0:00:07.50,Default,,0,0,0,,｛尾｝\n", to_ass(cues))
+    
+    def test_large_script(self):
+        """测试万字脚本的生成耗时"""
+        text = "自动化测试工具可以生成用例，覆盖更多边界条件，同时减少维护成本。" * 80
+        content = json.dumps({'sections': [{'content': text} for _ in range(4)]}, ensure_ascii=False)
+        start = time.perf_counter()
+        result = generate_subtitles(content)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertIs(generate_subtitles(content), result)
+
+if __name__ == '__main__':
+    unittest.main()
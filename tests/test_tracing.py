@@ -0,0 +1,76 @@
+import unittest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.tracing import Tracer, span, traced, current_trace
+
+class RecordingExporter:
+    """记录导出追踪的测试用导出器"""
+    
+    def __init__(self):
+        self.traces = []
+    
+    def export(self, trace):
+        self.traces.append(trace)
+
+class TestTracing(unittest.TestCase):
+    """测试请求追踪功能"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.exporter = RecordingExporter()
+        self.tracer = Tracer(sample_rate=1.0, exporter=self.exporter)
+    
+    def test_span_without_trace_is_noop(self):
+        """测试没有活动追踪时span不做任何事"""
+        self.assertIsNone(current_trace())
+        with span("noop") as s:
+            self.assertIsNone(s)
+    
+    def test_nested_spans_and_export(self):
+        """测试嵌套span的父子关系和导出格式"""
+        trace, token = self.tracer.start_trace("GET /api/test")
+        with span("outer", phase="db") as outer:
+            with span("inner", phase="db") as inner:
+                self.assertEqual(inner.parent_id, outer.span_id)
+        self.tracer.end_trace(trace, token)
+        
+        self.assertIsNone(current_trace())
+        self.assertEqual(len(self.exporter.traces), 1)
+        exported = trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual([s["name"] for s in exported], ["inner", "outer", "GET /api/test"])
+        self.assertTrue(all(s["traceId"] == trace.trace_id for s in exported))
+        # 同阶段嵌套span只计入一次
+        self.assertEqual(list(trace.phase_durations), ["db"])
+    
+    def test_server_timing_and_errors(self):
+        """测试Server-Timing汇总和异常记录"""
+        @traced(phase="llm")
+        def failing_call():
+            raise RuntimeError("上游超时")
+        
+        trace, token = self.tracer.start_trace("POST /api/generate")
+        with self.assertRaises(RuntimeError):
+            failing_call()
+        header = trace.server_timing()
+        self.tracer.end_trace(trace, token)
+        
+        self.assertIn("llm;dur=", header)
+        self.assertIn("total;dur=", header)
+        failed = [s for s in trace.spans if s.error]
+        self.assertEqual(failed[0].error, "上游超时")
+    
+    def test_traceparent_controls_sampling(self):
+        """测试traceparent请求头决定trace_id和采样"""
+        tracer = Tracer(sample_rate=0.0, exporter=self.exporter)
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        trace, token = tracer.start_trace("GET /", traceparent=f"00-{trace_id}-00f067aa0ba902b7-01")
+        tracer.end_trace(trace, token)
+        self.assertEqual(trace.trace_id, trace_id)
+        self.assertTrue(trace.sampled)
+
+if __name__ == '__main__':
+    unittest.main()
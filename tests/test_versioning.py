@@ -0,0 +1,79 @@
+import json
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.app import app
+from src.database.models import Script
+from src.utils.http_cache import validator_cache
+from src.database.versioning import (SNAPSHOT, DELTA, to_lines, from_lines, make_delta, apply_delta,
+                                     encode_payload, rebuild)
+
+def _script(paragraphs):
+    """构造与生成结果结构相同的脚本JSON"""
+    text = "\n".join(paragraphs)
+    return json.dumps({"sections": [{"content": text}], "title": "标题", "raw_content": text, "id": "1"},
+                      ensure_ascii=False)
+
+class TestVersioning(unittest.TestCase):
+    """测试脚本版本的差异计算和重建"""
+    
+    def setUp(self):
+        """测试前准备工作"""
+        self.paragraphs = [f"第{i}段：这是一段用于测试差异存储的脚本内容，包含足够的文字。" for i in range(40)]
+    
+    def test_lines_round_trip(self):
+        """测试行文档与脚本对象互相转换"""
+        content = _script(self.paragraphs)
+        self.assertEqual(from_lines(to_lines(content)), json.loads(content))
+    
+    def test_delta_round_trip(self):
+        """测试差异应用后得到目标版本"""
+        base = to_lines(_script(self.paragraphs))
+        edited = self.paragraphs[:5] + ["新插入的段落"] + self.paragraphs[7:]
+        target = to_lines(_script(edited))
+        self.assertEqual(apply_delta(base, make_delta(base, target)), target)
+    
+    def test_rebuild_versions(self):
+        """测试从快照依次应用差异重建版本，并且差异远小于完整脚本"""
+        versions = [self.paragraphs]
+        for i in range(5):
+            versions.append(versions[-1][:i] + [f"第{i}次修改"] + versions[-1][i + 1:])
+        lines = [to_lines(_script(version)) for version in versions]
+        
+        records = [{'kind': SNAPSHOT, 'payload': encode_payload(lines[0])}]
+        for previous, current in zip(lines, lines[1:]):
+            records.append({'kind': DELTA, 'payload': encode_payload(make_delta(previous, current))})
+        
+        self.assertEqual(rebuild(records), lines[-1])
+        full_size = len(_script(versions[-1]).encode('utf-8'))
+        self.assertTrue(all(len(record['payload']) * 10 < full_size for record in records[1:]))
+    
+    def test_rebuild_requires_snapshot(self):
+        """测试缺少起始快照时报错"""
+        with self.assertRaises(ValueError):
+            rebuild([{'kind': DELTA, 'payload': encode_payload([])}])
+
+    @patch('src.database.operations.ScriptOperations.get_script_version')
+    def test_version_endpoint_bad_content(self, mock_get):
+        """测试历史版本内容无法解析或不是JSON对象时返回500，正常内容按脚本详情格式返回"""
+        client = app.test_client()
+        for version, content in ((1, '{bad'), (2, '[1, 2]')):
+            validator_cache.clear()
+            mock_get.return_value = Script("s1", "7", content, version=version)
+            response = client.get(f'/api/script/7/versions/{version}')
+            self.assertEqual(response.status_code, 500, content)
+            self.assertIn('error', response.get_json())
+
+        validator_cache.clear()
+        mock_get.return_value = Script("s1", "7", _script(self.paragraphs[:2]), version=3)
+        response = client.get('/api/script/7/versions/3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['outline_id'], '7')
+
+if __name__ == '__main__':
+    unittest.main()